@@ -4,7 +4,10 @@
 # Disable C0302: Too many lines in the module
 # pylint: disable=C0302
 
+import datetime
 import hashlib
+import threading
+import time
 import unittest
 import io
 
@@ -56,6 +59,11 @@ class AdminTest(unittest.TestCase):
         query('b', '*')
         self.assertEqual('(&(a=1)(b=*))', str(query))
 
+        query('modifyTimestamp', '20170101000000Z', op='>=')
+        self.assertEqual(
+            '(&(a=1)(b=*)(modifyTimestamp>=20170101000000Z))', str(query)
+        )
+
     def test_entry_to_dict(self):
         """Test entry to dict conversion."""
         # Disable W0212: Test access protected members of admin module.
@@ -507,6 +515,254 @@ class AdminTest(unittest.TestCase):
                                             sasl_mechanism='GSSAPI',
                                             auto_bind=True)
 
+    def test_paged_search(self):
+        """Tests subtree search is paged, base search is not."""
+        admin_obj = admin.Admin(None, 'dc=test,dc=com', page_size=2)
+        admin_obj.ldap = mock.Mock()
+        pages = [
+            (['a', 'b'], b'next'),
+            (['c'], b''),
+        ]
+
+        def _search(**kwargs):
+            """Return next page, with cookie of the page after it."""
+            dns, cookie = pages.pop(0) if 'paged_size' in kwargs else (
+                ['base'], None
+            )
+            admin_obj.ldap.response = [
+                {'dn': dn, 'attributes': {'cn': [dn]}} for dn in dns
+            ]
+            admin_obj.ldap.result = {'result': 0, 'controls': {
+                admin._PAGED_RESULTS_OID: {'value': {'cookie': cookie}}
+            }}
+
+        admin_obj.ldap.search.side_effect = _search
+
+        self.assertEqual(
+            ['a', 'b', 'c'],
+            [dn for dn, _entry in admin_obj.search('ou=x', '(cn=*)')]
+        )
+        self.assertEqual(2, admin_obj.ldap.search.call_count)
+        admin_obj.ldap.search.assert_called_with(
+            search_base='ou=x', search_filter='(cn=*)',
+            search_scope=ldap3.SUBTREE, attributes=None,
+            dereference_aliases=ldap3.DEREF_NEVER,
+            paged_size=2, paged_cookie=b'next'
+        )
+
+        self.assertEqual(
+            [('base', {'cn': ['base']})],
+            list(admin_obj.search('ou=x', '(cn=*)', ldap3.BASE))
+        )
+
+    @mock.patch('treadmill.admin.Admin._connect')
+    def test_connection_pool(self, connect_mock):
+        """Tests connections are reused, up to pool size are opened."""
+        # Access to protected member: _connection
+        #
+        # pylint: disable=W0212
+        connect_mock.side_effect = lambda: mock.Mock()
+        admin_obj = admin.Admin(None, 'dc=test,dc=com', pool_size=2)
+        conns = []
+
+        def _checkout():
+            """Check out connection in another thread."""
+            with admin_obj._connection() as conn:
+                conns.append(conn)
+
+        with admin_obj._connection() as conn:
+            with admin_obj._connection() as nested:
+                self.assertIs(conn, nested)
+
+            thread = threading.Thread(target=_checkout)
+            thread.start()
+            thread.join()
+            self.assertIsNot(conn, conns[0])
+
+        self.assertEqual(2, connect_mock.call_count)
+
+        _checkout()
+        self.assertIn(conns[1], [conn, conns[0]])
+        self.assertEqual(2, connect_mock.call_count)
+
+    @mock.patch('treadmill.admin.Admin.get',
+                mock.Mock(return_value={'tenant': ['foo'], 'system': ['1']}))
+    @mock.patch('treadmill.admin.Admin.update', mock.Mock())
+    def test_cache(self):
+        """Tests read-mostly objects are cached until modified."""
+        admin_obj = admin.Admin(None, 'dc=test,dc=com', cache_ttl=60)
+        tenant = admin.Tenant(admin_obj)
+
+        self.assertEqual({'tenant': 'foo', 'systems': [1]}, tenant.get('foo'))
+        tenant.get('foo')['systems'].append(2)
+        self.assertEqual({'tenant': 'foo', 'systems': [1]}, tenant.get('foo'))
+        self.assertEqual(1, admin.Admin.get.call_count)
+        self.assertEqual({'hits': 2, 'misses': 1, 'evicted': 0, 'size': 1},
+                         admin_obj.cache_stats())
+
+        tenant.update('foo', {'systems': [3]})
+        tenant.get('foo')
+        self.assertEqual(2, admin.Admin.get.call_count)
+
+        # Servers are not cached.
+        admin.Server(admin_obj).get('foo.xx.com')
+        admin.Server(admin_obj).get('foo.xx.com')
+        self.assertEqual(4, admin.Admin.get.call_count)
+
+    def test_cache_invalidated_during_read(self):
+        """Tests result read while invalidated is not cached."""
+        admin_obj = admin.Admin(None, 'dc=test,dc=com', cache_ttl=60)
+
+        def _read():
+            """Read racing with an update of the same kind."""
+            admin_obj.invalidate('tmTenant')
+            return 'stale'
+
+        self.assertEqual('stale',
+                         admin_obj.cached(('tmTenant', 'get', 'x'), _read))
+        self.assertEqual(0, admin_obj.cache_stats()['size'])
+
+        # Other kinds are still cached.
+        admin_obj.cached(('tmCell', 'get', 'x'), _read)
+        self.assertEqual(1, admin_obj.cache_stats()['size'])
+
+    @mock.patch('time.time', mock.Mock(return_value=100))
+    def test_cache_evict(self):
+        """Tests expired and oldest results are evicted."""
+        admin_obj = admin.Admin(None, 'dc=test,dc=com', cache_ttl=60,
+                                cache_size=2)
+
+        for name in ('a', 'b', 'c'):
+            admin_obj.cached(('tmCell', 'list', name), lambda: name)
+        self.assertEqual({'hits': 0, 'misses': 3, 'evicted': 1, 'size': 2},
+                         admin_obj.cache_stats())
+
+        # Expired results are dropped when storing another one.
+        time.time.return_value = 200
+        admin_obj.cached(('tmCell', 'list', 'd'), lambda: 'd')
+        self.assertEqual({'hits': 0, 'misses': 4, 'evicted': 3, 'size': 1},
+                         admin_obj.cache_stats())
+
+    @mock.patch('treadmill.admin.Admin.search', mock.Mock(return_value=[
+        ('server=foo', {'server': ['foo'], 'cell': ['x']}),
+    ]))
+    def test_list_fields(self):
+        """Tests list only fetches and returns the given fields."""
+        svr = admin.Server(admin.Admin(None, 'dc=test,dc=com'))
+
+        self.assertEqual(
+            [{'_id': 'foo', 'cell': 'x'}],
+            svr.list({}, fields={'_id', 'cell'})
+        )
+        self.assertEqual(
+            ['server', 'cell'],
+            sorted(admin.Admin.search.call_args[1]['attributes'],
+                   reverse=True)
+        )
+
+        # Services are built from grouped attributes, all are fetched.
+        app = admin.Application(admin.Admin(None, 'dc=test,dc=com'))
+        app.list({}, fields={'_id', 'services'})
+        self.assertEqual(app.attrs(),
+                         admin.Admin.search.call_args[1]['attributes'])
+
+    @mock.patch('treadmill.admin._SEARCH_MANY_SIZE', 2)
+    @mock.patch('treadmill.admin.Admin.search', mock.Mock())
+    def test_get_many(self):
+        """Tests objects are looked up by a search per chunk."""
+        admin.Admin.search.side_effect = [
+            [('app=foo.a', {'app': ['foo.a'], 'memory': ['1G'],
+                            'modifyTimestamp': ['20170101000000Z']})],
+            [],
+        ]
+        app = admin.Application(admin.Admin(None, 'dc=test,dc=com'))
+
+        apps = app.get_many(['foo.a', 'foo.b', 'foo.c'])
+        self.assertEqual(['foo.a'], list(apps))
+        self.assertEqual('1G', apps['foo.a']['memory'])
+        admin.Admin.search.assert_called_with(
+            search_base=b'ou=apps,ou=treadmill,dc=test,dc=com',
+            search_filter='(&(objectClass=tmApp)(|(app=foo.c)))',
+            search_scope=ldap3.SUBTREE,
+            attributes=app.attrs()
+        )
+
+        admin.Admin.search.side_effect = [
+            [('app=foo.a', {'app': ['foo.a'],
+                            'entryCSN': ['20170101000000.000001Z#0#0#0'],
+                            'modifyTimestamp': '20170101000000Z'}),
+             ('app=foo.b', {'app': ['foo.b'],
+                            'modifyTimestamp': '20170101000000Z'})],
+        ]
+        self.assertEqual({'foo.a': '20170101000000.000001Z#0#0#0',
+                          'foo.b': '20170101000000Z'},
+                         app.modified(['foo.a', 'foo*']))
+        self.assertEqual(['app', 'entryCSN', 'modifyTimestamp'],
+                         admin.Admin.search.call_args[1]['attributes'])
+        # Identities are escaped.
+        self.assertEqual(
+            '(&(objectClass=tmApp)(|(app=foo.a)(app=foo\\2a)))',
+            admin.Admin.search.call_args[1]['search_filter']
+        )
+
+    @mock.patch('treadmill.admin.Admin.search', mock.Mock())
+    def test_list_modified(self):
+        """Tests listing records modified since given time."""
+        admin.Admin.search.return_value = [
+            ('app-group=foo.a', {'app-group': ['foo.a'],
+                                 'modifyTimestamp': datetime.datetime(
+                                     2017, 1, 1, 1, 2, 3,
+                                     tzinfo=datetime.timezone.utc)}),
+            ('app-group=foo.b', {'app-group': ['foo.b'],
+                                 'modifyTimestamp': ['20170101000000Z']}),
+        ]
+        app_group = admin.AppGroup(admin.Admin(None, 'dc=test,dc=com'))
+
+        groups, latest = app_group.list_modified(
+            {'cells': 'x'}, since='20161231000000Z'
+        )
+        self.assertEqual(['foo.a', 'foo.b'],
+                         [group['_id'] for group in groups])
+        self.assertEqual('20170101010203Z', latest)
+        self.assertEqual(
+            '(&(objectClass=tmAppGroup)(cell=x)'
+            '(modifyTimestamp>=20161231000000Z))',
+            admin.Admin.search.call_args[1]['search_filter']
+        )
+
+        admin.Admin.search.return_value = []
+        self.assertEqual(([], '20170101010203Z'),
+                         app_group.list_modified({}, since=latest))
+
+    @mock.patch('treadmill.admin.Admin.search', mock.Mock())
+    def test_version(self):
+        """Tests version changes on updates within the same second."""
+        entries = [
+            ('server=b', {'modifyTimestamp': ['20170101000000Z']}),
+            ('server=a', {'entryCSN': ['20170101000000.000001Z#0#0#0'],
+                          'modifyTimestamp': ['20170101000000Z']}),
+        ]
+        admin.Admin.search.return_value = entries
+        server = admin.Server(admin.Admin(None, 'dc=test,dc=com'))
+
+        version = server.version()
+        self.assertEqual(['entryCSN', 'modifyTimestamp'],
+                         admin.Admin.search.call_args[1]['attributes'])
+
+        admin.Admin.search.return_value = list(reversed(entries))
+        self.assertEqual(version, server.version())
+
+        admin.Admin.search.return_value = [
+            entries[0],
+            ('server=a', {'entryCSN': ['20170101000000.000002Z#0#0#0'],
+                          'modifyTimestamp': ['20170101000000Z']}),
+        ]
+        self.assertNotEqual(version, server.version())
+
+        # Deleted entry changes the version.
+        admin.Admin.search.return_value = entries[:1]
+        self.assertNotEqual(version, server.version())
+
 
 class TenantTest(unittest.TestCase):
     """Tests Tenant ldapobject routines."""
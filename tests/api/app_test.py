@@ -1,5 +1,6 @@
 """Cell API tests."""
 
+import time
 import unittest
 
 import mock
@@ -96,5 +97,56 @@ class ApiAppTest(unittest.TestCase):
         app_admin.create.assert_called_with('proid.name', payload)
 
 
+class ManifestCacheTest(unittest.TestCase):
+    """treadmill.api.app.ManifestCache tests."""
+
+    @mock.patch('time.time', mock.Mock(return_value=100))
+    @mock.patch('treadmill.context.AdminContext.conn',
+                mock.Mock(return_value=admin.Admin(None, None)))
+    @mock.patch('treadmill.admin.Application.modified', mock.Mock())
+    @mock.patch('treadmill.admin.Application.get_many', mock.Mock())
+    def test_get(self):
+        """Test manifests are revalidated by version after ttl."""
+        versions = {'foo.a': '1', 'foo.b': '1'}
+        admin.Application.modified.side_effect = lambda app_ids: {
+            app_id: versions[app_id] for app_id in app_ids
+            if app_id in versions
+        }
+        admin.Application.get_many.side_effect = lambda app_ids: {
+            app_id: {'memory': '1G'} for app_id in app_ids
+        }
+        cache = app.ManifestCache(ttl=10)
+
+        self.assertEqual(
+            {'foo.a': {'memory': '1G'}, 'foo.b': {'memory': '1G'}},
+            cache.get(['foo.a', 'foo.b', 'foo.missing'])
+        )
+        cache.get(['foo.a'])['foo.a']['memory'] = '2G'
+        self.assertEqual({'foo.a': {'memory': '1G'}}, cache.get(['foo.a']))
+        self.assertEqual(1, admin.Application.modified.call_count)
+        self.assertEqual(1, admin.Application.get_many.call_count)
+
+        # Expired, only modified manifest is fetched.
+        time.time.return_value = 111
+        versions['foo.b'] = '2'
+        cache.get(['foo.a', 'foo.b'])
+        self.assertEqual(['foo.b'],
+                         list(admin.Application.get_many.call_args[0][0]))
+
+        # Invalidated, fetched again.
+        cache.invalidate('foo.a')
+        cache.get(['foo.a'])
+        self.assertEqual(['foo.a'],
+                         list(admin.Application.get_many.call_args[0][0]))
+        self.assertEqual(4, cache.misses)
+
+        # Modified by another process, revalidated within ttl.
+        versions['foo.a'] = '2'
+        cache.get(['foo.a'])
+        self.assertEqual(4, cache.misses)
+        cache.get(['foo.a'], revalidate=True)
+        self.assertEqual(5, cache.misses)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -70,6 +70,40 @@ class ApiInstanceTest(unittest.TestCase):
         with self.assertRaises(exc.TreadmillError):
             self.instance.create('proid.app', yaml.load(doc))
 
+    @mock.patch('treadmill.context.ZkContext.conn', mock.Mock())
+    @mock.patch('treadmill.master.create_apps', mock.Mock())
+    @mock.patch('treadmill.api.app.ManifestCache.get')
+    @mock.patch('importlib.import_module')
+    def test_bulk_create(self, import_mock, get_mock):
+        """Test bulk create looks up manifests in one call."""
+        import_mock.return_value.add_attributes.side_effect = (
+            lambda _rsrc_id, manifest: dict(manifest, proid='proid',
+                                            environment='dev')
+        )
+        self.instance = instance.API()
+        get_mock.return_value = {
+            'proid.app': {
+                'memory': '100M',
+                'cpu': '10%',
+                'disk': '100M',
+                'services': [{'name': 'a', 'command': '/a',
+                              'restart': {'limit': 0, 'interval': 60}}],
+            },
+        }
+        master.create_apps.return_value = ['proid.app#1']
+
+        result = self.instance.bulk_create([
+            {'_id': 'proid.app', 'count': 1},
+            {'_id': 'proid.missing', 'count': 2},
+        ])
+
+        get_mock.assert_called_once_with(['proid.app', 'proid.missing'],
+                                         revalidate=True)
+        self.assertEqual({'_id': 'proid.app', 'instances': ['proid.app#1']},
+                         result[0])
+        self.assertEqual('proid.missing', result[1]['_error']['_id'])
+        self.assertEqual(1, master.create_apps.call_count)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -28,14 +28,21 @@ class ApiServerTest(unittest.TestCase):
         self.assertTrue(svr_admin.list.called)
 
         self.svr.list('some-cell', None)
-        svr_admin.list.assert_called_with({'cell': 'some-cell'})
+        svr_admin.list.assert_called_with({'cell': 'some-cell'},
+                                          fields=None)
 
         self.svr.list(partition='xxx')
-        svr_admin.list.assert_called_with({'partition': 'xxx'})
+        svr_admin.list.assert_called_with({'partition': 'xxx'},
+                                          fields=None)
 
         self.svr.list('some-cell', 'xxx')
         svr_admin.list.assert_called_with({'cell': 'some-cell',
-                                           'partition': 'xxx'})
+                                           'partition': 'xxx'},
+                                          fields=None)
+
+        self.svr.list('some-cell', fields=['cell'])
+        svr_admin.list.assert_called_with({'cell': 'some-cell'},
+                                          fields={'_id', 'cell'})
 
     @mock.patch('treadmill.context.AdminContext.conn',
                 mock.Mock(return_value=admin.Admin(None, None)))
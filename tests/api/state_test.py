@@ -125,6 +125,27 @@ class ApiStateTest(unittest.TestCase):
                  'when': '123456789.2', 'state': 'finished', 'exitcode': 0}
             ]
         )
+        self.assertEqual(
+            state_api.list('foo.bar#000000000[12]', True,
+                           limit=1, after='foo.bar#0000000001'),
+            [
+                {'host': 'baz1', 'name': 'foo.bar#0000000002', 'oom': False,
+                 'when': '123456789.2', 'state': 'finished', 'exitcode': 0}
+            ]
+        )
+
+    def test_version(self):
+        """Tests state version is recomputed on change only."""
+        version = self.cell_state.version()
+        self.cell_state.placement['foo.bar#0000000001']['state'] = 'scheduled'
+        self.assertEqual(version, self.cell_state.version())
+
+        self.cell_state.generation += 1
+        self.assertNotEqual(version, self.cell_state.version())
+
+        self.cell_state.placement['foo.bar#0000000001']['state'] = 'running'
+        self.cell_state.generation += 1
+        self.assertEqual(version, self.cell_state.version())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+"""Unit test for trace history store.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import mock
+
+from treadmill.apptrace import history
+
+
+def _make_snapshot(path, rows):
+    """Create trace snapshot database."""
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'create table trace (path text, timestamp integer, data text)'
+    )
+    conn.executemany(
+        'insert into trace (path, timestamp, data) values(?, ?, ?)', rows
+    )
+    conn.commit()
+    conn.close()
+
+
+class HistoryStoreTest(unittest.TestCase):
+    """Tests for treadmill.apptrace.history."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = history.HistoryStore(self.root, partition_size=100,
+                                          retention=1000)
+
+    def tearDown(self):
+        if self.root and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    @mock.patch('time.time', mock.Mock(return_value=200))
+    def test_compact(self):
+        """Test snapshots are merged into partitions."""
+        _make_snapshot(
+            os.path.join(self.root, 'trace.db.gzip-0000000001'),
+            [('/trace/0001/foo.bar#0001,10,h,pending,created', 10, None),
+             ('/trace/0001/foo.bar#0001,150,h,scheduled,h', 150, None),
+             ('/trace/0002/foo.baz#0002,20,h,pending,created', 20, None)]
+        )
+        # Same record in second snapshot is merged once.
+        _make_snapshot(
+            os.path.join(self.root, 'trace.db.gzip-0000000002'),
+            [('/trace/0001/foo.bar#0001,150,h,scheduled,h', 150, None),
+             ('/trace/0001/foo.bar#0001,160,h,service_running,h', 160,
+              None)]
+        )
+
+        self.store.compact()
+
+        self.assertEqual([], self.store.snapshots())
+        self.assertEqual(
+            ['.trace.db.gzip-0000000001.merged',
+             '.trace.db.gzip-0000000002.merged',
+             'trace.part-0000000000', 'trace.part-0000000100'],
+            sorted(os.listdir(self.root))
+        )
+        self.assertTrue(self.store.merged('trace.db.gzip-0000000001'))
+
+        self.store.remove('trace.db.gzip-0000000001')
+        self.assertFalse(self.store.merged('trace.db.gzip-0000000001'))
+
+        self.assertEqual(
+            [10, 150, 160],
+            [ts for ts, _path, _data in
+             self.store.lookup(instanceid='foo.bar#0001')]
+        )
+        self.assertEqual(
+            [150],
+            [ts for ts, _path, _data in
+             self.store.lookup(instanceid='foo.bar#0001',
+                               since=100, until=155)]
+        )
+        self.assertEqual(
+            [20],
+            [ts for ts, _path, _data in self.store.lookup(app='foo.baz')]
+        )
+        self.assertEqual(4, len(list(self.store.lookup())))
+
+    @mock.patch('time.time', mock.Mock(return_value=200))
+    def test_expire(self):
+        """Test partitions past retention are removed."""
+        _make_snapshot(
+            os.path.join(self.root, 'trace.db.gzip-0000000001'),
+            [('/trace/0001/foo.bar#0001,10,h,pending,created', 10, None),
+             ('/trace/0001/foo.bar#0001,1500,h,scheduled,h', 1500, None)]
+        )
+        self.store.compact()
+        self.assertEqual(2, len(self.store.partitions()))
+
+        self.store.expire(now=1500)
+        self.assertEqual(
+            [os.path.join(self.root, 'trace.part-0000001500')],
+            self.store.partitions()
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
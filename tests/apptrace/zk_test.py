@@ -27,6 +27,7 @@ class AppTraceZKTest(mockzk.MockZookeeperTestCase):
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
     @mock.patch('time.time', mock.Mock(return_value=1000))
     def test_trace_cleanup(self):
         """"Tests tasks cleanup."""
@@ -59,6 +60,8 @@ class AppTraceZKTest(mockzk.MockZookeeperTestCase):
 
         self.make_mock_zk(zk_content)
         zkclient = kazoo.client.KazooClient()
+        txn = kazoo.client.KazooClient.transaction.return_value
+        txn.commit.return_value = [True] * 10
 
         zk.cleanup_trace(zkclient, 10, 3)
         self.assertFalse(kazoo.client.KazooClient.create.called)
@@ -78,13 +81,73 @@ class AppTraceZKTest(mockzk.MockZookeeperTestCase):
             makepath=True, ephemeral=False, sequence=True,
         )
 
-        self.assertEqual(10, kazoo.client.KazooClient.delete.call_count)
+        # Nodes are deleted in single multi-op transaction.
+        self.assertEqual(10, txn.delete.call_count)
+        self.assertEqual(1, txn.commit.call_count)
+        self.assertFalse(kazoo.client.KazooClient.delete.called)
+
+    @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
+    @mock.patch('time.time', mock.Mock(return_value=1000))
+    def test_trace_cleanup_cursor(self):
+        """"Tests shards are only listed when events may have expired."""
+        zk_content = {
+            'trace': {
+                '0001': {
+                    'app1#0001,985.00,s1,configured,2DqcoXnaIXEgy': {},
+                    'app1#0001,995.00,s1,configured,2DqcoXnaIXEgy': {},
+                    'app1#0001,1002.00,s1,configured,2DqcoXnaIXEgy': {},
+                },
+                '0002': {
+                    'app1#0002,998.00,s1,configured,2DqcoXnaIXEgy': {},
+                },
+            },
+        }
+
+        self.make_mock_zk(zk_content)
+        zkclient = kazoo.client.KazooClient()
+        txn = kazoo.client.KazooClient.transaction.return_value
+        txn.commit.return_value = [True] * 2
+        cursor = zk.CleanupCursor()
+
+        # One event expired, not enough for a batch.
+        self.assertEqual(1, zk.cleanup_trace(zkclient, 2, 10, cursor=cursor))
+        self.assertEqual({'0001': 995.0, '0002': 998.0}, cursor.horizon)
+
+        # Cutoff did not reach any shard horizon, only /trace is listed.
+        kazoo.client.KazooClient.get_children.reset_mock()
+        time.time.return_value = 1004
+        self.assertEqual(1, zk.cleanup_trace(zkclient, 2, 10, cursor=cursor))
+        kazoo.client.KazooClient.get_children.assert_called_once_with(
+            '/trace'
+        )
+
+        # Shard 0001 horizon expired, it is listed and batch is uploaded.
+        kazoo.client.KazooClient.get_children.reset_mock()
+        time.time.return_value = 1006
+        self.assertEqual(0, zk.cleanup_trace(zkclient, 2, 10, cursor=cursor))
+        self.assertEqual(
+            [mock.call('/trace'), mock.call('/trace/0001')],
+            kazoo.client.KazooClient.get_children.call_args_list
+        )
+        self.assertEqual(1, kazoo.client.KazooClient.create.call_count)
+        self.assertEqual(
+            [mock.call('/trace/0001/app1#0001,985.00,s1,configured,'
+                       '2DqcoXnaIXEgy'),
+             mock.call('/trace/0001/app1#0001,995.00,s1,configured,'
+                       '2DqcoXnaIXEgy')],
+            txn.delete.call_args_list
+        )
+        self.assertEqual({'0001': 1002.0, '0002': 998.0}, cursor.horizon)
 
     @mock.patch('kazoo.client.KazooClient.delete', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
     @mock.patch('time.time', mock.Mock(return_value=1000))
     def test_finished_cleanup(self):
         """"Tests tasks cleanup."""
@@ -112,6 +175,8 @@ class AppTraceZKTest(mockzk.MockZookeeperTestCase):
 
         self.make_mock_zk(zk_content)
         zkclient = kazoo.client.KazooClient()
+        txn = kazoo.client.KazooClient.transaction.return_value
+        txn.commit.return_value = [True] * 5
 
         zk.cleanup_finished(zkclient, 10, 3)
         self.assertFalse(kazoo.client.KazooClient.create.called)
@@ -131,7 +196,34 @@ class AppTraceZKTest(mockzk.MockZookeeperTestCase):
             makepath=True, ephemeral=False, sequence=True,
         )
 
-        self.assertEqual(5, kazoo.client.KazooClient.delete.call_count)
+        self.assertEqual(5, txn.delete.call_count)
+        self.assertFalse(kazoo.client.KazooClient.delete.called)
+
+
+class CleanupCursorTest(unittest.TestCase):
+    """Test cleanup cursor persistence."""
+
+    def test_save_load(self):
+        """Test cursor is stored without pending and loaded back."""
+        zkclient = mock.Mock()
+        cursor = zk.CleanupCursor()
+        cursor.horizon = {'0001': 995.0, '0002': 998.0}
+        cursor.modified = {'app1#0001': 900.0}
+        cursor.pending = {'/trace/0001/app1#0001,985.00,s1,configured,x': 1}
+
+        cursor.save(zkclient, 'trace')
+        path, payload = zkclient.create.call_args[0]
+        self.assertEqual('/trace.cleanup/trace', path)
+
+        zkclient.get.return_value = (payload, None)
+        loaded = zk.CleanupCursor.load(zkclient, 'trace')
+        # Shard with pending nodes is listed again.
+        self.assertEqual({'0002': 998.0}, loaded.horizon)
+        self.assertEqual({'app1#0001': 900.0}, loaded.modified)
+        self.assertEqual({}, loaded.pending)
+
+        zkclient.get.side_effect = kazoo.client.NoNodeError
+        self.assertEqual({}, zk.CleanupCursor.load(zkclient, 'x').horizon)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 """Unit test for treadmill.cli.
 """
 
+import subprocess
 import sys
 import unittest
 
@@ -82,5 +83,34 @@ class CliTest(unittest.TestCase):
         self.assertEqual(None, cli.combine(['-']))
 
 
+class LazyImportTest(unittest.TestCase):
+    """Test CLI startup does not import heavyweight modules."""
+
+    def test_sproc_group(self):
+        """Test loading sproc group imports no LDAP, Zookeeper or pandas."""
+        script = '''
+import sys
+
+import click
+
+from treadmill import console
+
+console.run.get_command(click.Context(console.run), 'sproc')
+print(' '.join(sorted(sys.modules)))
+'''
+        # Not check_output, which ipa_test replaces with a mock.
+        proc = subprocess.Popen([sys.executable, '-c', script],
+                                stdout=subprocess.PIPE)
+        output, _err = proc.communicate()
+        self.assertEqual(0, proc.returncode)
+
+        loaded = output.decode().split()
+
+        self.assertIn('treadmill.cli.sproc', loaded)
+        heavy = ['ldap3', 'kazoo', 'dns', 'pandas', 'numpy', 'pkg_resources',
+                 'treadmill.admin', 'treadmill.scheduler']
+        self.assertEqual([], [module for module in heavy if module in loaded])
+
+
 if __name__ == '__main__':
     unittest.main()
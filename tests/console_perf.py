@@ -0,0 +1,54 @@
+"""Performance test for treadmill CLI startup.
+"""
+
+import subprocess
+import sys
+import timeit
+
+
+_RUNS = 10
+
+_COMMANDS = {
+    'import treadmill.console': '''
+from treadmill import console
+''',
+    'load sproc group': '''
+import click
+
+from treadmill import console
+
+console.run.get_command(click.Context(console.run), 'sproc')
+''',
+    'load admin scheduler group': '''
+import click
+
+from treadmill.cli.admin import scheduler
+
+scheduler.init()
+''',
+}
+
+
+def measure(name, script):
+    """Print average wall time of running the script in a new interpreter."""
+
+    def _run():
+        """Run script in a new interpreter."""
+        subprocess.check_call([sys.executable, '-c', script])
+
+    # Warm up, compiles the modules and fills the page cache.
+    _run()
+
+    interval = timeit.timeit(stmt=_run, number=_RUNS)
+    print('%-40s %6.1fms' % (name, 1e3 * interval / _RUNS))
+
+
+def measure_baseline():
+    """Print average wall time of starting the interpreter only."""
+    measure('python -c pass', 'pass')
+
+
+if __name__ == '__main__':
+    measure_baseline()
+    for command_name, command_script in sorted(_COMMANDS.items()):
+        measure(command_name, command_script)
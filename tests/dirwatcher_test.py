@@ -61,6 +61,60 @@ class DirWatcherTest(unittest.TestCase):
             res,
         )
 
+    def test_coalesce(self):
+        """Tests merging of events into net effect per path."""
+        created = dirwatch.DirWatcherEvent.CREATED
+        modified = dirwatch.DirWatcherEvent.MODIFIED
+        deleted = dirwatch.DirWatcherEvent.DELETED
+
+        self.assertEqual(
+            [
+                (modified, '/b'),
+                (created, '/a'),
+                (deleted, '/d'),
+                (deleted, '/e'),
+                (created, '/e'),
+                (created, '/f'),
+            ],
+            dirwatch.coalesce([
+                (created, '/a'),
+                (modified, '/b'),
+                (modified, '/a'),
+                (created, '/c'),
+                (modified, '/c'),
+                (deleted, '/c'),
+                (modified, '/d'),
+                (deleted, '/d'),
+                (deleted, '/e'),
+                (created, '/e'),
+                (modified, '/f'),
+                (created, '/f'),
+            ])
+        )
+
+    def test_watcher_coalesce(self):
+        """Tests tempfile + rename is delivered as single create."""
+        created = []
+        modified = []
+        deleted = []
+        test_file = os.path.join(self.root, 'a')
+
+        watcher = dirwatch.DirWatcher(self.root, coalesce_window=0.01)
+        watcher.on_created = created.append
+        watcher.on_modified = modified.append
+        watcher.on_deleted = deleted.append
+
+        with open(os.path.join(self.root, '.a'), 'w') as f:
+            f.write('hello')
+        os.rename(os.path.join(self.root, '.a'), test_file)
+
+        watcher.process_events()
+
+        self.assertEqual([test_file], created)
+        self.assertEqual([], modified)
+        self.assertEqual([], deleted)
+        self.assertEqual(watcher.events_read - 1, watcher.events_coalesced)
+
     @unittest.skipUnless(sys.platform == 'linux2', 'Requires Linux')
     @mock.patch('select.poll', mock.Mock())
     def test_signal(self):
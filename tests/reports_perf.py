@@ -0,0 +1,54 @@
+"""Performance test for treadmill.reports
+"""
+
+import timeit
+
+import pandas as pd
+
+from treadmill import reports
+
+
+_SAMPLES = (100, 1000, 3000)
+
+_APPS = 500
+
+
+def _apps_df():
+    """Return app queue dataframe with 50 app names."""
+    return pd.DataFrame({
+        'instance': ['app%d.xxx#%d' % (idx % 50, idx)
+                     for idx in range(_APPS)],
+        'cpu': [10.0] * _APPS,
+        'memory': [100.0] * _APPS,
+        'disk': [1000.0] * _APPS,
+        'util': [idx / _APPS for idx in range(_APPS)],
+    }).set_index('instance')
+
+
+def compare(samples):
+    """Compare utilization history time, per sample frames vs matrix."""
+    apps_df = _apps_df()
+
+    def _appended():
+        """Grow the frame by a sample at a time, as utilization() does."""
+        util = None
+        for _ in range(samples):
+            util = reports.utilization(util, apps_df)
+
+    def _preallocated():
+        """Collect samples in UtilizationHistory."""
+        history = reports.UtilizationHistory()
+        for _ in range(samples):
+            history.add(apps_df)
+        history.frame()
+
+    before = timeit.timeit(stmt=_appended, number=1)
+    after = timeit.timeit(stmt=_preallocated, number=1)
+    print('%-20s before: %8.1fms after: %8.1fms' % (
+        '%d samples' % samples, 1e3 * before, 1e3 * after,
+    ))
+
+
+if __name__ == '__main__':
+    for count in _SAMPLES:
+        compare(count)
@@ -149,6 +149,42 @@ class ReportsTest(unittest.TestCase):
         self.assertEqual(util1.ix[time0]['bla.xxx']['cpu'], 1)
         self.assertEqual(util1.ix[time1]['foo.xxx']['count'], 2)
 
+    def test_utilization_history(self):
+        """Tests utilization samples are collected in preallocated matrix."""
+        app1 = scheduler.Application('foo.xxx#1', 100,
+                                     demand=[1, 1, 1],
+                                     affinity='foo.xxx')
+        app2 = scheduler.Application('bla.xxx#2', 50,
+                                     demand=[2, 2, 2],
+                                     affinity='bla.xxx')
+
+        alloc = self.cell.partitions[None].allocation
+        alloc.get_sub_alloc('t1').get_sub_alloc('t3').get_sub_alloc(
+            'a2').add(app1)
+        self.cell.schedule()
+        foo_df = reports.apps(self.cell)
+
+        alloc.get_sub_alloc('t2').get_sub_alloc('a1').add(app2)
+        self.cell.schedule()
+        all_df = reports.apps(self.cell)
+
+        history = reports.UtilizationHistory(size=1)
+        history.add(foo_df, when=100)
+        history.add(all_df, when=101)
+        history.add(pd.DataFrame(), when=102)
+        self.assertEqual(3, len(history))
+
+        util = history.frame()
+        time0 = pd.Timestamp(datetime.datetime.fromtimestamp(100))
+        time1 = pd.Timestamp(datetime.datetime.fromtimestamp(101))
+        time2 = pd.Timestamp(datetime.datetime.fromtimestamp(102))
+        self.assertEqual([time0, time1, time2], list(util.index))
+        self.assertEqual(util.loc[time0, ('foo.xxx', 'cpu')], 1)
+        self.assertTrue(pd.isnull(util.loc[time0, ('bla.xxx', 'cpu')]))
+        self.assertEqual(util.loc[time1, ('bla.xxx', 'memory')], 2)
+        self.assertEqual(util.loc[time1, ('foo.xxx', 'count')], 1)
+        self.assertTrue(util.loc[time2].isnull().all())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -26,6 +26,7 @@ class ServerTest(unittest.TestCase):
                              content_type='application/json',
                              credentials=False)
         self.impl = mock.Mock()
+        self.impl.version.return_value = None
 
         server.init(api, cors, self.impl)
         self.client = self.app.test_client()
@@ -45,19 +46,19 @@ class ServerTest(unittest.TestCase):
             server_list
         )
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with(None, None)
+        self.impl.list.assert_called_with(None, None, None, None, None)
 
         resp = self.client.get('/server/?cell=foo')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with('foo', None)
+        self.impl.list.assert_called_with('foo', None, None, None, None)
 
         resp = self.client.get('/server/?partition=baz')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with(None, 'baz')
+        self.impl.list.assert_called_with(None, 'baz', None, None, None)
 
         resp = self.client.get('/server/?cell=foo&partition=baz')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with('foo', 'baz')
+        self.impl.list.assert_called_with('foo', 'baz', None, None, None)
 
 
 if __name__ == '__main__':
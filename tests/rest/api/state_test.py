@@ -29,6 +29,7 @@ class StateTest(unittest.TestCase):
                              content_type='application/json',
                              credentials=False)
         self.impl = mock.Mock()
+        self.impl.version.return_value = None
 
         state.init(api, cors, self.impl)
         self.client = self.app.test_client()
@@ -57,23 +58,57 @@ class StateTest(unittest.TestCase):
              'state': 'finished', 'exitcode': None}
         ])
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with(None, False)
+        self.impl.list.assert_called_with(None, False, None, None)
 
         resp = self.client.get('/state/?match=test*')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with('test*', False)
+        self.impl.list.assert_called_with('test*', False, None, None)
 
         resp = self.client.get('/state/?finished=true')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with(None, True)
+        self.impl.list.assert_called_with(None, True, None, None)
 
         resp = self.client.get('/state/?finished=false')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with(None, False)
+        self.impl.list.assert_called_with(None, False, None, None)
 
         resp = self.client.get('/state/?match=test*&finished=true')
         self.assertEqual(resp.status_code, http.client.OK)
-        self.impl.list.assert_called_with('test*', True)
+        self.impl.list.assert_called_with('test*', True, None, None)
+
+    def test_get_state_list_not_modified(self):
+        """Test conditional get of the state list."""
+        self.impl.list.return_value = []
+        self.impl.version.return_value = {'version': 'abc', 'mtime': 100.0}
+
+        resp = self.client.get('/state/')
+        self.assertEqual(resp.status_code, http.client.OK)
+        etag = resp.headers['ETag']
+        self.assertEqual(resp.headers['Cache-Control'], 'no-cache')
+        self.assertEqual(resp.headers['Last-Modified'],
+                         'Thu, 01 Jan 1970 00:01:40 GMT')
+
+        self.impl.list.reset_mock()
+        resp = self.client.get('/state/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, http.client.NOT_MODIFIED)
+        self.assertEqual(resp.headers['ETag'], etag)
+        self.assertFalse(self.impl.list.called)
+
+        resp = self.client.get(
+            '/state/',
+            headers={'If-Modified-Since': 'Thu, 01 Jan 1970 00:01:40 GMT'}
+        )
+        self.assertEqual(resp.status_code, http.client.NOT_MODIFIED)
+
+        # Query is part of the ETag.
+        resp = self.client.get('/state/?finished=true',
+                               headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, http.client.OK)
+
+        self.impl.version.return_value = {'version': 'abd'}
+        resp = self.client.get('/state/', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, http.client.OK)
+        self.assertNotEqual(resp.headers['ETag'], etag)
 
     @unittest.skip('BROKEN: Flask exception handling')
     def test_get_state(self):
@@ -0,0 +1,138 @@
+"""Unit test for thread pool WSGI container.
+"""
+
+import threading
+import unittest
+
+import mock
+import tornado.concurrent
+import tornado.gen
+import tornado.ioloop
+from tornado import httputil
+
+from treadmill.rest import container
+
+
+def _request(uri):
+    """Create request with mock connection."""
+    return httputil.HTTPServerRequest(
+        method='GET', uri=uri, body=b'', host='localhost',
+        headers=httputil.HTTPHeaders(),
+        connection=mock.Mock(context=mock.Mock(remote_ip='127.0.0.1'))
+    )
+
+
+class PooledWSGIContainerTest(unittest.TestCase):
+    """Test treadmill.rest.container."""
+
+    def setUp(self):
+        self.loop = tornado.ioloop.IOLoop()
+        self.loop.make_current()
+        self.release = threading.Event()
+        self.running = []
+
+    def tearDown(self):
+        self.release.set()
+        self.loop.clear_current()
+        self.loop.close(all_fds=True)
+
+    def _app(self, environ, start_response):
+        """WSGI app blocking /instance requests until released."""
+        path = environ['PATH_INFO']
+        self.running.append(path)
+        if path.startswith('/instance'):
+            self.release.wait(5)
+        if path == '/error':
+            raise Exception('boom')
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [path.encode()]
+
+    def _wait_for(self, predicate):
+        """Run IOLoop until predicate is true."""
+        @tornado.gen.coroutine
+        def _poll():
+            """Poll predicate."""
+            while not predicate():
+                yield tornado.gen.sleep(0.01)
+
+        self.loop.run_sync(_poll, timeout=5)
+
+    def _wait(self, requests):
+        """Run IOLoop until all requests are finished."""
+        self._wait_for(
+            lambda: all(req.connection.finish.called for req in requests)
+        )
+
+    def test_route_limit(self):
+        """Test slow route does not block other routes."""
+        wsgi = container.PooledWSGIContainer(self._app, 4,
+                                             {'instance': '1'},
+                                             routes=['/state/<name>'])
+        slow = [_request('/instance/foo.bar'), _request('/instance/foo.baz')]
+        fast = [_request('/state/'), _request('/error')]
+        for request in slow + fast:
+            wsgi(request)
+
+        self._wait(fast)
+        self.assertNotIn('/instance/foo.baz', self.running)
+        stats = wsgi.stats()
+        self.assertEqual(1, stats['/instance']['active'])
+        self.assertEqual(1, stats['/instance']['pending'])
+        self.assertEqual(1, stats['/state']['requests'])
+        # Unknown paths are counted in a single route.
+        self.assertEqual(1, stats['/other']['requests'])
+        self.assertEqual(['/instance', '/other', '/state'], sorted(stats))
+
+        start_line, headers = fast[0].connection.write_headers.call_args[0]
+        self.assertEqual(200, start_line.code)
+        self.assertEqual('7', headers['Content-Length'])
+        self.assertEqual(
+            500, fast[1].connection.write_headers.call_args[0][0].code
+        )
+
+        self.release.set()
+        self._wait(slow)
+        stats = wsgi.stats()
+        self.assertEqual(2, stats['/instance']['requests'])
+        self.assertEqual(0, stats['/instance']['active'])
+        self.assertEqual(0, stats['/instance']['pending'])
+        self.assertGreater(stats['/instance']['max_queue_ms'], 0)
+
+    def test_stream(self):
+        """Test response without Content-Length is streamed."""
+        def _app(_environ, start_response):
+            """WSGI app generating the response."""
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            yield b'['
+            yield b'1'
+            yield b']'
+
+        done = tornado.concurrent.Future()
+        done.set_result(None)
+
+        request = _request('/state/')
+        request.connection.write_headers.return_value = done
+        request.connection.write.return_value = done
+
+        wsgi = container.PooledWSGIContainer(_app, 1)
+        wsgi(request)
+        self._wait([request])
+
+        _start_line, headers = request.connection.write_headers.call_args[0]
+        self.assertNotIn('Content-Length', headers)
+        request.connection.write.assert_called_once_with(b'[1]')
+
+        # Client gone, streaming is aborted.
+        closed = tornado.concurrent.Future()
+        closed.set_exception(IOError('Stream is closed'))
+
+        request = _request('/state/')
+        request.connection.write_headers.return_value = closed
+        wsgi(request)
+        self._wait_for(lambda: request.connection.close.called)
+        self.assertFalse(request.connection.write.called)
+        self.assertFalse(request.connection.finish.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 """Unit test for treadmill.restclient
 """
 
+import threading
 import unittest
 import http.client
 
@@ -18,7 +19,7 @@ class RESTClientTest(unittest.TestCase):
         """Setup common test variables"""
         pass
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_ok(self, resp_mock):
         """Test treadmill.restclient.get OK (200)"""
@@ -30,7 +31,7 @@ class RESTClientTest(unittest.TestCase):
         self.assertIsNotNone(resp)
         self.assertEqual(resp.text, 'foo')
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_404(self, resp_mock):
         """Test treadmill.restclient.get NOT_FOUND (404)"""
@@ -39,7 +40,7 @@ class RESTClientTest(unittest.TestCase):
         with self.assertRaises(restclient.NotFoundError):
             restclient.get('http://foo.com', '/')
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_302(self, resp_mock):
         """Test treadmill.restclient.get FOUND (302)"""
@@ -48,7 +49,7 @@ class RESTClientTest(unittest.TestCase):
         with self.assertRaises(restclient.AlreadyExistsError):
             restclient.get('http://foo.com', '/')
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_424(self, resp_mock):
         """Test treadmill.restclient.get FAILED_DEPENDENCY (424)"""
@@ -58,7 +59,7 @@ class RESTClientTest(unittest.TestCase):
         with self.assertRaises(restclient.ValidationError):
             restclient.get('http://foo.com', '/')
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_401(self, resp_mock):
         """Test treadmill.restclient.get UNAUTHORIZED (401)"""
@@ -68,7 +69,7 @@ class RESTClientTest(unittest.TestCase):
         with self.assertRaises(restclient.NotAuthorizedError):
             restclient.get('http://foo.com', '/')
 
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 return_value=mock.MagicMock(requests.Response))
     def test_get_bad_json(self, resp_mock):
         """Test treadmill.restclient.get bad JSON"""
@@ -84,7 +85,7 @@ class RESTClientTest(unittest.TestCase):
 
     @mock.patch('time.sleep', mock.Mock())
     @mock.patch('treadmill.restclient._handle_error', mock.Mock())
-    @mock.patch('requests.get', mock.Mock())
+    @mock.patch('requests.Session.get', mock.Mock())
     def test_retry(self):
         """Tests retry logic."""
 
@@ -100,7 +101,7 @@ class RESTClientTest(unittest.TestCase):
         # Requests are done in order, by because other methods are being
         # callled, to make test simpler, any_order is set to True so that
         # test will pass.
-        requests.get.assert_has_calls([
+        requests.Session.get.assert_has_calls([
             mock.call('http://foo.com/baz', json=None, proxies=None,
                       headers=None, auth=mock.ANY, timeout=(.5, 10),
                       stream=None),
@@ -120,10 +121,10 @@ class RESTClientTest(unittest.TestCase):
                       headers=None, auth=mock.ANY, timeout=(2.5, 10),
                       stream=None),
         ], any_order=True)
-        self.assertEqual(requests.get.call_count, 6)
+        self.assertEqual(requests.Session.get.call_count, 6)
 
     @mock.patch('time.sleep', mock.Mock())
-    @mock.patch('requests.get',
+    @mock.patch('requests.Session.get',
                 side_effect=requests.exceptions.ConnectionError)
     def test_retry_on_connection_error(self, _):
         """Test retry on connection error"""
@@ -134,7 +135,8 @@ class RESTClientTest(unittest.TestCase):
         self.assertEqual(len(err.attempts), 5)
 
     @mock.patch('time.sleep', mock.Mock())
-    @mock.patch('requests.get', side_effect=requests.exceptions.Timeout)
+    @mock.patch('requests.Session.get',
+                side_effect=requests.exceptions.Timeout)
     def test_retry_on_request_timeout(self, _):
         """Test retry on request timeout"""
 
@@ -144,7 +146,8 @@ class RESTClientTest(unittest.TestCase):
         self.assertEqual(len(err.attempts), 5)
 
     @mock.patch('time.sleep', mock.Mock())
-    @mock.patch('requests.get', return_value=mock.MagicMock(requests.Response))
+    @mock.patch('requests.Session.get',
+                return_value=mock.MagicMock(requests.Response))
     def test_retry_on_503(self, resp_mock):
         """Test retry for status code that should be retried (e.g. 503)"""
         resp_mock.return_value.status_code = http.client.SERVICE_UNAVAILABLE
@@ -152,7 +155,8 @@ class RESTClientTest(unittest.TestCase):
         with self.assertRaises(restclient.MaxRequestRetriesError):
             restclient.get('http://foo.com', '/')
 
-    @mock.patch('requests.get', return_value=mock.MagicMock(requests.Response))
+    @mock.patch('requests.Session.get',
+                return_value=mock.MagicMock(requests.Response))
     def test_default_timeout_get(self, resp_mock):
         """Tests that default timeout for get request is set correctly."""
         resp_mock.return_value.status_code = http.client.OK
@@ -163,7 +167,7 @@ class RESTClientTest(unittest.TestCase):
             headers=None, json=None, timeout=(0.5, 10), proxies=None
         )
 
-    @mock.patch('requests.delete',
+    @mock.patch('requests.Session.delete',
                 return_value=mock.MagicMock(requests.Response))
     def test_default_timeout_delete(self, resp_mock):
         """Tests that default timeout for delete request is set correctly."""
@@ -175,7 +179,7 @@ class RESTClientTest(unittest.TestCase):
             headers=None, json=None, timeout=(0.5, None), proxies=None
         )
 
-    @mock.patch('requests.post',
+    @mock.patch('requests.Session.post',
                 return_value=mock.MagicMock(requests.Response))
     def test_default_timeout_post(self, resp_mock):
         """Tests that default timeout for post request is set correctly."""
@@ -187,7 +191,8 @@ class RESTClientTest(unittest.TestCase):
             headers=None, json='', timeout=(0.5, None), proxies=None
         )
 
-    @mock.patch('requests.put', return_value=mock.MagicMock(requests.Response))
+    @mock.patch('requests.Session.put',
+                return_value=mock.MagicMock(requests.Response))
     def test_default_timeout_put(self, resp_mock):
         """Tests that default timeout for put request is set correctly."""
         resp_mock.return_value.status_code = http.client.OK
@@ -198,6 +203,85 @@ class RESTClientTest(unittest.TestCase):
             headers=None, json='', timeout=(0.5, None), proxies=None
         )
 
+    @mock.patch('requests.Session.get',
+                return_value=mock.MagicMock(requests.Response))
+    def test_session_reuse(self, resp_mock):
+        """Tests sessions are reused per API endpoint."""
+        # Access to protected member: _session
+        #
+        # pylint: disable=W0212
+        resp_mock.return_value.status_code = http.client.OK
+        restclient.get('http://foo.com', '/a')
+        restclient.get('http://foo.com', '/b')
+
+        session = restclient._session('http://foo.com/c')
+        self.assertIs(session, restclient._session('http://foo.com/'))
+        self.assertIsNot(session, restclient._session('http://bar.com/'))
+        self.assertIsNot(session, restclient._session('https://foo.com/'))
+
+    @mock.patch('requests.Session.get')
+    def test_hedged_get(self, get_mock):
+        """Tests slow endpoint is hedged with the next one."""
+        release = threading.Event()
+        response = mock.MagicMock(requests.Response)
+        response.status_code = http.client.OK
+        closed = threading.Event()
+        slow_response = mock.MagicMock(requests.Response)
+        slow_response.status_code = http.client.OK
+        slow_response.close.side_effect = closed.set
+
+        def _get(url, **_kwargs):
+            """Block first endpoint until released."""
+            if url.startswith('http://foo.com'):
+                release.wait(5)
+                return slow_response
+            return response
+
+        get_mock.side_effect = _get
+        restclient.set_session_options(hedge_delay=0.01)
+        try:
+            # Hedge delay is kept when other options are set.
+            restclient.set_session_options(pool_size=restclient._POOL_SIZE)
+            self.assertIs(
+                response,
+                restclient.get(['http://foo.com', 'http://bar.com'], '/baz')
+            )
+        finally:
+            release.set()
+            restclient.set_session_options(hedge_delay=-1)
+
+        # Response of the slow endpoint is closed once it completes.
+        self.assertTrue(closed.wait(5))
+        self.assertFalse(response.close.called)
+        self.assertIsNone(restclient._HEDGE_DELAY)
+
+        get_mock.assert_has_calls([
+            mock.call('http://foo.com/baz', json=None, proxies=None,
+                      headers=None, auth=mock.ANY, timeout=(.5, 10),
+                      stream=None),
+            mock.call('http://bar.com/baz', json=None, proxies=None,
+                      headers=None, auth=mock.ANY, timeout=(.5, 10),
+                      stream=None),
+        ])
+
+    @mock.patch('requests.Session.get')
+    def test_get_not_modified(self, get_mock):
+        """Tests cached response is revalidated with If-None-Match."""
+        response = mock.MagicMock(requests.Response)
+        response.status_code = http.client.OK
+        response.headers = {'ETag': '"abc"'}
+        not_modified = mock.MagicMock(requests.Response)
+        not_modified.status_code = http.client.NOT_MODIFIED
+        get_mock.side_effect = [response, not_modified]
+
+        self.assertIs(response, restclient.get('http://foo.com', '/etag'))
+        self.assertIs(response, restclient.get('http://foo.com', '/etag'))
+        get_mock.assert_called_with(
+            'http://foo.com/etag', json=None, proxies=None,
+            headers={'If-None-Match': '"abc"'}, auth=mock.ANY,
+            timeout=(.5, 10), stream=None
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -38,6 +38,20 @@ class SchemaTest(unittest.TestCase):
             jsonschema.exceptions.ValidationError,
             _kwargs, '1', '1', str_arg=1)
 
+    def test_validator(self):
+        """Test validators are compiled once, with refs resolved."""
+        validator = schema.validator({'$ref': 'instance.json#/resource_id'})
+        self.assertIs(
+            validator,
+            schema.validator({'$ref': 'instance.json#/resource_id'})
+        )
+        self.assertNotIn('$ref', validator.schema)
+
+        validator.validate('foo.bar#0000000001')
+        self.assertRaises(
+            jsonschema.exceptions.ValidationError,
+            validator.validate, 'foo.bar')
+
 
 if __name__ == '__main__':
     unittest.main()
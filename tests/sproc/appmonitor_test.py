@@ -40,8 +40,12 @@ class AppMonitorTest(unittest.TestCase):
         time.time.return_value = 101
 
         instance_api = mock.MagicMock()
+        instance_api.bulk_create.side_effect = lambda rsrcs: [
+            {'_id': rsrc['_id'], 'instances': [rsrc['_id']] * rsrc['count']}
+            for rsrc in rsrcs
+        ]
         appmonitor.reevaluate(instance_api, state)
-        self.assertFalse(instance_api.create.called)
+        self.assertFalse(instance_api.bulk_create.called)
         self.assertFalse(instance_api.delete.called)
 
         state['scheduled']['foo.baz'].append('foo.baz#5')
@@ -67,27 +71,37 @@ class AppMonitorTest(unittest.TestCase):
         self.assertEquals(3.0, state['monitors']['foo.bar']['available'])
 
         # Need to create two instance, 3 available.
-        instance_api.create.reset_mock()
+        instance_api.bulk_create.reset_mock()
         state['scheduled']['foo.bar'] = []
 
         appmonitor.reevaluate(instance_api, state)
-        instance_api.create.assert_called_with('foo.bar', {}, count=2)
+        instance_api.bulk_create.assert_called_with(
+            [{'_id': 'foo.bar', 'count': 2}]
+        )
         self.assertEquals(1.0, state['monitors']['foo.bar']['available'])
 
-        instance_api.create.reset_mock()
+        instance_api.bulk_create.reset_mock()
         appmonitor.reevaluate(instance_api, state)
-        instance_api.create.assert_called_with('foo.bar', {}, count=1)
+        instance_api.bulk_create.assert_called_with(
+            [{'_id': 'foo.bar', 'count': 1}]
+        )
         self.assertEquals(0.0, state['monitors']['foo.bar']['available'])
 
         # No available, create not called.
-        instance_api.create.reset_mock()
+        instance_api.bulk_create.reset_mock()
         appmonitor.reevaluate(instance_api, state)
-        self.assertFalse(instance_api.create.called)
+        self.assertFalse(instance_api.bulk_create.called)
 
+        # Failed creates do not use tokens.
         time.time.return_value = 104
+        instance_api.bulk_create.side_effect = lambda rsrcs: [
+            {'_error': {'_id': rsrc['_id'], 'why': 'boom'}} for rsrc in rsrcs
+        ]
         appmonitor.reevaluate(instance_api, state)
-        instance_api.create.assert_called_with('foo.bar', {}, count=1)
-        self.assertEquals(0.0, state['monitors']['foo.bar']['available'])
+        instance_api.bulk_create.assert_called_with(
+            [{'_id': 'foo.bar', 'count': 1}]
+        )
+        self.assertEquals(1.0, state['monitors']['foo.bar']['available'])
 
 
 if __name__ == '__main__':
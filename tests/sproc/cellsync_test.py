@@ -0,0 +1,107 @@
+"""Unit test for treadmill.sproc.cellsync
+"""
+
+import unittest
+
+import mock
+
+from treadmill import admin
+from treadmill import context
+from treadmill.sproc import cellsync
+
+
+class CellSyncTest(unittest.TestCase):
+    """Test treadmill.sproc.cellsync"""
+
+    def setUp(self):
+        context.GLOBAL.cell = 'test'
+
+    @mock.patch('treadmill.context.AdminContext.conn', mock.Mock())
+    @mock.patch('treadmill.admin.AppGroup.list_modified', mock.Mock())
+    @mock.patch('treadmill.admin.CellAllocation.list_modified', mock.Mock())
+    @mock.patch('treadmill.admin.CellAllocation.list', mock.Mock())
+    @mock.patch('treadmill.zkutils.put', mock.Mock())
+    @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
+    def test_sync(self):
+        """Test only objects modified since last sync are written."""
+        zkclient = mock.Mock()
+        zkclient.get_children.return_value = ['foo.extra']
+        admin.AppGroup.list_modified.return_value = (
+            [{'_id': 'foo.a', 'cells': ['test'], 'pattern': 'foo.a*'},
+             {'_id': 'foo.b', 'cells': ['other'], 'pattern': 'foo.b*'}],
+            '20170101000000Z'
+        )
+        admin.CellAllocation.list_modified.return_value = (
+            [{'_id': 'foo/prod/test', 'memory': '1G'}], '20170101000000Z'
+        )
+
+        cell_sync = cellsync._CellSync(zkclient)
+        cell_sync.full_sync()
+
+        admin.AppGroup.list_modified.assert_called_with({})
+        self.assertEqual(['foo.a'], list(cell_sync.app_groups))
+        cellsync.zkutils.ensure_deleted.assert_called_with(
+            zkclient, '/app-groups/foo.extra'
+        )
+        cellsync.zkutils.put.assert_called_with(
+            zkclient, '/allocations',
+            [{'_id': 'foo/prod/test', 'name': 'foo/prod', 'memory': '1G'}],
+            check_content=True
+        )
+
+        # Nothing modified, nothing written.
+        cellsync.zkutils.put.reset_mock()
+        admin.AppGroup.list_modified.return_value = (
+            [{'_id': 'foo.a', 'cells': ['test'], 'pattern': 'foo.a*'}],
+            '20170101000000Z'
+        )
+        admin.CellAllocation.list_modified.return_value = (
+            [], '20170101000000Z'
+        )
+        cell_sync.sync()
+        admin.AppGroup.list_modified.assert_called_with(
+            {}, since='20170101000000Z'
+        )
+        self.assertFalse(cellsync.zkutils.put.called)
+        self.assertFalse(admin.CellAllocation.list.called)
+
+        # Modified app group and allocation are written.
+        admin.AppGroup.list_modified.return_value = (
+            [{'_id': 'foo.a', 'cells': ['test'], 'pattern': 'foo.x*'}],
+            '20170101000100Z'
+        )
+        admin.CellAllocation.list_modified.return_value = (
+            [{'_id': 'foo/prod/test', 'memory': '2G'}], '20170101000100Z'
+        )
+        admin.CellAllocation.list.return_value = [
+            {'_id': 'foo/prod/test', 'memory': '2G'},
+        ]
+        cell_sync.sync()
+        cellsync.zkutils.put.assert_has_calls([
+            mock.call(zkclient, '/app-groups/foo.a',
+                      {'cells': ['test'], 'pattern': 'foo.x*'}),
+            mock.call(zkclient, '/allocations',
+                      [{'_id': 'foo/prod/test', 'name': 'foo/prod',
+                        'memory': '2G'}]),
+        ])
+        self.assertEqual('20170101000100Z', cell_sync.app_groups_since)
+
+        # App group moved to other cell is deleted.
+        cellsync.zkutils.ensure_deleted.reset_mock()
+        admin.AppGroup.list_modified.return_value = (
+            [{'_id': 'foo.a', 'cells': ['other'], 'pattern': 'foo.x*'},
+             {'_id': 'foo.b', 'cells': ['other'], 'pattern': 'foo.b*'}],
+            '20170101000200Z'
+        )
+        admin.CellAllocation.list_modified.return_value = (
+            [], '20170101000200Z'
+        )
+        cell_sync.sync()
+        cellsync.zkutils.ensure_deleted.assert_called_once_with(
+            zkclient, '/app-groups/foo.a'
+        )
+        self.assertEqual({}, cell_sync.app_groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
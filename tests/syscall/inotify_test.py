@@ -0,0 +1,52 @@
+"""Unit test for inotify wrapper.
+"""
+
+import struct
+import unittest
+
+from treadmill.syscall import inotify
+
+
+def _event(wd, mask, cookie, name, length):
+    """Pack inotify_event struct, name padded with nulls to length."""
+    name = name.encode()
+    return struct.pack('iIII', wd, mask, cookie, length) + name + (
+        b'\x00' * (length - len(name))
+    )
+
+
+class InotifyTest(unittest.TestCase):
+    """Tests for treadmill.syscall.inotify."""
+
+    def test_parse_buffer(self):
+        """Test parsing of event buffer."""
+        # Access to protected member: _parse_buffer
+        #
+        # pylint: disable=W0212
+        event_buffer = (
+            _event(1, inotify.IN_CREATE, 0, 'foo', 16) +
+            _event(2, inotify.IN_DELETE_SELF, 0, '', 0) +
+            _event(1, inotify.IN_MOVED_TO, 5, 'bär', 16)
+        )
+        expected = [
+            (1, inotify.IN_CREATE, 0, 'foo'),
+            (2, inotify.IN_DELETE_SELF, 0, ''),
+            (1, inotify.IN_MOVED_TO, 5, 'bär'),
+        ]
+        self.assertEqual(expected,
+                         list(inotify._parse_buffer(event_buffer)))
+
+        # Reused read buffer, only the first size bytes are valid.
+        read_buffer = bytearray(256)
+        read_buffer[:len(event_buffer)] = event_buffer
+        self.assertEqual(
+            expected,
+            list(inotify._parse_buffer(read_buffer, len(event_buffer)))
+        )
+
+        with self.assertRaises(AssertionError):
+            list(inotify._parse_buffer(event_buffer[:-4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -101,6 +101,26 @@ class MockZookeeperMetadata(namedtuple('MockZookeeperMetadata',
                    children_count=children_count)
 
 
+class MockAsyncResult(object):
+    """Mock of kazoo async result, evaluated at construction time."""
+
+    def __init__(self, func, *args, **kwargs):
+        self._value = None
+        self._exception = None
+        try:
+            self._value = func(*args, **kwargs)
+        except Exception as err:  # pylint: disable=W0703
+            self._exception = err
+
+    def get(self, block=True, timeout=None):
+        """Return the value or raise the exception."""
+        del block
+        del timeout
+        if self._exception is not None:
+            raise self._exception
+        return self._value
+
+
 class MockZookeeperTestCase(unittest.TestCase):
     """Helper class to mock Zk get[children] events."""
     # Disable too many branches warning.
@@ -213,6 +233,10 @@ class MockZookeeperTestCase(unittest.TestCase):
             else:
                 return []
 
+        def mock_get_async(zkpath, watch=None):
+            """Mocks asynchronous get, result is computed immediately."""
+            return MockAsyncResult(mock_get, zkpath, watch=watch)
+
         if events:
             self.watch_events = queue.Queue()
 
@@ -237,6 +261,7 @@ class MockZookeeperTestCase(unittest.TestCase):
         side_effects = [
             (kazoo.client.KazooClient.exists, mock_exists),
             (kazoo.client.KazooClient.get, mock_get),
+            (kazoo.client.KazooClient.get_async, mock_get_async),
             (kazoo.client.KazooClient.delete, mock_delete),
             (kazoo.client.KazooClient.get_children, mock_get_children)]
 
@@ -77,6 +77,18 @@ class UtilsTest(unittest.TestCase):
 
         self.assertEqual(utils.os.stat(script_file).st_mode, 33060)
 
+    @mock.patch('jinja2.PackageLoader', mock.Mock())
+    def test_templates_loader(self):
+        """Test templates are loaded from package if not in a directory."""
+        self.assertIn('supervisor.run',
+                      utils.templates_loader().list_templates())
+        self.assertFalse(utils.jinja2.PackageLoader.called)
+
+        with mock.patch('os.path.isdir', mock.Mock(return_value=False)):
+            utils.templates_loader()
+        utils.jinja2.PackageLoader.assert_called_with('treadmill',
+                                                      'templates')
+
     def test_base_n(self):
         """Test to/from_base_n conversions."""
         alphabet = (string.digits +
@@ -321,6 +333,20 @@ class UtilsTest(unittest.TestCase):
 
         self.assertEqual(yaml.dump(obj), '{xxx: abcd}\n')
 
+    def test_paginate(self):
+        """Tests limit/after pagination."""
+        items = ['c', 'a', 'd', 'b']
+        self.assertEqual(['a', 'b', 'c', 'd'], utils.paginate(items))
+        self.assertEqual(['a', 'b'], utils.paginate(items, limit=2))
+        self.assertEqual(['c', 'd'], utils.paginate(iter(items), after='b'))
+        self.assertEqual(['c'], utils.paginate(items, limit=1, after='b'))
+
+        items = [{'_id': 'y'}, {'_id': 'x'}]
+        self.assertEqual(
+            [{'_id': 'y'}],
+            utils.paginate(items, after='x', key=lambda item: item['_id'])
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
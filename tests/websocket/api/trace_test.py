@@ -22,7 +22,19 @@ class WSRunningAPITest(unittest.TestCase):
         self.assertEqual(
             self.api.subscribe({'topic': '/trace',
                                 'filter': 'foo.bar#1234'}),
-            [('/trace/*', 'foo.bar#1234,*')]
+            [('/trace/00D2', 'foo.bar#1234,*')]
+        )
+
+        self.assertEqual(
+            self.api.subscribe({'topic': '/trace',
+                                'filter': 'foo.*#1234'}),
+            [('/trace/00D2', 'foo.*#1234,*')]
+        )
+
+        self.assertEqual(
+            self.api.subscribe({'topic': '/trace',
+                                'filter': 'foo.bar#12*'}),
+            [('/trace/*', 'foo.bar#12*,*')]
         )
 
         self.assertEqual(
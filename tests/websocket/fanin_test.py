@@ -0,0 +1,126 @@
+"""Unit test for multi-process websocket event distribution.
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+import mock
+
+from treadmill.websocket import fanin
+
+
+class FaninTest(unittest.TestCase):
+    """Test treadmill.websocket.fanin."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if self.root and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    @mock.patch('treadmill.dirwatch.DirWatcher', mock.Mock())
+    def test_distribute(self):
+        """Test events are forwarded to workers and watch requests served."""
+        # Access to protected member: _notify, _on_request
+        #
+        # pylint: disable=W0212
+        socks1 = socket.socketpair()
+        socks2 = socket.socketpair()
+
+        pubsub = fanin.WatcherPubSub(self.root, [],
+                                     [socks1[0], socks2[0]])
+        watcher1 = fanin.ChannelWatcher(socks1[1])
+        watcher2 = fanin.ChannelWatcher(socks2[1])
+        watcher1.on_event = mock.Mock()
+        watcher2.on_event = mock.Mock()
+
+        pubsub._notify('/a/b', 'm', 'x', 123)
+        for watcher in (watcher1, watcher2):
+            self.assertTrue(watcher.wait_for_events(1))
+            watcher.process_events()
+            watcher.on_event.assert_called_once_with('/a/b', 'm', 'x', 123,
+                                                     pubsub.seq)
+            self.assertFalse(watcher.wait_for_events(0))
+
+        channel1, channel2 = pubsub.channels
+        watcher1.add_dir(self.root)
+        self.assertEqual([['add', self.root]], channel1.recv())
+
+        pubsub._on_request(channel1, ['add', '/foo'])
+        pubsub._on_request(channel2, ['add', '/foo'])
+        pubsub.watcher.add_dir.assert_called_once_with('/foo')
+
+        # Watch is acknowledged with the watcher sequence.
+        watcher1.on_watched = mock.Mock()
+        self.assertTrue(watcher1.wait_for_events(1))
+        watcher1.process_events()
+        watcher1.on_watched.assert_called_once_with('/foo', pubsub.seq)
+
+        pubsub._on_request(channel1, ['remove', '/foo'])
+        self.assertFalse(pubsub.watcher.remove_dir.called)
+        pubsub._on_request(channel2, ['remove', '/foo'])
+        pubsub.watcher.remove_dir.assert_called_once_with('/foo')
+
+        socks1[1].close()
+        with self.assertRaises(EOFError):
+            channel1.recv()
+
+        for sock in socks1[:1] + socks2:
+            sock.close()
+
+    @mock.patch('treadmill.dirwatch.DirWatcher', mock.Mock())
+    @mock.patch('treadmill.utils.sys_exit', mock.Mock(side_effect=SystemExit))
+    def test_lagging_worker(self):
+        """Test watcher exits if a worker lags, others are not blocked."""
+        # Access to protected member: _notify
+        #
+        # pylint: disable=W0212
+        socks1 = socket.socketpair()
+        socks2 = socket.socketpair()
+
+        pubsub = fanin.WatcherPubSub(self.root, [],
+                                     [socks1[0], socks2[0]],
+                                     max_pending=1024 * 1024)
+
+        # Worker 2 reads events, worker 1 does not.
+        watcher2 = fanin.ChannelWatcher(socks2[1])
+        watcher2.on_event = mock.Mock()
+        content = 'x' * 64 * 1024
+        with self.assertRaises(SystemExit):
+            for idx in range(64):
+                pubsub._notify('/a/%s' % idx, 'm', content, 123)
+                while watcher2.wait_for_events(0):
+                    watcher2.process_events()
+
+        fanin.utils.sys_exit.assert_called_once_with(-1)
+        self.assertGreater(watcher2.on_event.call_count, 1)
+        self.assertGreater(pubsub.stats()['pending'][0], 1024 * 1024)
+
+        for sock in socks1 + socks2:
+            sock.close()
+
+    @mock.patch('treadmill.dirwatch.DirWatcher', mock.Mock())
+    @mock.patch('treadmill.utils.sys_exit', mock.Mock(side_effect=SystemExit))
+    def test_worker_exited(self):
+        """Test watcher exits if a worker exits."""
+        socks1 = socket.socketpair()
+        socks2 = socket.socketpair()
+
+        pubsub = fanin.WatcherPubSub(self.root, [],
+                                     [socks1[0], socks2[0]])
+        socks1[1].close()
+        with self.assertRaises(SystemExit):
+            pubsub.serve_requests()
+
+        fanin.utils.sys_exit.assert_called_once_with(-1)
+
+        for sock in socks1[:1] + socks2:
+            sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
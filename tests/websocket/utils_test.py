@@ -1,5 +1,6 @@
 """Unit test for websocket utilities."""
 
+import fnmatch
 import unittest
 
 from treadmill.websocket import utils
@@ -25,6 +26,116 @@ class UtilsTest(unittest.TestCase):
         self.assertEqual(parsed_filter.appname, 'treadmld.cellapi')
         self.assertEqual(parsed_filter.instanceid, '12345')
 
+    def test_subscription_index(self):
+        """Test subscription index matches same entries as fnmatch."""
+        patterns = [
+            '*',
+            'foo.bar#*',
+            'foo.bar#0001',
+            'foo.bar#0001,*',
+            'foo.*#*',
+            '*#0002',
+            'foo.b?r#*',
+            'foo.bar#[0-9]*',
+            'app#*:tcp:http',
+            '',
+        ]
+        index = utils.SubscriptionIndex(
+            (pattern, idx) for idx, pattern in enumerate(patterns)
+        )
+        self.assertEqual(len(patterns), len(index))
+        self.assertEqual(
+            list(enumerate(patterns)),
+            [(idx, pattern) for pattern, idx in index]
+        )
+
+        names = [
+            'foo.bar#0001',
+            'foo.bar#0001,123.0,host,pending,created',
+            'foo.bar#0002',
+            'foo.bor#0002',
+            'foo.baz#x',
+            'app#0001:tcp:http',
+            'app#0001:udp:http',
+            'xxx',
+            '',
+        ]
+        for name in names:
+            expected = sorted(
+                (pattern, idx) for idx, pattern in enumerate(patterns)
+                if fnmatch.fnmatchcase(name, pattern)
+            )
+            self.assertEqual(expected, sorted(index.match(name)), name)
+
+    def test_send_queue_drop_oldest(self):
+        """Test oldest messages are dropped on overflow."""
+        queue = utils.SendQueue(limit=2)
+        for idx in range(4):
+            self.assertTrue(queue.put(idx, key='a'))
+
+        self.assertEqual(2, queue.get())
+        self.assertEqual(3, queue.get())
+        self.assertIsNone(queue.get())
+        self.assertEqual(
+            {'depth': 0, 'max_depth': 2, 'dropped': 2, 'coalesced': 0},
+            queue.stats()
+        )
+
+    def test_send_queue_coalesce(self):
+        """Test queued messages are coalesced by key."""
+        queue = utils.SendQueue(limit=2, overflow=utils.OVERFLOW_COALESCE)
+        queue.put('a1', key='a')
+        queue.put('b1', key='b')
+        queue.put('a2', key='a')
+
+        # Coalesced message is moved to the tail, order of messages is kept.
+        self.assertEqual('b1', queue.get())
+        self.assertEqual('a2', queue.get())
+
+        queue.put('a3', key='a')
+        queue.put('b2', key='b')
+        queue.put('c1', key='c')
+
+        self.assertEqual('b2', queue.get())
+        self.assertEqual('c1', queue.get())
+        self.assertEqual(1, queue.coalesced)
+        self.assertEqual(1, queue.dropped)
+
+    def test_send_queue_disconnect(self):
+        """Test overflow disconnects, with resume hint."""
+        queue = utils.SendQueue(limit=2, overflow=utils.OVERFLOW_DISCONNECT)
+        self.assertTrue(queue.put('a', when=10))
+        self.assertTrue(queue.put('b', when=11))
+        self.assertFalse(queue.put('c', when=12))
+        self.assertEqual(10, queue.resume_since)
+        self.assertEqual(0, len(queue))
+        self.assertFalse(queue.put('d', when=13))
+
+    def test_send_queue_wait(self):
+        """Test waiting for queue to drain below low watermark."""
+        queue = utils.SendQueue(limit=4)
+        for idx in range(4):
+            queue.put(idx)
+
+        self.assertFalse(queue.wait(timeout=0))
+        queue.get()
+        self.assertFalse(queue.wait(timeout=0))
+        queue.get()
+        self.assertTrue(queue.wait(timeout=0))
+
+    def test_replay_log(self):
+        """Test replay log eviction horizon."""
+        log = utils.ReplayLog(size=2)
+        log.append(1, 'a')
+        log.append(2, 'b')
+        self.assertEqual([(2, 'b')], log.since(1))
+        self.assertEqual([(1, 'a'), (2, 'b')], log.since(0))
+
+        log.append(3, 'c')
+        self.assertIsNone(log.since(0))
+        self.assertEqual([(2, 'b'), (3, 'c')], log.since(1))
+        self.assertEqual([], log.since(3))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -19,6 +19,7 @@ from tornado.websocket import websocket_connect
 
 from treadmill import websocket
 from treadmill import fs
+from treadmill.apptrace import history
 
 
 class DummyHandler(object):
@@ -96,6 +97,45 @@ class PubSubTest(unittest.TestCase):
         pubsub.run(once=True)
         self.assertEqual(1, len(pubsub.handlers[self.root]))
 
+    @mock.patch('treadmill.websocket.DirWatchPubSub._sow', mock.Mock())
+    def test_notify_encode_once(self):
+        """Tests event is decoded and encoded once for all subscribers."""
+        # Access to protected member: _notify
+        #
+        # pylint: disable=W0212
+        pubsub = websocket.DirWatchPubSub(self.root)
+        impl = mock.Mock()
+        impl.on_event.return_value = {'echo': 1}
+
+        ws1 = mock.Mock()
+        ws2 = mock.Mock()
+        ws3 = mock.Mock()
+        ws1.active.return_value = True
+        ws2.active.return_value = True
+        ws3.active.return_value = False
+
+        pubsub.register('/', '*', ws1, impl, None)
+        pubsub.register('/', 'a*', ws2, impl, None)
+        pubsub.register('/', '*', ws3, impl, None)
+
+        pubsub._notify(os.path.join(self.root, 'abc'), 'm', 'x', 123)
+
+        impl.on_event.assert_called_once_with('/abc', 'm', 'x')
+        frame = ws1.send_message.call_args[0][0]
+        self.assertEqual({'echo': 1, 'when': 123, 'seq': pubsub.seq},
+                         json.loads(frame))
+        ws2.send_message.assert_called_once_with(
+            frame, key=os.path.join(self.root, 'abc'), when=123
+        )
+        self.assertFalse(ws3.send_message.called)
+
+        impl.on_event.side_effect = ValueError('bad')
+        pubsub._notify(os.path.join(self.root, 'abc'), 'm', 'x', 124)
+        self.assertEqual(2, impl.on_event.call_count)
+        ws1.send_error_async.assert_called_once_with('ValueError: bad')
+        ws2.send_error_async.assert_called_once_with('ValueError: bad')
+        self.assertFalse(ws1.send_error_msg.called)
+
     def test_sow_since(self):
         """Tests sow since handling."""
         # Access to protected member: _sow
@@ -129,6 +169,29 @@ class PubSubTest(unittest.TestCase):
         )
         handler.write_message.reset_mock()
 
+    @mock.patch('treadmill.websocket.DirWatchPubSub._sow', mock.Mock())
+    def test_resume_acknowledged(self):
+        """Tests resume needs the watch acknowledged by remote watcher."""
+        # Access to protected member: _on_watched
+        #
+        # pylint: disable=W0212
+        watcher = mock.Mock()
+        watcher.acknowledges = True
+        pubsub = websocket.DirWatchPubSub(self.root, watcher=watcher)
+        impl = mock.Mock()
+
+        pubsub.register('/', '*', mock.Mock(), impl, None)
+        watcher.add_dir.assert_called_once_with(os.path.realpath(self.root))
+        self.assertFalse(pubsub.resume('/', '*', mock.Mock(), impl, 10))
+
+        pubsub._on_watched(os.path.realpath(self.root), 5)
+        self.assertFalse(pubsub.resume('/', '*', mock.Mock(), impl, 4))
+        self.assertTrue(pubsub.resume('/', '*', mock.Mock(), impl, 10))
+
+        # Acknowledgement of a directory no longer watched is ignored.
+        pubsub._on_watched('/foo', 1)
+        self.assertNotIn('/foo', pubsub.watched_since)
+
     def test_sow_fs_and_db(self):
         """Tests sow from filesystem and database."""
         # Access to protected member: _sow
@@ -193,6 +256,166 @@ class PubSubTest(unittest.TestCase):
             ]
         )
 
+    def test_sow_limit(self):
+        """Tests sow replay is capped, and pushed down to the db."""
+        # Access to protected member: _sow
+        #
+        # pylint: disable=W0212
+        pubsub = websocket.DirWatchPubSub(self.root, sow_limit=3)
+        handler = mock.Mock()
+        impl = mock.Mock()
+        impl.on_event.side_effect = lambda path, _op, _content: {
+            'path': path
+        }
+
+        sow_dir = os.path.join(self.root, '.sow', 'trace')
+        fs.mkdir_safe(sow_dir)
+        impl.sow = sow_dir
+        impl.sow_table = 'trace'
+
+        for idx, rows in enumerate([[('/aaa', 1), ('/bbb', 3)],
+                                    [('/aaa', 1), ('/ccc', 2), ('/ddd', 4)]]):
+            conn = sqlite3.connect(
+                os.path.join(sow_dir, 'trace.db-%s' % idx)
+            )
+            conn.execute('CREATE TABLE trace ('
+                         ' path TEXT, timestamp INTEGER, data TEXT)')
+            conn.executemany(
+                'INSERT INTO trace (path, timestamp) values(?, ?)', rows
+            )
+            conn.commit()
+            conn.close()
+
+        pubsub.register('/', '*', handler, impl, 0, limit=2)
+        self.assertEqual(
+            ['/aaa', '/ccc'],
+            [call[0][0]['path']
+             for call in handler.write_message.call_args_list]
+        )
+
+        handler.write_message.reset_mock()
+        open(os.path.join(self.root, 'xxx'), 'w+').close()
+        pubsub.register('/', '*', handler, impl, 0)
+        self.assertEqual(
+            ['/aaa', '/ccc', '/bbb'],
+            [call[0][0]['path']
+             for call in handler.write_message.call_args_list]
+        )
+
+    def test_sow_partitions(self):
+        """Tests sow merges history partitions and snapshots."""
+        # Access to protected member: _sow
+        #
+        # pylint: disable=W0212
+        pubsub = websocket.DirWatchPubSub(self.root)
+        handler = mock.Mock()
+        impl = mock.Mock()
+        impl.on_event.side_effect = lambda path, _op, _content: {
+            'path': path
+        }
+
+        sow_dir = os.path.join(self.root, '.sow', 'trace')
+        fs.mkdir_safe(sow_dir)
+        impl.sow = sow_dir
+        impl.sow_table = 'trace'
+
+        for name, rows in [
+                ('trace.db-0', [('/a/x#1,1', 1), ('/a/y#2,2', 2)]),
+                ('trace.db-1', [('/a/x#1,150', 150), ('/a/x#1,3', 3)])]:
+            conn = sqlite3.connect(os.path.join(sow_dir, name))
+            conn.execute('CREATE TABLE trace ('
+                         ' path TEXT, timestamp INTEGER, data TEXT)')
+            conn.executemany(
+                'INSERT INTO trace (path, timestamp) values(?, ?)', rows
+            )
+            conn.commit()
+            conn.close()
+
+        store = history.HistoryStore(sow_dir, partition_size=100)
+        store.merge(os.path.join(sow_dir, 'trace.db-0'))
+        os.unlink(os.path.join(sow_dir, 'trace.db-0'))
+
+        pubsub._sow('/a', 'x#1,*', 0, handler, impl)
+        self.assertEqual(
+            ['/a/x#1,1', '/a/x#1,3', '/a/x#1,150'],
+            [call[0][0]['path']
+             for call in handler.write_message.call_args_list]
+        )
+
+    @mock.patch('treadmill.websocket.DirWatchPubSub._sow',
+                mock.Mock(side_effect=IOError('disk')))
+    def test_register_async_error(self):
+        """Tests replay failure is sent to the client."""
+        pubsub = websocket.DirWatchPubSub(self.root)
+        handler = mock.Mock()
+        impl = mock.Mock()
+
+        future = pubsub.register_async('/', '*', handler, impl, 0)
+        with self.assertRaises(IOError):
+            future.result()
+        pubsub.sow_executor.shutdown()
+
+        handler.send_error_async.assert_called_once_with(
+            'Replay failed: OSError: disk'
+        )
+
+    @mock.patch('treadmill.websocket.DirWatchPubSub._sow', mock.Mock())
+    def test_resume(self):
+        """Tests subscription resumes from the replay log."""
+        # Access to protected member: _notify
+        #
+        # pylint: disable=W0212
+        pubsub = websocket.DirWatchPubSub(self.root, replay_log_size=2)
+        impl = mock.Mock()
+        impl.on_event.side_effect = lambda path, _op, _content: {
+            'path': path
+        }
+        ws1 = mock.Mock()
+        ws2 = mock.Mock()
+
+        pubsub.register('/', '*', ws1, impl, None)
+        cursor = pubsub.seq
+
+        pubsub._notify(os.path.join(self.root, 'abc'), 'm', 'x', 1)
+        pubsub._notify(os.path.join(self.root, 'xyz'), 'm', 'x', 2)
+
+        self.assertTrue(pubsub.resume('/', 'a*', ws2, impl, cursor))
+        frame = json.loads(ws2.send_message.call_args[0][0])
+        self.assertEqual({'path': '/abc', 'when': 1, 'seq': cursor + 1},
+                         frame)
+        self.assertEqual(1, ws2.send_message.call_count)
+        self.assertEqual(2, len(pubsub.handlers[self.root]))
+
+        # Events after cursor evicted from the log.
+        pubsub._notify(os.path.join(self.root, 'abc'), 'm', 'x', 3)
+        self.assertFalse(pubsub.resume('/', 'a*', ws2, impl, cursor))
+
+        # Directory not watched before cursor.
+        os.mkdir(os.path.join(self.root, 'new'))
+        self.assertFalse(pubsub.resume('/new', '*', ws2, impl, pubsub.seq))
+        self.assertTrue(pubsub.resume('/', '*', ws2, impl, pubsub.seq))
+
+    @mock.patch('treadmill.websocket.DirWatchPubSub._sow', mock.Mock())
+    def test_register_async(self):
+        """Tests sow is replayed off the caller thread."""
+        # Access to protected member: _sow
+        #
+        # pylint: disable=W0212
+        pubsub = websocket.DirWatchPubSub(self.root)
+        handler = mock.Mock()
+        impl = mock.Mock()
+
+        future = pubsub.register_async('/', '*', handler, impl, 10, 5)
+        future.result()
+
+        self.assertEqual(1, len(pubsub.handlers[self.root]))
+        pubsub._sow.assert_called_once_with(
+            '/', '*', 10, handler, impl, limit=5,
+            publish=handler.send_replay,
+            on_error=handler.send_error_async,
+            seq=pubsub.seq
+        )
+
     @mock.patch('glob.glob')
     @mock.patch('os.path.isdir')
     @mock.patch('treadmill.dirwatch.DirWatcher')
@@ -313,6 +536,93 @@ class WebSocketTest(AsyncHTTPTestCase):
         response = yield ws.read_message()
         self.assertIsNone(response)
 
+    @gen_test
+    def test_notify_queued(self):
+        """Test events are delivered through the send queue."""
+        echo_impl = mock.Mock()
+        echo_impl.sow = None
+        echo_impl.subscribe.return_value = [('/', '*')]
+        echo_impl.on_event.return_value = {'echo': 1}
+        self.pubsub.impl['echo'] = echo_impl
+
+        ws = yield self.ws_connect('/')
+        ws.write_message('{"topic": "echo"}')
+        yield gen.sleep(0.1)
+
+        with open(os.path.join(self.root, 'xxx'), 'w+') as f:
+            f.write('x')
+        self.pubsub.run(once=True)
+
+        response = yield ws.read_message()
+        self.assertEqual(1, json.loads(response)['echo'])
+        self.assertEqual(1, self.pubsub.stats()['connections'])
+
+    @gen_test
+    def test_batching(self):
+        """Test messages are batched in order."""
+        # Access to protected member: _notify
+        #
+        # pylint: disable=W0212
+        echo_impl = mock.Mock()
+        echo_impl.sow = None
+        echo_impl.subscribe.return_value = [('/', '*')]
+        echo_impl.on_event.side_effect = lambda path, _op, _content: {
+            'path': path
+        }
+        self.pubsub.impl['echo'] = echo_impl
+
+        ws = yield self.ws_connect('/')
+        ws.write_message(
+            '{"topic": "echo", "batch": {"window": 100, "size": 2}}'
+        )
+        yield gen.sleep(0.1)
+
+        for name in ('a', 'b', 'c'):
+            self.pubsub._notify(os.path.join(self.root, name), 'c', '', 1)
+
+        response = yield ws.read_message()
+        self.assertEqual(['/a', '/b'],
+                         [msg['path'] for msg in json.loads(response)])
+        response = yield ws.read_message()
+        self.assertEqual(['/c'],
+                         [msg['path'] for msg in json.loads(response)])
+
+        stats = self.pubsub.stats()
+        self.assertEqual(3, stats['messages'])
+        self.assertEqual(2, stats['frames'])
+
+    @gen_test
+    def test_error_queued(self):
+        """Test event error is sent after queued messages, then closed."""
+        # Access to protected member: _notify
+        #
+        # pylint: disable=W0212
+        def _on_event(path, _op, _content):
+            """Fail on /b."""
+            if path == '/b':
+                raise ValueError('bad')
+            return {'path': path}
+
+        echo_impl = mock.Mock()
+        echo_impl.sow = None
+        echo_impl.subscribe.return_value = [('/', '*')]
+        echo_impl.on_event.side_effect = _on_event
+        self.pubsub.impl['echo'] = echo_impl
+
+        ws = yield self.ws_connect('/')
+        ws.write_message('{"topic": "echo"}')
+        yield gen.sleep(0.1)
+
+        self.pubsub._notify(os.path.join(self.root, 'a'), 'c', '', 1)
+        self.pubsub._notify(os.path.join(self.root, 'b'), 'c', '', 1)
+
+        response = yield ws.read_message()
+        self.assertEqual('/a', json.loads(response)['path'])
+        response = yield ws.read_message()
+        self.assertEqual('ValueError: bad', json.loads(response)['_error'])
+        response = yield ws.read_message()
+        self.assertIsNone(response)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+"""Unit test for Zookeeper read cache.
+"""
+
+import unittest
+
+import kazoo
+import kazoo.client
+import mock
+from kazoo.protocol import states
+
+from treadmill import zkcache
+
+
+class ZkCacheTest(unittest.TestCase):
+    """Tests for teadmill.zkcache"""
+
+    def setUp(self):
+        self.zkclient = mock.Mock()
+        self.stat = mock.Mock(mzxid=10, pzxid=12, last_modified=100.0)
+        self.zkclient.get.return_value = (b'foo: bar\n', self.stat)
+        self.zkclient.get_children.return_value = (['b', 'a'], self.stat)
+        self.cache = zkcache.ZkCache(self.zkclient)
+
+    def test_get(self):
+        """Test data is fetched once, until watch fires."""
+        self.assertEqual({'foo': 'bar'}, self.cache.get('/x'))
+        self.assertEqual({'foo': 'bar'}, self.cache.get('/x'))
+        self.assertEqual(1, self.zkclient.get.call_count)
+        self.assertEqual(1, self.cache.hits)
+
+        # Results are independent copies.
+        self.cache.get('/x')['foo'] = 'baz'
+        self.assertEqual({'foo': 'bar'}, self.cache.get('/x'))
+
+        watch = self.zkclient.get.call_args[1]['watch']
+        watch(states.WatchedEvent(type=states.EventType.CHANGED,
+                                  state=states.KeeperState.CONNECTED,
+                                  path='/x'))
+
+        self.zkclient.get.return_value = (b'foo: baz\n', self.stat)
+        self.assertEqual({'foo': 'baz'}, self.cache.get('/x'))
+        self.assertEqual(2, self.zkclient.get.call_count)
+
+    def test_get_nonode(self):
+        """Test missing node returns default and watches for creation."""
+        self.zkclient.get.side_effect = kazoo.client.NoNodeError
+        self.zkclient.exists.return_value = None
+
+        self.assertIsNone(self.cache.get('/x'))
+        self.assertEqual({}, self.cache.get('/x', default={}))
+        self.assertEqual(1, self.zkclient.get.call_count)
+        self.zkclient.exists.assert_called_with('/x', watch=mock.ANY)
+
+    def test_get_created(self):
+        """Test node created between get and exists is read again."""
+        self.zkclient.get.side_effect = [kazoo.client.NoNodeError,
+                                         (b'foo: bar\n', self.stat)]
+        self.zkclient.exists.return_value = self.stat
+
+        self.assertEqual({'foo': 'bar'}, self.cache.get('/x'))
+        self.assertEqual({'foo': 'bar'}, self.cache.get('/x'))
+        self.assertEqual(2, self.zkclient.get.call_count)
+
+    def test_get_children(self):
+        """Test children listing and metadata."""
+        children, stat = self.cache.get_children('/x', need_metadata=True)
+        self.assertEqual(['a', 'b'], children)
+        self.assertEqual({'zxid': 12, 'mtime': 100.0},
+                         zkcache.metadata(stat))
+
+        children.append('c')
+        self.assertEqual(['a', 'b'], self.cache.get_children('/x'))
+        self.assertEqual(1, self.zkclient.get_children.call_count)
+
+    def test_stale_store(self):
+        """Test entry invalidated during fetch is not cached."""
+        def _get(path, watch):
+            """Fire the watch before the fetch returns."""
+            watch(states.WatchedEvent(type=states.EventType.CHANGED,
+                                      state=states.KeeperState.CONNECTED,
+                                      path=path))
+            return (b'1', self.stat)
+
+        self.zkclient.get.side_effect = _get
+        self.cache.get('/x')
+        self.cache.get('/x')
+        self.assertEqual(2, self.zkclient.get.call_count)
+
+    def test_invalidated_released(self):
+        """Test invalidations are only kept while fetches are in flight."""
+        # Access to protected member: _fetching, _invalidated
+        #
+        # pylint: disable=W0212
+        for idx in range(10):
+            self.cache.get('/x%s' % idx)
+            watch = self.zkclient.get.call_args[1]['watch']
+            watch(states.WatchedEvent(type=states.EventType.CHANGED,
+                                      state=states.KeeperState.CONNECTED,
+                                      path='/x%s' % idx))
+
+        self.assertEqual({}, self.cache._invalidated)
+        self.assertEqual({}, self.cache._fetching)
+
+    def test_invalidate_other_path(self):
+        """Test invalidation during fetch only discards the same path."""
+        self.cache.get('/y')
+        watch_y = self.zkclient.get.call_args[1]['watch']
+
+        def _get(path, watch):
+            """Fire /y watch before the /x fetch returns."""
+            del watch
+            watch_y(states.WatchedEvent(type=states.EventType.CHANGED,
+                                        state=states.KeeperState.CONNECTED,
+                                        path='/y'))
+            return (b'1', self.stat)
+
+        self.zkclient.get.side_effect = _get
+        self.cache.get('/x')
+        self.zkclient.get.side_effect = None
+        self.cache.get('/x')
+        self.assertEqual(2, self.zkclient.get.call_count)
+
+    def test_session_lost(self):
+        """Test cache is cleared when session is lost."""
+        listener = self.zkclient.add_listener.call_args[0][0]
+        self.cache.get('/x')
+        listener(states.KazooState.LOST)
+        self.cache.get('/x')
+        self.assertEqual(2, self.zkclient.get.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 
 import collections
 import glob
+import json
 import os
 import shutil
 import tempfile
@@ -40,6 +41,7 @@ class ZkSyncTest(mockzk.MockZookeeperTestCase):
                 self.assertTrue(content == f.read())
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
     def test_sync_children(self):
@@ -122,6 +124,46 @@ class ZkSyncTest(mockzk.MockZookeeperTestCase):
         self.assertSequenceEqual(['y', 'x', 'z'], add)
         self.assertSequenceEqual(['a', 'b'], rm)
 
+    @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    def test_sync_children_async(self):
+        """Test initial sync pipelines reads with bounded concurrency."""
+        # Disable W0212: accessing protected members.
+        # pylint: disable=W0212
+
+        zk_content = {
+            'a': {
+                'x': b'1',
+                'y': b'2',
+                'z': b'3',
+            },
+        }
+
+        self.make_mock_zk(zk_content)
+
+        zk2fs_sync = zksync.Zk2Fs(kazoo.client.KazooClient(), self.root,
+                                  concurrency=2)
+        fs.mkdir_safe(os.path.join(self.root, 'a'))
+
+        # 'q' is removed between children listing and read.
+        zk2fs_sync._children_watch('/a', ['q', 'x', 'y', 'z'],
+                                   False,
+                                   zk2fs_sync._default_on_add,
+                                   zk2fs_sync._default_on_del)
+        self.assertEqual(4, kazoo.client.KazooClient.get_async.call_count)
+        self.assertFalse(kazoo.client.KazooClient.get.called)
+        self._check_file('a/x', '1')
+        self._check_file('a/y', '2')
+        self._check_file('a/z', '3')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a/q')))
+
+        # Readiness marker is only updated once ready.
+        self.assertFalse(os.path.exists(os.path.join(self.root, '.modified')))
+        zk2fs_sync.mark_ready()
+        self.assertTrue(os.path.exists(os.path.join(self.root, '.modified')))
+
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
@@ -194,6 +236,7 @@ class ZkSyncTest(mockzk.MockZookeeperTestCase):
         self.assertFalse(os.path.exists(os.path.join(self.root, 'a/x')))
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
     def test_sync_children_immutable(self):
@@ -236,6 +279,121 @@ class ZkSyncTest(mockzk.MockZookeeperTestCase):
                                  cont_watch_predicate=lambda *args: False)
         self.assertFalse(kazoo.client.KazooClient.get_children.called)
 
+    @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    def test_sync_children_batch(self):
+        """Test zk2fs sync in batch mode."""
+        # Disable W0212: accessing protected members.
+        # pylint: disable=W0212
+
+        zk_content = {
+            'a': {
+                'x': b'1',
+                'y': b'2',
+            },
+        }
+
+        self.make_mock_zk(zk_content)
+
+        journal = os.path.join(self.root, '.journal')
+        batch_writer = zksync.BatchWriter(1, fsync=zksync.FSYNC_BATCH,
+                                          journal=journal)
+        zk2fs_sync = zksync.Zk2Fs(kazoo.client.KazooClient(), self.root,
+                                  batch_writer=batch_writer)
+        fs.mkdir_safe(os.path.join(self.root, 'a'))
+        zk2fs_sync._children_watch('/a', ['x', 'y'],
+                                   False,
+                                   zk2fs_sync._default_on_add,
+                                   zk2fs_sync._default_on_del)
+
+        # Nothing is written until flushed.
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a/x')))
+
+        zk2fs_sync.mark_ready()
+        self._check_file('a/x', '1')
+        self._check_file('a/y', '2')
+        self.assertTrue(os.path.exists(os.path.join(self.root, '.modified')))
+        self.assertEqual([], glob.glob(os.path.join(self.root, 'a', '.tmp*')))
+
+        # Changes to the same node within the window are coalesced.
+        mock_stat = collections.namedtuple('ZkStat', ['last_modified'])(0)
+        zk2fs_sync._data_watch('/a/x', b'2', mock_stat, None)
+        zk2fs_sync._data_watch('/a/x', b'3', mock_stat, None)
+        zk2fs_sync._default_on_del('/a/y')
+        self.assertEqual(2, batch_writer.flush())
+        self.assertEqual(1, batch_writer.coalesced)
+        self._check_file('a/x', '3')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a/y')))
+
+        with open(journal) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            [('a/x', 'write'), ('a/y', 'write'),
+             ('a/x', 'write'), ('a/y', 'delete')],
+            [(rec['path'], rec['op']) for rec in records]
+        )
+
+    @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_async', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    def test_sync_children_batch_pending(self):
+        """Test children diff accounts for unflushed batch changes."""
+        # Disable W0212: accessing protected members.
+        # pylint: disable=W0212
+
+        zk_content = {
+            'a': {
+                'a': b'1',
+                'b': b'2',
+            },
+        }
+
+        self.make_mock_zk(zk_content)
+
+        batch_writer = zksync.BatchWriter(1)
+        zk2fs_sync = zksync.Zk2Fs(kazoo.client.KazooClient(), self.root,
+                                  batch_writer=batch_writer)
+        fs.mkdir_safe(os.path.join(self.root, 'a'))
+        zk2fs_sync._children_watch('/a', ['a'],
+                                   False,
+                                   zk2fs_sync._default_on_add,
+                                   zk2fs_sync._default_on_del)
+
+        # Pending write of 'a' is not fetched again.
+        zk2fs_sync._children_watch('/a', ['a', 'b'],
+                                   False,
+                                   zk2fs_sync._default_on_add,
+                                   zk2fs_sync._default_on_del)
+        self.assertEqual(2, kazoo.client.KazooClient.get_async.call_count)
+
+        # 'a' added and deleted within one window leaves no file.
+        zk2fs_sync._children_watch('/a', ['b'],
+                                   False,
+                                   zk2fs_sync._default_on_add,
+                                   zk2fs_sync._default_on_del)
+        batch_writer.flush()
+        self.assertEqual(['b'], os.listdir(os.path.join(self.root, 'a')))
+
+    def test_journal_rotation(self):
+        """Test rotated journals are shifted, not overwritten."""
+        journal = os.path.join(self.root, '.journal')
+        batch_writer = zksync.BatchWriter(1, journal=journal,
+                                          journal_max_bytes=1,
+                                          journal_backups=2)
+        for idx in range(3):
+            batch_writer.write(os.path.join(self.root, str(idx)), b'', 0)
+            batch_writer.flush()
+
+        self.assertFalse(os.path.exists(journal))
+        self.assertFalse(os.path.exists(journal + '.3'))
+        with open(journal + '.1') as f:
+            self.assertEqual('2', json.loads(f.read())['path'])
+        with open(journal + '.2') as f:
+            self.assertEqual('1', json.loads(f.read())['path'])
+
     def test_write_data(self):
         """Tests writing data to filesystem."""
         path_ok = os.path.join(self.root, 'a')
@@ -186,6 +186,29 @@ class ZkTest(unittest.TestCase):
         zkutils.update(zkclient, '/a', 'bbb', check_content=True)
         kazoo.client.KazooClient.set.assert_called_with('/a', b'bbb')
 
+    @mock.patch('kazoo.client.KazooClient.delete', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
+    def test_ensure_deleted_batch(self):
+        """Test batch delete falls back to single deletes on failure."""
+        client = kazoo.client.KazooClient()
+        txn = kazoo.client.KazooClient.transaction.return_value
+        txn.commit.side_effect = [
+            [True, True],
+            [kazoo.client.NoNodeError(), kazoo.exceptions.RolledBackError()],
+        ]
+
+        zkutils.ensure_deleted_batch(client, ['/a', '/b', '/c', '/d'],
+                                     batch_size=2)
+
+        self.assertEqual(2, txn.commit.call_count)
+        self.assertEqual(4, txn.delete.call_count)
+        self.assertFalse(kazoo.client.KazooClient.get_children.called)
+        self.assertEqual(
+            [mock.call('/c'), mock.call('/d')],
+            kazoo.client.KazooClient.delete.call_args_list
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
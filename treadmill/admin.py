@@ -7,17 +7,22 @@
 import sys
 
 import collections
+import contextlib
 import copy
+import datetime
 import json
 import hashlib
 import itertools
 import logging
 import shlex
 import re
+import threading
+import time
 
 from distutils import util
 
 import ldap3
+from ldap3.utils import conv as ldap3_conv
 import jinja2
 
 import treadmill.ldap3kerberos  # pylint: disable=E0611,F0401
@@ -63,6 +68,17 @@ _TREADMILL_OBJCLS_OID_PREFIX = '1.3.6.1.4.1.360.10.6.2.'
 
 DEFAULT_PARTITION = '_default'
 
+# Number of entries per page of subtree/level searches.
+_PAGE_SIZE = 500
+
+_PAGED_RESULTS_OID = '1.2.840.113556.1.4.319'
+
+# Number of identities looked up by a single search in get_many/modified.
+_SEARCH_MANY_SIZE = 100
+
+# Max number of results cached by Admin.cached.
+_CACHE_SIZE = 1024
+
 
 def _entry_2_dict(entry, schema):
     """Convert LDAP entry like object to dict."""
@@ -348,25 +364,49 @@ def _diff_entries(old_entry, new_entry):
 class AndQuery(object):
     """And query helper."""
 
-    def __init__(self, key, value):
-        self.clauses = [(key, value)]
+    def __init__(self, key, value, op='='):
+        self.clauses = [(key, op, value)]
 
-    def __call__(self, key, value):
-        """Add constraint."""
-        self.clauses.append((key, value))
+    def __call__(self, key, value, op='='):
+        """Add constraint, op is one of =, >=, <=."""
+        self.clauses.append((key, op, value))
 
     def __str__(self):
         return self.to_str()
 
     def to_str(self):
         """Converts to LDAP query string."""
-        paren = ['(%s=%s)' % (k, v) for k, v in self.clauses]
+        paren = ['(%s%s%s)' % (k, op, v) for k, op, v in self.clauses]
         query = ''.join(paren)
         if len(paren) > 1:
             query = '(&%s)' % query
         return query
 
 
+def _first(value):
+    """Return first value of multi-valued attribute, or the single value."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _generalized_time(value):
+    """Convert modifyTimestamp value to LDAP generalized time string."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime('%Y%m%d%H%M%SZ')
+    return str(value)
+
+
+def _paged_cookie(result):
+    """Get paged results cookie of the next page, None if last page."""
+    try:
+        return result['controls'][_PAGED_RESULTS_OID]['value']['cookie']
+    except (KeyError, TypeError):
+        return None
+
+
 def _admin_ldap_user(domain):
     match = re.match("(.*)\.(.*)", domain)
     return "cn=admin,dc={},dc={}".format(match.group(1), match.group(2))
@@ -392,9 +432,21 @@ def _admin_ldap_user(domain):
 
 
 class Admin(object):
-    """Manages Treadmill objects in ldap."""
+    """Manages Treadmill objects in ldap.
+
+    Up to pool_size connections are opened, so that concurrent callers do
+    not wait for each other. Results of get/list of read-mostly objects
+    are cached for cache_ttl seconds, 0 disables caching. Up to cache_size
+    results are kept, expired and then oldest results are evicted.
 
-    def __init__(self, uri, ldap_suffix, user=None, password=None):
+    The cache is per process: changes made through this object invalidate
+    it, changes made by other processes (e.g. other REST API workers) are
+    seen after up to cache_ttl seconds.
+    """
+
+    def __init__(self, uri, ldap_suffix, user=None, password=None,
+                 pool_size=1, cache_ttl=0, page_size=_PAGE_SIZE,
+                 cache_size=_CACHE_SIZE):
         self.uri = uri
         if uri and not isinstance(uri, list):
             self.uri = uri.split(',')
@@ -403,14 +455,36 @@ class Admin(object):
         self.ldap = None
         self.user = user
         self.password = password
+        self.page_size = page_size
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._idle = None
+        self._slots = threading.BoundedSemaphore(max(pool_size, 1))
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+
+        # Ordered by expiry, as all results are kept for cache_ttl.
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Incremented on invalidate, per kind of objects.
+        self._cache_generation = collections.Counter()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evicted = 0
 
     def close(self):
-        """Closes ldap connection."""
-        try:
-            if self.ldap:
-                self.ldap.unbind()
-        except ldap3.LDAPCommunicationError:
-            _LOGGER.exception('cannot close connection.')
+        """Closes ldap connections."""
+        with self._pool_lock:
+            conns = list(self._idle or [])
+        if self.ldap is not None and self.ldap not in conns:
+            conns.append(self.ldap)
+
+        for conn in conns:
+            try:
+                conn.unbind()
+            except ldap3.LDAPCommunicationError:
+                _LOGGER.exception('cannot close connection.')
 
     def dn(self, parts):
         """Constructs dn."""
@@ -424,14 +498,19 @@ class Admin(object):
 
     def connect(self):
         """Connects (binds) to LDAP server."""
+        self.ldap = self._connect()
+
+    def _connect(self):
+        """Open new connection to the first available LDAP server."""
         ldap3.set_config_parameter('RESTARTABLE_TRIES', 3)
         # XXX: ldap_params = _ldap_args()
 
+        conn = None
         for uri in self.uri:
             try:
                 server = ldap3.Server(uri)
                 if self.user and self.password:
-                    self.ldap = ldap3.Connection(
+                    conn = ldap3.Connection(
                         server,
                         user=self.user,
                         password=self.password,
@@ -440,7 +519,7 @@ class Admin(object):
                         auto_bind=True
                     )
                 else:
-                    self.ldap = ldap3.Connection(
+                    conn = ldap3.Connection(
                         server,
                         authentication=ldap3.SASL,
                         sasl_mechanism='GSSAPI',
@@ -455,32 +534,95 @@ class Admin(object):
                 break
 
         # E0704: The raise statement is not inside an except clause
-        if not self.ldap:
+        if not conn:
             raise  # pylint: disable=E0704
 
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Check out connection from the pool for the current thread.
+
+        Nested calls in the same thread, e.g. delete while iterating over
+        search results, reuse the connection instead of waiting for another.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        self._slots.acquire()
+        try:
+            with self._pool_lock:
+                if self._idle is None:
+                    self._idle = [self.ldap] if self.ldap is not None else []
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+
+            self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                self._local.conn = None
+                with self._pool_lock:
+                    self._idle.append(conn)
+        finally:
+            self._slots.release()
+
     def search(self, search_base, search_filter, search_scope=ldap3.SUBTREE,
                attributes=None):
-        """Call ldap search and return a list of dn, entry tuples."""
-        self.ldap.search(search_base=search_base,
-                         search_filter=search_filter,
-                         search_scope=search_scope,
-                         attributes=attributes,
-                         dereference_aliases=ldap3.DEREF_NEVER)
+        """Call ldap search and return a list of dn, entry tuples.
 
-        self._test_raise_exceptions()
+        Subtree and level searches are paged, entries are returned as the
+        pages are received. Searches nested in a paged search are not paged,
+        as the server keeps one paged search per connection.
+        """
+        with self._connection() as conn:
+            paged = bool(
+                self.page_size and
+                search_scope != ldap3.BASE and
+                not getattr(self._local, 'paging', False)
+            )
+            kwargs = {}
+            if paged:
+                kwargs['paged_size'] = self.page_size
+                self._local.paging = True
 
-        for entry in self.ldap.response:
-            yield str(entry['dn']), _dict_normalize(entry['attributes'])
+            try:
+                while True:
+                    conn.search(search_base=search_base,
+                                search_filter=search_filter,
+                                search_scope=search_scope,
+                                attributes=attributes,
+                                dereference_aliases=ldap3.DEREF_NEVER,
+                                **kwargs)
+
+                    self._test_raise_exceptions(conn)
+
+                    response = conn.response
+                    cookie = _paged_cookie(conn.result) if paged else None
+                    for entry in response:
+                        yield (str(entry['dn']),
+                               _dict_normalize(entry['attributes']))
+
+                    if not cookie:
+                        break
+                    kwargs['paged_cookie'] = cookie
+            finally:
+                if paged:
+                    self._local.paging = False
 
-    def _test_raise_exceptions(self):
+    @staticmethod
+    def _test_raise_exceptions(conn):
         """
         Looks for specific error conditions or throws if non-success state.
         """
-        if not self.ldap.result or 'result' not in self.ldap.result:
+        if not conn.result or 'result' not in conn.result:
             return
 
         exception_type = None
-        result_code = self.ldap.result['result']
+        result_code = conn.result['result']
         if result_code == 68:
             exception_type = ldap3.LDAPEntryAlreadyExistsResult
         elif result_code == 32:
@@ -491,27 +633,81 @@ class Admin(object):
             exception_type = ldap3.LDAPOperationResult
 
         if exception_type:
-            raise exception_type(result=self.ldap.result['result'],
-                                 description=self.ldap.result['description'],
-                                 dn=self.ldap.result['dn'],
-                                 message=self.ldap.result['message'],
-                                 response_type=self.ldap.result['type'])
+            raise exception_type(result=conn.result['result'],
+                                 description=conn.result['description'],
+                                 dn=conn.result['dn'],
+                                 message=conn.result['message'],
+                                 response_type=conn.result['type'])
+
+    def cached(self, key, func):
+        """Return cached result of func, call func if missing or expired."""
+        if not self.cache_ttl:
+            return func()
+
+        now = time.time()
+        with self._cache_lock:
+            expires, value = self._cache.get(key, (0, None))
+            if expires > now:
+                self._cache_hits += 1
+                return copy.deepcopy(value)
+            self._cache_misses += 1
+            generation = self._cache_generation[key[0]]
+
+        value = func()
+        with self._cache_lock:
+            # Result read before an invalidate may be stale, do not store.
+            if self._cache_generation[key[0]] == generation:
+                self._cache.pop(key, None)
+                self._cache[key] = (now + self.cache_ttl, value)
+                self._evict(now)
+        return copy.deepcopy(value)
+
+    def _evict(self, now):
+        """Drop expired results, then oldest ones over cache_size."""
+        while self._cache:
+            key, (expires, _value) = next(iter(self._cache.items()))
+            if expires > now and len(self._cache) <= self.cache_size:
+                break
+            del self._cache[key]
+            self._cache_evicted += 1
+
+    def invalidate(self, kind):
+        """Drop cached results of the given kind of objects."""
+        with self._cache_lock:
+            self._cache_generation[kind] += 1
+            for key in [key for key in self._cache if key[0] == kind]:
+                del self._cache[key]
+
+    def cache_stats(self):
+        """Return cache hit/miss/eviction counters and number of cached
+        results.
+        """
+        with self._cache_lock:
+            return {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'evicted': self._cache_evicted,
+                'size': len(self._cache),
+            }
 
     def modify(self, dn, changes):
         """Call ldap modify and raise exception on non-success."""
         if changes:
-            self.ldap.modify(dn, changes)
-            self._test_raise_exceptions()
+            with self._connection() as conn:
+                conn.modify(dn, changes)
+                self._test_raise_exceptions(conn)
 
     def add(self, dn, object_class=None, attributes=None):
         """Call ldap add and raise exception on non-success."""
-        self.ldap.add(dn, object_class, attributes)
-        self._test_raise_exceptions()
+        with self._connection() as conn:
+            conn.add(dn, object_class, attributes)
+            self._test_raise_exceptions(conn)
 
     def delete(self, dn):
         """Call ldap delete and raise exception on non-success."""
-        self.ldap.delete(dn)
-        self._test_raise_exceptions()
+        with self._connection() as conn:
+            conn.delete(dn)
+            self._test_raise_exceptions(conn)
 
     def list(self, root=None):
         """Lists all objects in the database."""
@@ -831,6 +1027,9 @@ class Admin(object):
 class LdapObject(object):
     """Ldap object base class."""
 
+    # Read-mostly objects, get/list results are cached by the admin object.
+    _cacheable = False
+
     def __init__(self, admin):
         self.admin = admin
 
@@ -862,13 +1061,19 @@ class LdapObject(object):
 
     def get(self, ident):
         """Gets object given identity."""
-        entry = self.admin.get(self.dn(ident),
-                               self._query(),
-                               self.attrs())
-        if entry:
-            return self.from_entry(entry, self.dn(ident))
-        else:
-            return None
+        dn = self.dn(ident)
+
+        def _get():
+            """Get object from LDAP."""
+            entry = self.admin.get(dn, self._query(), self.attrs())
+            if entry:
+                return self.from_entry(entry, dn)
+            else:
+                return None
+
+        if self._cacheable:
+            return self.admin.cached((self.oc(), 'get', dn), _get)
+        return _get()
 
     def create(self, ident, attrs):
         """Create new ldap record."""
@@ -882,9 +1087,22 @@ class LdapObject(object):
                       self.entity(): ident_attr})
 
         self.admin.create(self.dn(ident), entry)
+        self._invalidate()
 
-    def list(self, attrs):
-        """List records, given attribute filter."""
+    def list(self, attrs, fields=None):
+        """List records, given attribute filter.
+
+        If fields are given, only these fields of the records are returned
+        and only their attributes are fetched, if they are plain attributes.
+        """
+        if self._cacheable:
+            key = (self.oc(), 'list', json.dumps(attrs, sort_keys=True),
+                   tuple(sorted(fields)) if fields is not None else None)
+            return self.admin.cached(key, lambda: self._list(attrs, fields))
+        return self._list(attrs, fields)
+
+    def _filter(self, attrs):
+        """Query matching records with the given attribute values."""
         query = self._query()
         for ldap_field, obj_field, _field_type in self.schema():
             if obj_field not in attrs:
@@ -900,18 +1118,130 @@ class LdapObject(object):
             else:
                 query(arg, attrs[obj_field])
 
+        return query
+
+    def _list(self, attrs, fields):
+        """List records from LDAP."""
+        query = self._filter(attrs)
+
+        ldap_attrs = self.attrs()
+        if fields is not None:
+            projected = {
+                obj_field: ldap_field
+                for ldap_field, obj_field, _field_type in self.schema()
+                if obj_field in fields
+            }
+            # Nested fields are built from grouped attributes, they can not
+            # be projected.
+            if set(fields) <= set(projected):
+                ldap_attrs = list(projected.values())
+
+        _LOGGER.debug('Query: %s', query.to_str())
+        result = self.admin.search(search_base=self.dn(),
+                                   search_filter=query.to_str(),
+                                   search_scope=ldap3.SUBTREE,
+                                   attributes=ldap_attrs)
+        objs = (self.from_entry(entry, dn) for dn, entry in result)
+        if fields is None:
+            return list(objs)
+        return [
+            {field: value for field, value in obj.items() if field in fields}
+            for obj in objs
+        ]
+
+    def list_modified(self, attrs, since=None):
+        """List records, given attribute filter, modified since LDAP time.
+
+        Returns the records and their latest modifyTimestamp, to be passed
+        as since to list the records modified after this call. Records
+        modified in the same second are listed again.
+        """
+        query = self._filter(attrs)
+        if since:
+            query('modifyTimestamp', since, op='>=')
+
         _LOGGER.debug('Query: %s', query.to_str())
         result = self.admin.search(search_base=self.dn(),
                                    search_filter=query.to_str(),
                                    search_scope=ldap3.SUBTREE,
-                                   attributes=self.attrs())
-        return [self.from_entry(entry, dn) for dn, entry in result]
+                                   attributes=self.attrs() + [
+                                       'modifyTimestamp'
+                                   ])
+        objs = []
+        latest = since
+        for dn, entry in result:
+            timestamp = _first(entry.get('modifyTimestamp'))
+            if timestamp is not None:
+                latest = max(latest or '', _generalized_time(timestamp))
+            objs.append(self.from_entry(entry, dn))
+
+        return objs, latest
+
+    def version(self, ident=None):
+        """Returns version of the record, or of all records.
+
+        The version is a digest of the dn and entryCSN of the entries, only
+        these are read. The entryCSN changes on every modification, the
+        modifyTimestamp (one second resolution) is used if there is none.
+        """
+        result = self.admin.search(search_base=self.dn(ident),
+                                   search_filter=self._query().to_str(),
+                                   search_scope=ldap3.SUBTREE,
+                                   attributes=['entryCSN', 'modifyTimestamp'])
+        digest = hashlib.sha1()
+        for dn, entry in sorted(result, key=lambda item: item[0]):
+            digest.update(dn.encode())
+            digest.update(str(
+                _first(entry.get('entryCSN') or
+                       entry.get('modifyTimestamp'))
+            ).encode())
+
+        return digest.hexdigest()
+
+    def _search_many(self, idents, attributes):
+        """Search records given identities, a chunk of them per search."""
+        idents = list(idents)
+        for idx in range(0, len(idents), _SEARCH_MANY_SIZE):
+            query = '(&(objectClass=%s)(|%s))' % (
+                self.oc(),
+                ''.join('(%s=%s)' % (self.entity(),
+                                     ldap3_conv.escape_filter_chars(ident))
+                        for ident in idents[idx:idx + _SEARCH_MANY_SIZE])
+            )
+            yield from self.admin.search(search_base=self.dn(),
+                                         search_filter=query,
+                                         search_scope=ldap3.SUBTREE,
+                                         attributes=attributes)
+
+    def get_many(self, idents):
+        """Gets objects given identities, returns dict of found objects."""
+        return {
+            _first(entry[self.entity()]): self.from_entry(entry, dn)
+            for dn, entry in self._search_many(idents, self.attrs())
+        }
+
+    def modified(self, idents):
+        """Returns versions of records given identities.
+
+        The version is the entryCSN, which changes on every modification,
+        or modifyTimestamp (one second resolution) if there is no entryCSN.
+        """
+        return {
+            _first(entry[self.entity()]): str(
+                _first(entry.get('entryCSN') or
+                       entry.get('modifyTimestamp'))
+            )
+            for _dn, entry in self._search_many(
+                idents, [self.entity(), 'entryCSN', 'modifyTimestamp']
+            )
+        }
 
     def update(self, ident, attrs):
         """Updates LDAP record."""
         dn = self.dn(ident)
         new_entry = self.to_entry(attrs)
         self.admin.update(dn, new_entry)
+        self._invalidate()
 
     def replace(self, ident, attrs):
         """Replaces LDAP record."""
@@ -923,11 +1253,18 @@ class LdapObject(object):
         dn = self.dn(ident)
         new_entry = self.to_entry(attrs)
         self.admin.remove(dn, new_entry)
+        self._invalidate()
 
     def delete(self, ident):
         """Deletes LDAP record."""
         assert ident is not None
         self.admin.delete(self.dn(ident))
+        self._invalidate()
+
+    def _invalidate(self):
+        """Drop cached results after modification."""
+        if self._cacheable:
+            self.admin.invalidate(self.oc())
 
     def children(self, ident, clazz):
         """Selects all children given the children type."""
@@ -1280,6 +1617,7 @@ class Cell(LdapObject):
     ]
 
     _oc = 'tmCell'
+    _cacheable = True
     _ou = 'cells'
     _entity = 'cell'
 
@@ -1358,6 +1696,7 @@ class Tenant(LdapObject):
                ('system', 'systems', [int])]
 
     _oc = 'tmTenant'
+    _cacheable = True
     _ou = 'allocations'
     _entity = 'tenant'
 
@@ -1527,6 +1866,7 @@ class Allocation(LdapObject):
     ]
 
     _oc = 'tmAllocation'
+    _cacheable = True
     _ou = 'allocations'
     _entity = 'allocation'
 
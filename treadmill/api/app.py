@@ -1,8 +1,11 @@
 """Implementation of app API."""
 
 
+import copy
 import logging
 import fnmatch
+import threading
+import time
 
 import jsonschema.exceptions
 
@@ -10,12 +13,16 @@ from treadmill import context
 from treadmill import schema
 from treadmill import authz
 from treadmill import admin
+from treadmill import utils
 
 from treadmill.appcfg import features
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds after which cached manifests are revalidated against LDAP.
+_MANIFEST_TTL = 60
+
 
 def verify_feature(app_features):
     """Verify that any feature in this resource has a corresponding module"""
@@ -26,6 +33,97 @@ def verify_feature(app_features):
             )
 
 
+class ManifestCache(object):
+    """Application manifest cache.
+
+    Manifests are versioned by the LDAP entryCSN. After ttl seconds only the
+    versions are read, and manifests are fetched again only if modified.
+    Manifests are looked up in bulk.
+
+    The cache is per process: invalidate() only affects the worker that
+    handled the update, other workers may return the old manifest for up
+    to ttl seconds unless get() is called with revalidate=True.
+    """
+
+    __slots__ = (
+        'ttl',
+        'hits',
+        'misses',
+        '_manifests',
+        '_lock',
+    )
+
+    def __init__(self, ttl=_MANIFEST_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # app_id -> (checked, version, manifest)
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def get(self, app_ids, revalidate=False):
+        """Return dict of manifests of the configured applications.
+
+        If revalidate is True, versions are always checked, so that only
+        unmodified manifests are served from cache.
+        """
+        now = time.time()
+        result = {}
+        stale = []
+        with self._lock:
+            for app_id in set(app_ids):
+                cached = self._manifests.get(app_id)
+                if (not revalidate and
+                        cached and cached[0] + self.ttl > now):
+                    self.hits += 1
+                    result[app_id] = cached[2]
+                else:
+                    stale.append(app_id)
+
+        if stale:
+            admin_app = admin.Application(context.GLOBAL.ldap.conn)
+            versions = admin_app.modified(stale)
+            with self._lock:
+                current = {
+                    app_id: self._manifests[app_id]
+                    for app_id in stale
+                    if app_id in self._manifests and
+                    self._manifests[app_id][1] == versions.get(app_id)
+                }
+            modified = admin_app.get_many(
+                [app_id for app_id in versions if app_id not in current]
+            )
+
+            with self._lock:
+                for app_id in stale:
+                    self._manifests.pop(app_id, None)
+                    if app_id in current:
+                        self.hits += 1
+                        manifest = current[app_id][2]
+                    elif app_id in modified:
+                        self.misses += 1
+                        manifest = modified[app_id]
+                    else:
+                        continue
+                    self._manifests[app_id] = (
+                        now, versions[app_id], manifest
+                    )
+                    result[app_id] = manifest
+
+        return {
+            app_id: copy.deepcopy(manifest)
+            for app_id, manifest in result.items()
+        }
+
+    def invalidate(self, app_id):
+        """Drop cached manifest, e.g. after the application is modified."""
+        with self._lock:
+            self._manifests.pop(app_id, None)
+
+
+MANIFESTS = ManifestCache()
+
+
 class API(object):
     """Treadmill App REST api."""
 
@@ -35,17 +133,23 @@ class API(object):
             """Lazily return admin object."""
             return admin.Application(context.GLOBAL.ldap.conn)
 
-        def _list(match=None):
-            """List configured applications."""
+        def _list(match=None, limit=None, after=None, fields=None):
+            """List configured applications, limit items after the given id.
+
+            If fields are given, only these fields of the applications are
+            returned.
+            """
             if match is None:
                 match = '*'
 
-            apps = _admin_app().list({})
-            filtered = [
-                app for app in apps
-                if fnmatch.fnmatch(app['_id'], match)
-            ]
-            return sorted(filtered)
+            if fields is not None:
+                fields = set(fields) | {'_id'}
+
+            apps = _admin_app().list({}, fields=fields)
+            return utils.paginate(
+                (app for app in apps if fnmatch.fnmatch(app['_id'], match)),
+                limit, after, key=lambda app: app['_id']
+            )
 
         @schema.schema({'$ref': 'app.json#/resource_id'})
         def get(rsrc_id):
@@ -64,6 +168,7 @@ class API(object):
             verify_feature(rsrc.get('features', []))
 
             _admin_app().create(rsrc_id, rsrc)
+            MANIFESTS.invalidate(rsrc_id)
             return _admin_app().get(rsrc_id)
 
         @schema.schema(
@@ -76,12 +181,14 @@ class API(object):
             verify_feature(rsrc.get('features', []))
 
             _admin_app().replace(rsrc_id, rsrc)
+            MANIFESTS.invalidate(rsrc_id)
             return _admin_app().get(rsrc_id)
 
         @schema.schema({'$ref': 'app.json#/resource_id'})
         def delete(rsrc_id):
             """Delete configured application."""
             _admin_app().delete(rsrc_id)
+            MANIFESTS.invalidate(rsrc_id)
             return None
 
         self.list = _list
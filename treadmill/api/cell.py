@@ -52,8 +52,13 @@ class API(object):
             """Delete cell."""
             _admin_cell().delete(rsrc_id)
 
+        def version(rsrc_id=None):
+            """Return version of the cell, or of all cells."""
+            return {'version': _admin_cell().version(rsrc_id)}
+
         self.list = _list
         self.get = get
+        self.version = version
         self.create = create
         self.update = update
         self.delete = delete
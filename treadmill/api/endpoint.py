@@ -8,6 +8,8 @@ import kazoo
 
 from .. import context
 from .. import exc
+from .. import utils
+from .. import zkcache
 from .. import zknamespace as z
 
 
@@ -72,8 +74,12 @@ class API(object):
 
                 return True
 
-        def _list(pattern, proto, endpoint):
-            """List endpoints state."""
+        def _list(pattern, proto, endpoint, limit=None, after=None):
+            """List endpoints state.
+
+            Endpoints are ordered by name:proto:endpoint, the cursor to get
+            items after.
+            """
             proid, match = pattern.split('.', 1)
 
             if not match:
@@ -94,21 +100,42 @@ class API(object):
             endpoints = cell_state.get(proid, {})
             _LOGGER.debug('endpoints: %r', endpoints)
 
+            names = utils.paginate(
+                (proid + '.' + name for name in endpoints
+                 if fnmatch.fnmatch(name, full_pattern)),
+                limit, after
+            )
+
             filtered = []
-            for name, hostport in endpoints.items():
-                if not fnmatch.fnmatch(name, full_pattern):
+            for name in names:
+                hostport = endpoints.get(name[len(proid) + 1:])
+                if hostport is None:
                     continue
                 appname, proto, endpoint = name.split(':')
                 host, port = hostport.split(':')
-                filtered.append({'name': proid + '.' + appname,
+                filtered.append({'name': appname,
                                  'proto': proto,
                                  'endpoint': endpoint,
                                  'host': host,
                                  'port': port})
 
-            return sorted(filtered, key=lambda item: item['name'])
+            return filtered
+
+        def version(pattern):
+            """Return version of the proid endpoints."""
+            proid = pattern.split('.', 1)[0]
+            _children, stat = context.GLOBAL.zk.cache.get_children(
+                z.join_zookeeper_path(z.ENDPOINTS, proid), need_metadata=True
+            )
+            meta = zkcache.metadata(stat)
+            if meta is None:
+                return None
+            # Node mtime does not change when children are added or
+            # removed, only the zxid is a version of the list.
+            return {'version': meta['zxid']}
 
         self.list = _list
+        self.version = version
 
 
 def init(_authorizer):
@@ -1,6 +1,7 @@
 """Implementation of instance API.
 """
 
+import copy
 import fnmatch
 import importlib
 import logging
@@ -12,6 +13,8 @@ from treadmill import exc
 from treadmill import master
 from treadmill import schema
 from treadmill import utils
+from treadmill import zkcache
+from treadmill import zknamespace as z
 
 from treadmill.api import app
 
@@ -48,24 +51,43 @@ class API(object):
         except ImportError as err:
             _LOGGER.info('Unable to load auth plugin: %s', err)
 
-        def _list(match=None):
-            """List configured instances."""
+        def _list(match=None, limit=None, after=None):
+            """List configured instances, limit items after the given id."""
             if match is None:
                 match = '*'
             if '#' not in match:
                 match += '#*'
 
-            instances = master.list_scheduled_apps(context.GLOBAL.zk.conn)
-            filtered = [
-                inst for inst in instances
-                if fnmatch.fnmatch(inst, match)
-            ]
-            return sorted(filtered)
+            instances = context.GLOBAL.zk.cache.get_children(z.SCHEDULED)
+            return utils.paginate(
+                (inst for inst in instances if fnmatch.fnmatch(inst, match)),
+                limit, after
+            )
+
+        def version(rsrc_id=None):
+            """Return version of the instance, or of the instance list."""
+            if rsrc_id is None:
+                _children, stat = context.GLOBAL.zk.cache.get_children(
+                    z.SCHEDULED, need_metadata=True
+                )
+            else:
+                _data, stat = context.GLOBAL.zk.cache.get_raw(
+                    z.path.scheduled(rsrc_id), need_metadata=True
+                )
+
+            meta = zkcache.metadata(stat)
+            if meta is None:
+                return None
+            if rsrc_id is None:
+                # Node mtime does not change when children are added or
+                # removed, only the zxid is a version of the list.
+                return {'version': meta['zxid']}
+            return {'version': meta['zxid'], 'mtime': meta['mtime']}
 
         @schema.schema({'$ref': 'instance.json#/resource_id'})
         def get(rsrc_id):
             """Get instance configuration."""
-            inst = master.get_app(context.GLOBAL.zk.conn, rsrc_id)
+            inst = context.GLOBAL.zk.cache.get(z.path.scheduled(rsrc_id))
             if inst is None:
                 return inst
 
@@ -75,25 +97,20 @@ class API(object):
             else:
                 return inst
 
-        @schema.schema(
-            {'$ref': 'app.json#/resource_id'},
-            {'allOf': [{'$ref': 'instance.json#/resource'},
-                       {'$ref': 'instance.json#/verbs/create'}]},
-            count={'type': 'integer', 'minimum': 1, 'maximum': 1000}
-        )
-        def create(rsrc_id, rsrc, count=1):
-            """Create (configure) instance."""
-            _LOGGER.info('create: count = %s, %s %r', count, rsrc_id, rsrc)
-
-            admin_app = admin.Application(context.GLOBAL.ldap.conn)
-            if not rsrc:
-                configured = admin_app.get(rsrc_id)
-                _LOGGER.info('Configured: %s %r', rsrc_id, configured)
-            else:
-                # Make sure defaults are present
-                configured = admin_app.from_entry(admin_app.to_entry(rsrc))
-                app.verify_feature(rsrc.get('features', []))
-
+        def _configured(rsrc_id):
+            """Get configured application manifest."""
+            configured = app.MANIFESTS.get(
+                [rsrc_id], revalidate=True
+            ).get(rsrc_id)
+            if configured is None:
+                raise exc.NotFoundError(
+                    'Application not configured: {}'.format(rsrc_id)
+                )
+            _LOGGER.info('Configured: %s %r', rsrc_id, configured)
+            return configured
+
+        def _create(rsrc_id, configured, count):
+            """Validate manifest and schedule instances."""
             if '_id' in configured:
                 del configured['_id']
 
@@ -120,6 +137,69 @@ class API(object):
                                            rsrc_id, configured, count)
             return scheduled
 
+        @schema.schema(
+            {'$ref': 'app.json#/resource_id'},
+            {'allOf': [{'$ref': 'instance.json#/resource'},
+                       {'$ref': 'instance.json#/verbs/create'}]},
+            count={'type': 'integer', 'minimum': 1, 'maximum': 1000}
+        )
+        def create(rsrc_id, rsrc, count=1):
+            """Create (configure) instance."""
+            _LOGGER.info('create: count = %s, %s %r', count, rsrc_id, rsrc)
+
+            if not rsrc:
+                configured = _configured(rsrc_id)
+            else:
+                # Make sure defaults are present
+                admin_app = admin.Application(context.GLOBAL.ldap.conn)
+                configured = admin_app.from_entry(admin_app.to_entry(rsrc))
+                app.verify_feature(rsrc.get('features', []))
+
+            return _create(rsrc_id, configured, count)
+
+        @schema.schema(
+            {'type': 'array', 'items': {
+                'type': 'object',
+                'properties': {
+                    '_id': {'$ref': 'app.json#/resource_id'},
+                    'count': {'type': 'integer',
+                              'minimum': 1, 'maximum': 1000},
+                },
+                'required': ['_id', 'count'],
+            }}
+        )
+        def bulk_create(rsrcs):
+            """Create instances of many configured applications.
+
+            The manifests are looked up in bulk. Returns the instances, or
+            the error, for each application.
+            """
+            _LOGGER.info('bulk create: %r', rsrcs)
+
+            manifests = app.MANIFESTS.get(
+                [rsrc['_id'] for rsrc in rsrcs], revalidate=True
+            )
+            result = []
+            for rsrc in rsrcs:
+                rsrc_id = rsrc['_id']
+                try:
+                    if rsrc_id not in manifests:
+                        raise exc.NotFoundError(
+                            'Application not configured: {}'.format(rsrc_id)
+                        )
+                    configured = copy.deepcopy(manifests[rsrc_id])
+                    result.append({
+                        '_id': rsrc_id,
+                        'instances': _create(rsrc_id, configured,
+                                             rsrc['count']),
+                    })
+                except Exception as err:  # pylint: disable=W0703
+                    _LOGGER.warning('Unable to create instances: %s: %s',
+                                    rsrc_id, err)
+                    result.append({'_error': {'_id': rsrc_id,
+                                              'why': str(err)}})
+            return result
+
         @schema.schema(
             {'$ref': 'instance.json#/resource_id'},
             {'allOf': [{'$ref': 'instance.json#/verbs/update'}]}
@@ -142,7 +222,9 @@ class API(object):
 
         self.list = _list
         self.get = get
+        self.version = version
         self.create = create
+        self.bulk_create = bulk_create
         self.update = update
         self.delete = delete
 
@@ -5,6 +5,7 @@ from .. import admin
 from .. import authz
 from .. import context
 from .. import schema
+from .. import utils
 
 
 class API(object):
@@ -24,9 +25,22 @@ class API(object):
             partition={'anyOf': [
                 {'type': 'null'},
                 {'$ref': 'server.json#/resource/properties/partition'}
+            ]},
+            limit={'anyOf': [
+                {'type': 'null'},
+                {'type': 'integer', 'minimum': 1}
+            ]},
+            after={'anyOf': [
+                {'type': 'null'},
+                {'type': 'string'}
+            ]},
+            fields={'anyOf': [
+                {'type': 'null'},
+                {'type': 'array', 'items': {'type': 'string'}}
             ]}
         )
-        def _list(cell=None, partition=None):
+        def _list(cell=None, partition=None, limit=None, after=None,
+                  fields=None):
             """List servers by cell and/or features."""
             filter_ = {}
             if cell:
@@ -35,7 +49,12 @@ class API(object):
             if partition:
                 filter_['partition'] = partition
 
-            return _admin_svr().list(filter_)
+            if fields is not None:
+                fields = set(fields) | {'_id'}
+
+            return utils.paginate(_admin_svr().list(filter_, fields=fields),
+                                  limit, after,
+                                  key=lambda server: server['_id'])
 
         @schema.schema({'$ref': 'server.json#/resource_id'})
         def get(rsrc_id):
@@ -65,8 +84,13 @@ class API(object):
             """Delete server."""
             _admin_svr().delete(rsrc_id)
 
+        def version(rsrc_id=None):
+            """Return version of the server, or of all servers."""
+            return {'version': _admin_svr().version(rsrc_id)}
+
         self.list = _list
         self.get = get
+        self.version = version
         self.create = create
         self.update = update
         self.delete = delete
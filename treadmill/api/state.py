@@ -1,6 +1,8 @@
 """Implementation of state API."""
 
 
+import hashlib
+import json
 import logging
 
 import os
@@ -14,6 +16,7 @@ import yaml
 from treadmill import context
 from treadmill import schema
 from treadmill import exc
+from treadmill import utils
 from treadmill import zknamespace as z
 from treadmill import zkutils
 
@@ -35,6 +38,7 @@ def watch_running(zkclient, cell_state):
             )
             if item['host'] is not None:
                 item['state'] = state
+        cell_state.generation += 1
         return True
 
     _LOGGER.info('Loaded running.')
@@ -56,6 +60,7 @@ def watch_finished(zkclient, cell_state):
                 {}
             )
             cell_state.finished[instance] = finished_data
+            cell_state.generation += 1
 
     _LOGGER.info('Loaded finished.')
 
@@ -69,6 +74,7 @@ def watch_placement(zkclient, cell_state):
         """Watch /placement data."""
         if placement is None or event == 'DELETED':
             cell_state.placement.clear()
+            cell_state.generation += 1
             return True
 
         updated_placement = {}
@@ -86,6 +92,7 @@ def watch_placement(zkclient, cell_state):
                 'expires': expires,
             }
         cell_state.placement = updated_placement
+        cell_state.generation += 1
         return True
 
     _LOGGER.info('Loaded placement.')
@@ -121,6 +128,7 @@ def watch_finished_history(zkclient, cell_state):
                     data = yaml.load(data)
                 cell_state.finished[instance] = data
             conn.close()
+            cell_state.generation += 1
             os.unlink(f.name)
 
         return True
@@ -136,6 +144,8 @@ class CellState(object):
         'placement',
         'finished',
         'watches',
+        'generation',
+        '_version',
     )
 
     def __init__(self):
@@ -143,6 +153,23 @@ class CellState(object):
         self.placement = {}
         self.finished = {}
         self.watches = set()
+        self.generation = 0
+        self._version = None
+
+    def version(self):
+        """Return digest of the state, computed once per change.
+
+        Finished instances are only ever added, so their count is enough.
+        """
+        generation = self.generation
+        if self._version is None or self._version[0] != generation:
+            digest = hashlib.sha1(
+                json.dumps(self.placement, sort_keys=True).encode()
+            )
+            digest.update(str(len(self.finished)).encode())
+            self._version = (generation, digest.hexdigest())
+
+        return self._version[1]
 
     def get_finished(self, rsrc_id):
         """Get finished state if present."""
@@ -187,27 +214,33 @@ class API(object):
             watch_finished(zkclient, cell_state)
             watch_finished_history(zkclient, cell_state)
 
-        def _list(match=None, finished=False):
-            """List instances state."""
+        def _list(match=None, finished=False, limit=None, after=None):
+            """List instances state, limit items after the given name."""
             if match is None:
                 match = '*'
             if '#' not in match:
                 match += '#*'
-            filtered = [
-                {'name': name, 'state': item['state'], 'host': item['host']}
-                for name, item in cell_state.placement.items()
-                if fnmatch.fnmatch(name, match)
-            ]
 
+            placement = cell_state.placement
+            names = list(placement.keys())
             if finished:
-                for name in cell_state.finished.keys():
-                    if fnmatch.fnmatch(name, match):
-                        state = cell_state.get_finished(name)
-                        item = {'name': name}
-                        item.update(state)
-                        filtered.append(item)
+                names.extend(cell_state.finished.keys())
+
+            filtered = []
+            for name in utils.paginate(
+                    (name for name in names if fnmatch.fnmatch(name, match)),
+                    limit, after):
+                item = placement.get(name)
+                if item is not None:
+                    filtered.append({'name': name,
+                                     'state': item['state'],
+                                     'host': item['host']})
+                else:
+                    item = {'name': name}
+                    item.update(cell_state.get_finished(name))
+                    filtered.append(item)
 
-            return sorted(filtered, key=lambda item: item['name'])
+            return filtered
 
         @schema.schema({'$ref': 'instance.json#/resource_id'})
         def get(rsrc_id):
@@ -224,8 +257,13 @@ class API(object):
             res.update(state)
             return res
 
+        def version():
+            """Return state version."""
+            return {'version': cell_state.version()}
+
         self.list = _list
         self.get = get
+        self.version = version
 
 
 def init(_authorizer):
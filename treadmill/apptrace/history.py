@@ -0,0 +1,215 @@
+"""Consolidated, indexed trace history store.
+
+Trace (and finished) history is uploaded to Zookeeper as many small
+compressed sqlite snapshots, which are mirrored to disk as separate
+databases. The store merges them into time partitioned databases, indexed by
+instance and application, and keeps bounded retention on disk.
+
+Partitions keep the (path, timestamp, data) table layout of the snapshots,
+so existing state of the world readers can use them unchanged.
+
+Merged snapshots are replaced by an empty marker, so that they are not
+downloaded again when zk2fs restarts.
+"""
+
+import glob
+import logging
+import os
+import sqlite3
+import time
+
+from treadmill import fs
+from treadmill import utils
+
+
+_LOGGER = logging.getLogger(__name__)
+
+_PARTITION_PREFIX = 'part-'
+
+_MERGED_SUFFIX = '.merged'
+
+# Default partition size - 1 hour.
+PARTITION_SIZE = 60 * 60
+
+# Default retention - 7 days.
+RETENTION = 7 * 24 * 60 * 60
+
+
+def _instance_app(path):
+    """Extract instance id and app name from trace/finished node path."""
+    name = os.path.basename(path)
+    instanceid = name.split(',', 1)[0]
+    return instanceid, instanceid.rsplit('#', 1)[0]
+
+
+class HistoryStore(object):
+    """Time partitioned history store."""
+
+    def __init__(self, store_dir, table='trace',
+                 partition_size=PARTITION_SIZE, retention=RETENTION):
+        self.store_dir = store_dir
+        self.table = table
+        self.partition_size = partition_size
+        self.retention = retention
+
+    def _partition_path(self, start):
+        """Return path of the partition starting at start."""
+        return os.path.join(
+            self.store_dir,
+            '{}.{}{:010d}'.format(self.table, _PARTITION_PREFIX, start)
+        )
+
+    def _partition_start(self, path):
+        """Return partition start time, given partition path."""
+        return int(os.path.basename(path).rsplit('-', 1)[1])
+
+    def partitions(self, since=0, until=None):
+        """Return sorted list of partitions overlapping since/until."""
+        pattern = os.path.join(
+            self.store_dir, '{}.{}*'.format(self.table, _PARTITION_PREFIX)
+        )
+        result = []
+        for path in sorted(glob.glob(pattern)):
+            start = self._partition_start(path)
+            if start + self.partition_size <= since:
+                continue
+            if until is not None and start > until:
+                continue
+            result.append(path)
+        return result
+
+    def _merged_path(self, name):
+        """Return path of the marker of merged snapshot."""
+        return os.path.join(self.store_dir, '.' + name + _MERGED_SUFFIX)
+
+    def merged(self, name):
+        """Check if snapshot with the given name was merged."""
+        return os.path.exists(self._merged_path(name))
+
+    def remove(self, name):
+        """Remove snapshot and its merged marker."""
+        fs.rm_safe(os.path.join(self.store_dir, name))
+        fs.rm_safe(self._merged_path(name))
+
+    def snapshots(self):
+        """Return sorted list of snapshot databases waiting to be merged."""
+        return sorted(
+            glob.glob(os.path.join(self.store_dir, self.table + '.db*'))
+        )
+
+    def _connect(self, path):
+        """Open partition, creating the schema if needed."""
+        conn = sqlite3.connect(path)
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS {table} (
+                path TEXT PRIMARY KEY,
+                timestamp INTEGER,
+                data TEXT,
+                instanceid TEXT,
+                app TEXT
+            );
+            CREATE INDEX IF NOT EXISTS {table}_timestamp_idx
+                ON {table} (timestamp);
+            CREATE INDEX IF NOT EXISTS {table}_instance_idx
+                ON {table} (instanceid, timestamp);
+            CREATE INDEX IF NOT EXISTS {table}_app_idx
+                ON {table} (app, timestamp);
+            """.format(table=self.table)
+        )
+        return conn
+
+    def merge(self, snapshot):
+        """Merge snapshot database into partitions.
+
+        Merge is idempotent, records already present are ignored.
+        """
+        partitions = {}
+        with sqlite3.connect(snapshot) as conn:
+            rows = conn.execute(
+                'SELECT path, timestamp, data FROM {}'.format(self.table)
+            )
+            for path, timestamp, data in rows:
+                start = (int(timestamp) // self.partition_size *
+                         self.partition_size)
+                instanceid, app = _instance_app(path)
+                partitions.setdefault(start, []).append(
+                    (path, timestamp, data, instanceid, app)
+                )
+        conn.close()
+
+        for start, rows in sorted(partitions.items()):
+            conn = self._connect(self._partition_path(start))
+            with conn:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO {} '
+                    '(path, timestamp, data, instanceid, app) '
+                    'VALUES (?, ?, ?, ?, ?)'.format(self.table),
+                    rows
+                )
+            conn.close()
+
+        return sum(len(rows) for rows in partitions.values())
+
+    def expire(self, now=None):
+        """Remove partitions older than retention."""
+        if now is None:
+            now = time.time()
+
+        for path in self.partitions():
+            start = self._partition_start(path)
+            if start + self.partition_size < now - self.retention:
+                _LOGGER.info('Removing expired partition: %s', path)
+                os.unlink(path)
+
+    def compact(self):
+        """Merge all snapshots into partitions and apply retention."""
+        for snapshot in self.snapshots():
+            try:
+                count = self.merge(snapshot)
+            except sqlite3.DatabaseError:
+                _LOGGER.exception('Unable to merge: %s', snapshot)
+                continue
+
+            _LOGGER.info('Merged %s records from: %s', count, snapshot)
+            utils.touch(self._merged_path(os.path.basename(snapshot)))
+            os.unlink(snapshot)
+
+        self.expire()
+
+    def lookup(self, instanceid=None, app=None, since=0, until=None,
+               path_glob=None):
+        """Generate (timestamp, path, data) records, ordered by timestamp
+        and path.
+
+        Only partitions overlapping since/until are queried, and within
+        a partition the instance or app index is used. Records are read
+        lazily, one partition at a time.
+        """
+        conditions = ['timestamp >= ?']
+        args = [since]
+        if path_glob is not None:
+            conditions.append('path GLOB ?')
+            args.append(path_glob)
+        if until is not None:
+            conditions.append('timestamp <= ?')
+            args.append(until)
+        if instanceid is not None:
+            conditions.append('instanceid = ?')
+            args.append(instanceid)
+        elif app is not None:
+            conditions.append('app = ?')
+            args.append(app)
+
+        select_stmt = (
+            'SELECT timestamp, path, data FROM {} WHERE {} '
+            'ORDER BY timestamp, path'.format(self.table,
+                                              ' AND '.join(conditions))
+        )
+
+        for path in self.partitions(since=since, until=until):
+            conn = sqlite3.connect(path)
+            try:
+                yield from conn.execute(select_stmt, args)
+            finally:
+                conn.close()
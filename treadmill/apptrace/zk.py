@@ -2,6 +2,7 @@
 """
 
 import fnmatch
+import json
 import logging
 import tempfile
 import os
@@ -19,6 +20,9 @@ from . import events as traceevents
 
 _LOGGER = logging.getLogger(__name__)
 
+# Stay below Zookeeper 1MB node size limit.
+_MAX_CURSOR_BYTES = 512 * 1024
+
 
 class AppTrace(object):
     """Trace application lifecycle events.
@@ -158,6 +162,69 @@ def list_traces(zkclient, app_pattern):
     return apps
 
 
+class CleanupCursor(object):
+    """Cleanup state kept between cleanup cycles.
+
+    horizon - per trace shard, timestamp before which the shard had no
+              events left (other than pending ones) when it was last listed.
+    modified - last modified time of finished nodes seen so far.
+    pending - expired nodes not yet uploaded, path => timestamp.
+    """
+    __slots__ = (
+        'horizon',
+        'modified',
+        'pending',
+    )
+
+    def __init__(self):
+        self.horizon = {}
+        self.modified = {}
+        self.pending = {}
+
+    def save(self, zkclient, name):
+        """Store cursor in Zookeeper, so that a restart resumes from it.
+
+        Pending nodes are not stored, the horizon of shards with pending
+        nodes is dropped instead, so that they are listed again.
+        """
+        pending_shards = set(
+            path.split('/')[2] for path in self.pending
+            if path.startswith(z.TRACE + '/')
+        )
+        state = {
+            'horizon': {shard: horizon
+                        for shard, horizon in self.horizon.items()
+                        if shard not in pending_shards},
+            'modified': self.modified,
+        }
+        payload = json.dumps(state)
+        if len(payload) > _MAX_CURSOR_BYTES:
+            _LOGGER.warning('Cursor %s too big: %s, not storing modified.',
+                            name, len(payload))
+            state['modified'] = {}
+            payload = json.dumps(state)
+
+        zkutils.put(zkclient, z.path.trace_cleanup(name), payload)
+
+    @classmethod
+    def load(cls, zkclient, name):
+        """Load cursor stored in Zookeeper, empty cursor if there is none.
+        """
+        cursor = cls()
+        try:
+            payload, _metadata = zkclient.get(z.path.trace_cleanup(name))
+            state = json.loads(payload.decode())
+        except kazoo.client.NoNodeError:
+            return cursor
+        except ValueError:
+            _LOGGER.warning('Invalid cursor %s, starting over.', name)
+            return cursor
+
+        cursor.horizon = state['horizon']
+        cursor.modified = state['modified']
+        return cursor
+
+
 def _upload_batch(zkclient, db_node_path, dbname, batch):
     """Generate snapshot DB and upload to zk."""
     with tempfile.NamedTemporaryFile(delete=False) as f:
@@ -197,68 +264,152 @@ def _upload_batch(zkclient, db_node_path, dbname, batch):
     os.unlink(f.name)
 
     # Delete uploaded nodes from zk.
-    for path, _ts, _data in batch:
-        zkutils.with_retry(zkutils.ensure_deleted, zkclient, path)
+    zkutils.ensure_deleted_batch(zkclient, [path for path, _ts, _d in batch])
 
 
-def cleanup_trace(zkclient, batch_size, expires_after):
-    """Move expired traces into history folder, compressed as sqlite db."""
-    shards = zkclient.get_children(z.TRACE)
-    traces = []
-    for shard in shards:
-        events = zkclient.get_children(z.path.trace_shard(shard))
-        for event in events:
-            timestamp = float(event.split(',')[1])
-            if timestamp < time.time() - expires_after:
-                traces.append((timestamp, shard, event))
+def _get_data(zkclient, paths):
+    """Read data of many nodes, pipelining the reads."""
+    async_results = [zkclient.get_async(path) for path in paths]
+    result = []
+    for async_result in async_results:
+        try:
+            data, _metadata = async_result.get()
+        except kazoo.client.NoNodeError:
+            data = None
+        result.append(data)
+    return result
+
 
-    # Sort traces from older to latest.
-    traces.sort()
+def _upload_pending(zkclient, cursor, db_node_path, dbname, batch_size,
+                    max_batches, with_data):
+    """Upload expired nodes in full batches, oldest first.
 
-    for idx in range(0, len(traces), batch_size):
+    Returns number of expired nodes still pending.
+    """
+    expired = sorted((timestamp, path)
+                     for path, timestamp in cursor.pending.items())
+
+    uploaded = 0
+    for idx in range(0, len(expired), batch_size):
         # Take a slice of batch_size
-        batch = traces[idx:idx + batch_size]
+        batch = expired[idx:idx + batch_size]
         if len(batch) < batch_size:
-            _LOGGER.info('Traces: batch = %s, total = %s, exiting.',
-                         batch_size, len(batch))
+            _LOGGER.info('%s: batch = %s, total = %s, exiting.',
+                         dbname, batch_size, len(batch))
+            break
+
+        if max_batches is not None and uploaded >= max_batches:
+            _LOGGER.info('%s: uploaded %s batches, backlog = %s.',
+                         dbname, uploaded, len(expired) - idx)
             break
 
+        paths = [path for _timestamp, path in batch]
+        if with_data:
+            data = _get_data(zkclient, paths)
+        else:
+            data = [None] * len(paths)
+
         db_rows = [
-            (z.join_zookeeper_path(z.TRACE, shard, event), timestamp, None)
-            for timestamp, shard, event in batch
+            (path, timestamp, node_data)
+            for (timestamp, path), node_data in zip(batch, data)
         ]
 
-        _upload_batch(
-            zkclient,
-            z.path.trace_history('trace.db.gzip-'),
-            'trace',
-            db_rows
-        )
+        _upload_batch(zkclient, db_node_path, dbname, db_rows)
 
+        for path in paths:
+            del cursor.pending[path]
+        uploaded += 1
 
-def cleanup_finished(zkclient, batch_size, expires_after):
-    """Move expired finished events into finished history."""
+    return len(cursor.pending)
 
-    expired = []
-    for finished in zkclient.get_children(z.FINISHED):
-        node_path = z.path.finished(finished)
-        data, metadata = zkclient.get(node_path)
-        if metadata.last_modified < time.time() - expires_after:
-            expired.append((node_path, metadata.last_modified, data))
 
-    for idx in range(0, len(expired), batch_size):
-        batch = expired[idx:idx + batch_size]
-        if len(batch) < batch_size:
-            _LOGGER.info('Finished: batch = %s, total = %s, exiting.',
-                         batch_size, len(batch))
-            break
+def cleanup_trace(zkclient, batch_size, expires_after, cursor=None,
+                  max_batches=None):
+    """Move expired traces into history folder, compressed as sqlite db.
 
-        _upload_batch(
-            zkclient,
-            z.path.finished_history('finished.db.gzip-'),
-            'finished',
-            batch
-        )
+    Shards are only listed if they may contain newly expired events, as
+    recorded in the cursor. New events are created with current timestamp,
+    so a shard with no events older than the expiration cutoff will not have
+    any until the cutoff moves past the shard horizon.
+
+    Returns number of expired traces still waiting to be uploaded.
+    """
+    if cursor is None:
+        cursor = CleanupCursor()
+
+    now = time.time()
+    cutoff = now - expires_after
+
+    for shard in zkclient.get_children(z.TRACE):
+        horizon = cursor.horizon.get(shard)
+        if horizon is not None and horizon >= cutoff:
+            continue
+
+        shard_path = z.path.trace_shard(shard)
+        horizon = now
+        for event in zkclient.get_children(shard_path):
+            timestamp = float(event.split(',')[1])
+            if timestamp < cutoff:
+                path = z.join_zookeeper_path(shard_path, event)
+                cursor.pending[path] = timestamp
+            else:
+                horizon = min(horizon, timestamp)
+
+        cursor.horizon[shard] = horizon
+
+    return _upload_pending(
+        zkclient,
+        cursor,
+        z.path.trace_history('trace.db.gzip-'),
+        'trace',
+        batch_size,
+        max_batches,
+        with_data=False
+    )
+
+
+def cleanup_finished(zkclient, batch_size, expires_after, cursor=None,
+                     max_batches=None):
+    """Move expired finished events into finished history.
+
+    Only finished nodes not seen before are read, the rest is taken from
+    the cursor.
+
+    Returns number of expired finished nodes still waiting to be uploaded.
+    """
+    if cursor is None:
+        cursor = CleanupCursor()
+
+    cutoff = time.time() - expires_after
+
+    finished = set(zkclient.get_children(z.FINISHED))
+    for instance in set(cursor.modified) - finished:
+        del cursor.modified[instance]
+        cursor.pending.pop(z.path.finished(instance), None)
+
+    unseen = sorted(finished - set(cursor.modified))
+    async_results = [zkclient.get_async(z.path.finished(instance))
+                     for instance in unseen]
+    for instance, async_result in zip(unseen, async_results):
+        try:
+            _data, metadata = async_result.get()
+        except kazoo.client.NoNodeError:
+            continue
+        cursor.modified[instance] = metadata.last_modified
+
+    for instance, last_modified in cursor.modified.items():
+        if last_modified < cutoff:
+            cursor.pending[z.path.finished(instance)] = last_modified
+
+    return _upload_pending(
+        zkclient,
+        cursor,
+        z.path.finished_history('finished.db.gzip-'),
+        'finished',
+        batch_size,
+        max_batches,
+        with_data=True
+    )
 
 
 def _cleanup(zkclient, path, max_count):
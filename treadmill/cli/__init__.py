@@ -1,15 +1,14 @@
 """Treadmill commaand line helpers.
 """
 
-import codecs
 import copy
 import functools
 import importlib
+import io
 import json
 import logging
 import os
 import pkgutil
-import pkg_resources
 import re
 import sys
 import tempfile
@@ -35,13 +34,15 @@ IPA_PASSWORD_RE = re.compile('.{8,}')
 
 def init_logger(name):
     """Initialize logger."""
-    log_conf_file = pkg_resources.resource_stream(
+    # pkgutil rather than pkg_resources, which takes longer to import than
+    # the rest of the CLI.
+    log_conf = pkgutil.get_data(
         'treadmill',
-        '/logging/{name}'.format(name=name)
+        'logging/{name}'.format(name=name)
     )
     try:
         logging.config.fileConfig(
-            codecs.getreader('utf-8')(log_conf_file)
+            io.StringIO(log_conf.decode('utf-8'))
         )
     except configparser.Error:
         with tempfile.NamedTemporaryFile(delete=False) as f:
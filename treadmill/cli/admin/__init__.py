@@ -6,6 +6,7 @@ import pkgutil
 
 import click
 import dns.exception  # pylint: disable=E0611
+import dns.resolver  # pylint: disable=E0611
 import kazoo
 import kazoo.exceptions
 import ldap3
@@ -3,16 +3,17 @@
 
 # pylint: disable=C0103
 
-import click
-import kazoo
+import sys
+import time
 
-import pandas as pd
+import click
+import kazoo.exceptions
 
 from treadmill import cli
 from treadmill import context
-from treadmill import master
-from treadmill import scheduler as treadmill_sched
-from treadmill import reports
+
+# pandas, treadmill.master and treadmill.reports are imported by the
+# commands, so that they are not loaded when the admin commands are listed.
 
 
 def view_group(parent):
@@ -30,16 +31,23 @@ def view_group(parent):
 
     def _print_frame(output):
         """Prints dataframe."""
+        import pandas as pd
+
+        from treadmill import reports
+
         pd.set_option('display.max_rows', None)
         if output is not None and len(output):
             if cli.OUTPUT_FORMAT == 'csv':
-                print(output.to_csv())
+                reports.to_csv(output, sys.stdout)
             else:
                 pd.set_option('expand_frame_repr', False)
                 print(output)
 
     def _load():
         """Load cell information."""
+        from treadmill import master
+        from treadmill import scheduler as treadmill_sched
+
         treadmill_sched.DIMENSION_COUNT = 3
         cell_master = master.Master(context.GLOBAL.zk.conn,
                                     context.GLOBAL.cell)
@@ -59,17 +67,25 @@ def view_group(parent):
 
     @parent.group()
     @click.option('--reschedule', is_flag=True, default=False)
+    @click.option('--csv', 'csv_output', is_flag=True, default=False,
+                  help='Write reports to stdout as CSV.')
     @on_exceptions
-    def view(reschedule):
+    def view(reschedule, csv_output):
         """Examine scheduler state."""
         if reschedule:
             do_reschedule.add(1)
+        if csv_output:
+            cli.OUTPUT_FORMAT = 'csv'
 
     @view.command()
     @click.option('--features/--no-features', is_flag=True, default=False)
     @on_exceptions
     def servers(features):
         """View servers report"""
+        import pandas as pd
+
+        from treadmill import reports
+
         cell_master = _load()
         output = reports.servers(cell_master.cell)
         if features:
@@ -82,6 +98,8 @@ def view_group(parent):
     @on_exceptions
     def apps():
         """View apps report"""
+        from treadmill import reports
+
         cell_master = _load()
         output = reports.apps(cell_master.cell)
         _print_frame(output)
@@ -90,18 +108,29 @@ def view_group(parent):
     @on_exceptions
     def allocs():
         """View allocation report"""
+        from treadmill import reports
+
         cell_master = _load()
         allocs = reports.allocations(cell_master.cell)
         _print_frame(allocs)
 
     @view.command()
+    @click.option('--count', type=int, default=1,
+                  help='Number of utilization samples.')
+    @click.option('--interval', type=float, default=60,
+                  help='Seconds between utilization samples.')
     @on_exceptions
-    def queue():
+    def queue(count, interval):
         """View utilization queue"""
-        cell_master = _load()
-        apps = reports.apps(cell_master.cell)
-        output = reports.utilization(None, apps)
-        _print_frame(output)
+        from treadmill import reports
+
+        history = reports.UtilizationHistory()
+        for sample in range(count):
+            if sample:
+                time.sleep(interval)
+            cell_master = _load()
+            history.add(reports.apps(cell_master.cell))
+        _print_frame(history.frame())
 
     del apps
     del servers
@@ -12,6 +12,7 @@ import requests
 #
 # pylint: disable=C0412
 from treadmill import cli
+from treadmill import restclient
 
 
 # pylint complains "No value passed for parameter 'ldap' in function call".
@@ -54,13 +55,22 @@ from treadmill import cli
 @click.option('--with-proxy', required=False, is_flag=True,
               help='Enable proxy environment variables.',
               default=False)
+@click.option('--api-pool-size', required=False, type=int,
+              envvar='TREADMILL_API_POOL_SIZE',
+              help='Max keep-alive connections per API endpoint.')
+@click.option('--api-hedge-delay', required=False, type=float,
+              envvar='TREADMILL_API_HEDGE_DELAY',
+              help='Seconds before a GET is also sent to the next API '
+              'endpoint, negative to disable.')
 @click.pass_context
-def run(ctx, with_proxy, outfmt, debug):
+def run(ctx, with_proxy, outfmt, debug, api_pool_size, api_hedge_delay):
     """Treadmill CLI."""
     ctx.obj = {}
     ctx.obj['logging.debug'] = False
 
     requests.Session().trust_env = with_proxy
+    restclient.set_session_options(pool_size=api_pool_size,
+                                   hedge_delay=api_hedge_delay)
 
     if outfmt:
         cli.OUTPUT_FORMAT = outfmt
@@ -4,11 +4,8 @@ import importlib
 import logging
 import random
 
-import ldap3
-
-from treadmill import admin
-from treadmill import zkutils
-from treadmill import dnsutils
+# admin (ldap3), zkutils (kazoo) and dnsutils (dns) are imported when first
+# used, as the context module is imported by every CLI command.
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -28,6 +25,8 @@ class AdminContext(object):
         '_url',
         '_conn',
         '_resolve',
+        'pool_size',
+        'cache_ttl',
     )
 
     def __init__(self, resolve=None, user=None, password=None):
@@ -44,6 +43,8 @@ class AdminContext(object):
         self._url = None
         self._conn = None
         self._resolve = resolve
+        self.pool_size = 1
+        self.cache_ttl = 0
 
     @property
     def user(self):
@@ -84,6 +85,8 @@ class AdminContext(object):
     def conn(self):
         """Lazily establishes connection to admin LDAP."""
         if self._conn is None:
+            from treadmill import admin
+
             if self.ldap_suffix is None:
                 raise ContextError('LDAP suffix is not set.')
 
@@ -97,11 +100,21 @@ class AdminContext(object):
                           self.url, self.ldap_suffix)
 
             self._conn = admin.Admin(self.url, self.ldap_suffix,
-                                     user=self.user, password=self.password)
+                                     user=self.user, password=self.password,
+                                     pool_size=self.pool_size,
+                                     cache_ttl=self.cache_ttl)
             self._conn.connect()
 
         return self._conn
 
+    def cache_stats(self):
+        """Return LDAP cache metrics of this process, None if there is no
+        connection yet.
+        """
+        if self._conn is None:
+            return None
+        return self._conn.cache_stats()
+
 
 class ZkContext(object):
     """Zookeeper context."""
@@ -109,6 +122,7 @@ class ZkContext(object):
         'url',
         'proid',
         '_conn',
+        '_cache',
         '_resolve',
         '_listeners',
     )
@@ -117,6 +131,7 @@ class ZkContext(object):
         self.url = None
         self.proid = None
         self._conn = None
+        self._cache = None
         self._resolve = resolve
         self._listeners = []
 
@@ -128,6 +143,8 @@ class ZkContext(object):
     def conn(self):
         """Lazily creates Zookeeper client."""
         if self._conn is None:
+            from treadmill import zkutils
+
             _LOGGER.debug('Connecting to Zookeeper %s', self.url)
             if self.url is None:
                 if self._resolve:
@@ -144,6 +161,16 @@ class ZkContext(object):
 
         return self._conn
 
+    @property
+    def cache(self):
+        """Lazily creates process-wide Zookeeper read cache."""
+        if self._cache is None:
+            from treadmill import zkcache
+
+            self._cache = zkcache.ZkCache(self.conn)
+
+        return self._cache
+
 
 class Context(object):
     """Global connection context."""
@@ -192,6 +219,8 @@ class Context(object):
 
     def _resolve_srv(self, srv_rec):
         """Returns list of host, port tuples for given srv record."""
+        from treadmill import dnsutils
+
         _LOGGER.debug('Query DNS -t SRV %s.%s', srv_rec, self.dns_domain)
         if not self.dns_domain:
             raise ContextError('Treadmill DNS domain not specified.')
@@ -204,6 +233,8 @@ class Context(object):
 
     def _srv_to_urls(self, srv_recs, protocol=None):
         """Randomizes and converts SRV records to URLs."""
+        from treadmill import dnsutils
+
         _LOGGER.debug('Result: %r', srv_recs)
 
         return [dnsutils.srv_rec_to_url(srv_rec,
@@ -305,6 +336,8 @@ class Context(object):
             raise ContextError('Cell is not specified.')
 
         if not self.ldap.url:
+            from treadmill import dnsutils
+
             ldap_srv_rec = dnsutils.srv(
                 '_ldap._tcp.%s.%s' % (cellname, self.dns_domain),
                 self.dns_server
@@ -326,6 +359,8 @@ class Context(object):
 
     def _resolve_cell_from_dns(self, cellname):
         """Resolve Zookeeper connection string from DNS."""
+        from treadmill import dnsutils
+
         if not self.dns_domain:
             _LOGGER.warn('DNS domain is not set.')
             zkurl_rec = dnsutils.txt('zk.%s' % (cellname), self.dns_server)
@@ -343,6 +378,10 @@ class Context(object):
 
     def _resolve_cell_from_ldap(self, cellname):
         """Resolve Zookeeper connection sting from LDAP by cell name."""
+        import ldap3
+
+        from treadmill import admin
+
         # TODO: in case of invalid cell it will throw ldap exception.
         #                need to standardize on ContextError raised lazily
         #                on first connection attempt, and keep resolve
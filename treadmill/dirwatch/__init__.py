@@ -3,10 +3,11 @@
 import os
 
 from treadmill.dirwatch.dirwatch_base import DirWatcherEvent
+from treadmill.dirwatch.dirwatch_base import coalesce
 
 if os.name == 'nt':
     from .windows_dirwatch import WindowsDirWatcher as DirWatcher
 else:
     from .linux_dirwatch import LinuxDirWatcher as DirWatcher
 
-__all__ = ['DirWatcherEvent', 'DirWatcher']
+__all__ = ['DirWatcherEvent', 'DirWatcher', 'coalesce']
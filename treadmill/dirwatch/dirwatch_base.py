@@ -5,6 +5,7 @@ import collections
 import logging
 import os
 import sys
+import time
 
 import enum
 
@@ -24,6 +25,46 @@ class DirWatcherEvent(enum.Enum):
     MORE_PENDING = 'more events pending'
 
 
+def coalesce(events):
+    """Merge (DirWatcherEvent, <path>) events per path into net effect.
+
+    Create followed by delete cancels out, create followed by modify is a
+    create, modify followed by delete is a delete and a repeated modify is a
+    single one. A delete followed by a create is kept as such, so consumers
+    see the file was replaced. Net events are ordered by the last event of
+    each path.
+    """
+    first = {}
+    last = {}
+    deleted = set()
+    for idx, (event, src_path) in enumerate(events):
+        first.setdefault(src_path, event)
+        last[src_path] = (idx, event)
+        if event == DirWatcherEvent.DELETED:
+            deleted.add(src_path)
+
+    result = []
+    for src_path, (_idx, event) in sorted(last.items(),
+                                          key=lambda item: item[1][0]):
+        existed = first[src_path] != DirWatcherEvent.CREATED
+        exists = event != DirWatcherEvent.DELETED
+        if not existed:
+            if exists:
+                result.append((DirWatcherEvent.CREATED, src_path))
+        elif not exists:
+            result.append((DirWatcherEvent.DELETED, src_path))
+        elif src_path in deleted:
+            result.append((DirWatcherEvent.DELETED, src_path))
+            result.append((DirWatcherEvent.CREATED, src_path))
+        elif event == DirWatcherEvent.CREATED:
+            # Replaced by rename.
+            result.append((DirWatcherEvent.CREATED, src_path))
+        else:
+            result.append((DirWatcherEvent.MODIFIED, src_path))
+
+    return result
+
+
 class DirWatcher(object):
     """Directory watcher base, invoking callbacks on file create/delete events.
     """
@@ -33,14 +74,22 @@ class DirWatcher(object):
         'on_created',
         'on_deleted',
         'on_modified',
+        'coalesce_window',
+        'events_read',
+        'events_coalesced',
         '_watches'
     )
 
-    def __init__(self, watch_dir=None):
+    def __init__(self, watch_dir=None, coalesce_window=None):
         self.event_list = collections.deque()
         self.on_created = self._noop
         self.on_deleted = self._noop
         self.on_modified = self._noop
+        # If set, events are collected for up to coalesce_window seconds
+        # and merged per path into their net effect.
+        self.coalesce_window = coalesce_window
+        self.events_read = 0
+        self.events_coalesced = 0
         self._watches = {}
 
         if watch_dir is not None:
@@ -130,6 +179,21 @@ class DirWatcher(object):
         """
         return
 
+    def _coalesce_window(self, events):
+        """Keep reading events for the coalesce window, merge them."""
+        events = list(events)
+        deadline = time.time() + self.coalesce_window
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self._wait_for_events(remaining * 1000):
+                break
+            events.extend(self._read_events())
+
+        coalesced = coalesce(events)
+        self.events_read += len(events)
+        self.events_coalesced += len(events) - len(coalesced)
+        return coalesced
+
     def process_events(self, max_events=0, resume=False):
         """Process events received.
 
@@ -149,7 +213,12 @@ class DirWatcher(object):
 
         # If we are out of cached events, get more from inotify
         if not self.event_list and not resume:
-            self.event_list.extend(self._read_events())
+            events = self._read_events()
+            if self.coalesce_window:
+                events = self._coalesce_window(events)
+            else:
+                self.events_read += len(events)
+            self.event_list.extend(events)
 
         results = []
         step = 0
@@ -10,6 +10,12 @@ from treadmill.syscall import inotify
 
 _LOGGER = logging.getLogger(__name__)
 
+_MODIFIED_MASK = inotify.IN_MODIFY | inotify.IN_ATTRIB
+_DELETED_MASK = (inotify.IN_DELETE |
+                 inotify.IN_MOVED_FROM |
+                 inotify.IN_DELETE_SELF)
+_CREATED_MASK = inotify.IN_CREATE | inotify.IN_MOVED_TO
+
 
 class LinuxDirWatcher(dirwatch_base.DirWatcher):
     """Linux directory watcher implementation."""
@@ -19,11 +25,11 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
         'poll'
     )
 
-    def __init__(self, watch_dir=None):
+    def __init__(self, watch_dir=None, coalesce_window=None):
         self.inotify = inotify.Inotify(inotify.IN_CLOEXEC)
         self.poll = select.poll()
         self.poll.register(self.inotify, select.POLLIN)
-        super(LinuxDirWatcher, self).__init__(watch_dir)
+        super(LinuxDirWatcher, self).__init__(watch_dir, coalesce_window)
 
     def _add_dir(self, watch_dir):
         """Add `directory` to the list of watched directories.
@@ -72,39 +78,35 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
         :returns: List of ``(DirWatcherEvent, <path>)``
         """
         results = []
-        events = self.inotify.read_events()
+        events = self.inotify.read_events(raw=True)
 
-        for event in events:
-            if (event.is_modify or
-                    event.is_attrib):
+        for wd, mask, _cookie, src_path in events:
+            if mask & _MODIFIED_MASK:
                 results.append(
                     (
                         dirwatch_base.DirWatcherEvent.MODIFIED,
-                        event.src_path
+                        src_path
                     )
                 )
 
-            elif (event.is_delete or
-                  event.is_moved_from or
-                  event.is_delete_self):
+            elif mask & _DELETED_MASK:
                 results.append(
                     (
                         dirwatch_base.DirWatcherEvent.DELETED,
-                        event.src_path
+                        src_path
                     )
                 )
 
-            elif (event.is_create or
-                  event.is_moved_to):
+            elif mask & _CREATED_MASK:
                 results.append(
                     (
                         dirwatch_base.DirWatcherEvent.CREATED,
-                        event.src_path
+                        src_path
                     )
                 )
 
-            elif event.mask == inotify.IN_IGNORED:
-                if self._watches.pop(event.wd, None):
-                    _LOGGER.info('Watch on %r auto-removed', event.src_path)
+            elif mask == inotify.IN_IGNORED:
+                if self._watches.pop(wd, None):
+                    _LOGGER.info('Watch on %r auto-removed', src_path)
 
         return results
@@ -72,10 +72,10 @@ class WindowsDirWatcher(dirwatch_base.DirWatcher):
         '_changed'
     )
 
-    def __init__(self, watch_dir=None):
+    def __init__(self, watch_dir=None, coalesce_window=None):
         self._dir_infos = {}
         self._changed = collections.deque()
-        super(WindowsDirWatcher, self).__init__(watch_dir)
+        super(WindowsDirWatcher, self).__init__(watch_dir, coalesce_window)
 
     @staticmethod
     def _read_dir(info):
@@ -4,14 +4,13 @@ import logging
 import re
 import subprocess
 
-import jinja2
-
 from . import firewall
 from . import subproc
+from . import utils
 
 _LOGGER = logging.getLogger(__name__)
 
-JINJA2_ENV = jinja2.Environment(loader=jinja2.PackageLoader(__name__))
+JINJA2_ENV = utils.JINJA2_ENV
 
 #: Chain where to add outgoing traffic DNAT rule (used inside container)
 OUTPUT = 'OUTPUT'
@@ -136,6 +136,7 @@ class Master(object):
             z.FINISHED_HISTORY: None,
             z.TRACE: None,
             z.TRACE_HISTORY: None,
+            z.TRACE_CLEANUP: None,
             z.VERSION_ID: None,
             z.ZOOKEEPER: None,
             z.BLACKEDOUT_SERVERS: [_SERVERS_ACL],
@@ -1,142 +1,172 @@
-"""Handles reports over scheduler data."""
+"""Handles reports over scheduler data.
 
-import time
+Reports are built column by column: the scheduler model is walked once,
+values are collected into per-column lists and capacity vectors are
+stacked into (rows x dimensions) arrays, rather than constructing a dict
+per row.
+"""
+
+import collections
 import datetime
-import itertools
 import logging
+import time
 
 import numpy as np
 import pandas as pd
-from functools import reduce
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Names of the first capacity dimensions, in scheduler order.
+_DIMENSIONS = ('memory', 'cpu', 'disk')
+
+# Utilization metrics per app name: total demand, count and max util.
+_UTILIZATION_METRICS = _DIMENSIONS + ('count', 'util')
+
+# Number of samples preallocated by UtilizationHistory, doubled when full.
+_HISTORY_SIZE = 64
+
+# Rows written at a time when writing reports as CSV.
+_CSV_CHUNK_SIZE = 10000
+
+
+def _capacity(vectors):
+    """Stack capacity vectors into (rows x dimensions) matrix."""
+    if not vectors:
+        return np.zeros((0, len(_DIMENSIONS)))
+    return np.vstack(vectors)
+
+
+def _add_capacity(columns, vectors, prefix=''):
+    """Add capacity dimension columns from list of capacity vectors."""
+    matrix = _capacity(vectors)
+    for idx, dimension in enumerate(_DIMENSIONS):
+        columns[prefix + dimension] = matrix[:, idx]
+
 
 def servers(cell):
     """Returns dataframe for servers hierarchy."""
+    members = list(cell.members().values())
 
-    def _server_row(server):
-        """Converts server object to dict used to construct dataframe row.
-        """
-        row = {
-            'name': server.name,
-            'memory': server.init_capacity[0],
-            'cpu': server.init_capacity[1],
-            'disk': server.init_capacity[2],
-            'traits': server.traits.traits,
-            'free.memory': server.free_capacity[0],
-            'free.cpu': server.free_capacity[1],
-            'free.disk': server.free_capacity[2],
-            'state': server.state.value,
-            'valid_until': server.valid_until
-        }
+    columns = collections.OrderedDict()
+    columns['name'] = [server.name for server in members]
+    _add_capacity(columns, [server.init_capacity for server in members])
+    columns['traits'] = [server.traits.traits for server in members]
+    _add_capacity(columns, [server.free_capacity for server in members],
+                  prefix='free.')
+    columns['state'] = [server.state.value for server in members]
+    columns['valid_until'] = pd.to_datetime(
+        np.array([server.valid_until for server in members], dtype=float),
+        unit='s'
+    )
 
+    levels = collections.OrderedDict()
+    for row, server in enumerate(members):
         node = server.parent
         while node:
-            row[node.level] = node.name
+            levels.setdefault(
+                node.level, [None] * len(members)
+            )[row] = node.name
             node = node.parent
+    columns.update(levels)
 
-        return row
+    return pd.DataFrame(columns, columns=list(columns)).set_index('name')
 
-    frame = pd.DataFrame.from_dict([
-        _server_row(server) for server in cell.members().values()
-    ])
-    if frame.empty:
-        frame = pd.DataFrame(columns=['name', 'memory', 'cpu', 'disk',
-                                      'free.memory', 'free.cpu', 'free.disk',
-                                      'state'])
-    for col in ['valid_until']:
-        frame[col] = pd.to_datetime(frame[col], unit='s')
 
-    return frame.set_index('name')
+def _leafs(path, alloc):
+    """Generate leaf allocations - (path, alloc) tuples."""
+    if not alloc.sub_allocations:
+        yield '/'.join(path), alloc
+        return
+
+    for name, suballoc in alloc.sub_allocations.items():
+        yield from _leafs(path + [name], suballoc)
 
 
 def allocations(cell):
-    """Converts cell allocations into dataframe row."""
+    """Converts cell allocations into dataframe."""
+    rows = [
+        (label or '-', name or 'root', alloc)
+        for label, partition in cell.partitions.items()
+        for name, alloc in _leafs([], partition.allocation)
+    ]
 
-    def _leafs(path, alloc):
-        """Generate leaf allocations - (path, alloc) tuples."""
-        if not alloc.sub_allocations:
-            return iter([('/'.join(path), alloc)])
-        else:
-            def _chain(acc, item):
-                """Chains allocation iterators."""
-                name, suballoc = item
-                return itertools.chain(acc, _leafs(path + [name], suballoc))
-
-            return reduce(_chain, iter(alloc.sub_allocations.items()), [])
-
-    def _alloc_row(label, name, alloc):
-        """Converts allocation to dict/dataframe row."""
-        if not name:
-            name = 'root'
-        if not label:
-            label = '-'
-
-        return {
-            'label': label,
-            'name': name,
-            'memory': alloc.reserved[0],
-            'cpu': alloc.reserved[1],
-            'disk': alloc.reserved[2],
-            'rank': alloc.rank,
-            'traits': alloc.traits,
-            'max_utilization': alloc.max_utilization,
-        }
-
-    all_allocs = []
-    for label, partition in cell.partitions.items():
-        allocation = partition.allocation
-        leaf_allocs = _leafs([], allocation)
-        alloc_df = pd.DataFrame.from_dict(
-            [_alloc_row(label, name, alloc) for name, alloc in leaf_allocs]
-        ).set_index(['label', 'name'])
-        all_allocs.append(alloc_df)
-    return pd.concat(all_allocs)
+    columns = collections.OrderedDict()
+    columns['label'] = [label for label, _name, _alloc in rows]
+    columns['name'] = [name for _label, name, _alloc in rows]
+    _add_capacity(columns, [alloc.reserved for _label, _name, alloc in rows])
+    columns['rank'] = [alloc.rank for _label, _name, alloc in rows]
+    columns['traits'] = [alloc.traits for _label, _name, alloc in rows]
+    columns['max_utilization'] = [
+        alloc.max_utilization for _label, _name, alloc in rows
+    ]
+
+    return pd.DataFrame(
+        columns, columns=list(columns)
+    ).set_index(['label', 'name'])
 
 
 def apps(cell):
     """Return application queue and app details as dataframe."""
-
-    def _app_row(item):
-        """Converts app queue item into dict for dataframe row."""
-        rank, util, pending, order, app = item
-        return {
-            'instance': app.name,
-            'affinity': app.affinity.name,
-            'allocation': app.allocation.name,
-            'rank': rank,
-            'label': app.allocation.label,
-            'util': util,
-            'pending': pending,
-            'order': order,
-            'identity_group': app.identity_group,
-            'identity': app.identity,
-            'memory': app.demand[0],
-            'cpu': app.demand[1],
-            'disk': app.demand[2],
-            'lease': app.lease,
-            'expires': app.placement_expiry,
-            'data_retention_timeout': app.data_retention_timeout,
-            'server': app.server
-        }
-
     queue = []
     for partition in cell.partitions.values():
         allocation = partition.allocation
         queue += allocation.utilization_queue(cell.size(allocation.label))
 
-    frame = pd.DataFrame.from_dict([_app_row(item) for item in queue])
-    if frame.empty:
-        return frame
+    if not queue:
+        return pd.DataFrame()
+
+    ranks, utils, pendings, orders, queued = zip(*queue)
+
+    columns = collections.OrderedDict()
+    columns['instance'] = [app.name for app in queued]
+    columns['affinity'] = [app.affinity.name for app in queued]
+    columns['allocation'] = [app.allocation.name for app in queued]
+    columns['rank'] = ranks
+    columns['label'] = [app.allocation.label for app in queued]
+    columns['util'] = np.array(utils, dtype=float)
+    columns['pending'] = pendings
+    columns['order'] = orders
+    columns['identity_group'] = [app.identity_group for app in queued]
+    columns['identity'] = [app.identity for app in queued]
+    _add_capacity(columns, [app.demand for app in queued])
+    columns['lease'] = pd.to_timedelta(
+        np.array([app.lease for app in queued], dtype=float), unit='s'
+    )
+    columns['expires'] = pd.to_datetime(
+        np.array([app.placement_expiry for app in queued], dtype=float),
+        unit='s'
+    )
+    columns['data_retention_timeout'] = pd.to_timedelta(
+        np.array([app.data_retention_timeout for app in queued],
+                 dtype=float),
+        unit='s'
+    )
+    columns['server'] = [app.server for app in queued]
+
+    return pd.DataFrame(columns, columns=list(columns)).set_index('instance')
+
+
+def _utilization_totals(apps_df):
+    """Returns app names and (names x metrics) matrix of their totals."""
+    names = [instance.split('#')[0] for instance in apps_df.index.tolist()]
+    unique_names, inverse = np.unique(names, return_inverse=True)
 
-    for col in ['expires']:
-        frame[col] = pd.to_datetime(frame[col], unit='s')
-    for col in ['lease', 'data_retention_timeout']:
-        frame[col] = pd.to_timedelta(frame[col], unit='s')
+    totals = np.empty((len(unique_names), len(_UTILIZATION_METRICS)))
+    for idx, dimension in enumerate(_DIMENSIONS):
+        totals[:, idx] = np.bincount(inverse,
+                                     weights=apps_df[dimension].values,
+                                     minlength=len(unique_names))
+    totals[:, -2] = np.bincount(inverse, minlength=len(unique_names))
+    totals[:, -1] = -np.inf
+    np.maximum.at(totals[:, -1], inverse, apps_df['util'].values)
 
-    return frame.set_index('instance')
+    return unique_names, totals
+
+
+def _timestamp(when):
+    """Convert epoch seconds to local time index value."""
+    return datetime.datetime.fromtimestamp(when)
 
 
 def utilization(prev_utilization, apps_df):
@@ -144,24 +174,108 @@ def utilization(prev_utilization, apps_df):
 
     prev_utilization - utilization dataframe before current.
     apps - app queue dataframe.
+
+    Each call copies prev_utilization, use UtilizationHistory to collect
+    many samples.
     """
-    # Passed by ref.
-    row = apps_df.reset_index()
-    if row.empty:
-        return row
-
-    row['count'] = 1
-    row['name'] = row['instance'].apply(lambda x: x.split('#')[0])
-    row = row.groupby('name').agg({'cpu': np.sum,
-                                   'memory': np.sum,
-                                   'disk': np.sum,
-                                   'count': np.sum,
-                                   'util': np.max})
-    row = row.stack()
-    dt_now = datetime.datetime.fromtimestamp(time.time())
-    current = pd.DataFrame([row], index=pd.DatetimeIndex([dt_now]))
+    if apps_df.empty:
+        return apps_df.reset_index()
+
+    names, totals = _utilization_totals(apps_df)
+    columns = pd.MultiIndex.from_product([names, _UTILIZATION_METRICS],
+                                         names=['name', None])
+    current = pd.DataFrame([totals.ravel()], columns=columns,
+                           index=pd.DatetimeIndex([_timestamp(time.time())]))
 
     if prev_utilization is None:
         return current
     else:
-        return prev_utilization.append(current)
+        return pd.concat([prev_utilization, current])
+
+
+class UtilizationHistory(object):
+    """Cell utilization samples over time.
+
+    Samples are stored in a preallocated time x (name, metric) matrix, both
+    dimensions doubled when full, so that adding a sample does not copy the
+    previous ones. Metrics of names missing from a sample are NaN.
+    """
+
+    __slots__ = (
+        'columns',
+        '_name_idx',
+        '_times',
+        '_matrix',
+        '_size',
+    )
+
+    def __init__(self, size=_HISTORY_SIZE):
+        self.columns = []
+        self._name_idx = {}
+        self._times = np.zeros(size)
+        self._matrix = np.full((size, size * len(_UTILIZATION_METRICS)),
+                               np.nan)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, rows, cols):
+        """Double matrix rows/columns until it fits rows x cols."""
+        nrows, ncols = self._matrix.shape
+        while nrows < rows:
+            nrows *= 2
+        while ncols < cols:
+            ncols *= 2
+        if (nrows, ncols) == self._matrix.shape:
+            return
+
+        matrix = np.full((nrows, ncols), np.nan)
+        matrix[:self._matrix.shape[0], :self._matrix.shape[1]] = self._matrix
+        self._matrix = matrix
+        self._times = np.concatenate(
+            [self._times, np.zeros(nrows - len(self._times))]
+        )
+
+    def add(self, apps_df, when=None):
+        """Add utilization sample of the app queue dataframe."""
+        if when is None:
+            when = time.time()
+
+        if apps_df.empty:
+            names, totals = [], np.zeros((0, len(_UTILIZATION_METRICS)))
+        else:
+            names, totals = _utilization_totals(apps_df)
+
+        # Metrics of a name are in adjacent columns, starting at name index.
+        for name in names:
+            if name not in self._name_idx:
+                self._name_idx[name] = len(self.columns)
+                self.columns.extend(
+                    (name, metric) for metric in _UTILIZATION_METRICS
+                )
+
+        self._grow(self._size + 1, len(self.columns))
+        start = np.array([self._name_idx[name] for name in names], dtype=int)
+        cols = start[:, np.newaxis] + np.arange(len(_UTILIZATION_METRICS))
+        self._matrix[self._size, cols.ravel()] = totals.ravel()
+        self._times[self._size] = when
+        self._size += 1
+
+    def frame(self):
+        """Return samples as dataframe, same layout as utilization()."""
+        index = pd.DatetimeIndex([
+            _timestamp(when) for when in self._times[:self._size]
+        ])
+        if self.columns:
+            columns = pd.MultiIndex.from_tuples(self.columns,
+                                                names=['name', None])
+        else:
+            columns = []
+        return pd.DataFrame(self._matrix[:self._size, :len(self.columns)],
+                            index=index, columns=columns)
+
+
+def to_csv(frame, path_or_buf):
+    """Write report as CSV, in chunks of rows."""
+    frame.to_csv(path_or_buf, chunksize=_CSV_CHUNK_SIZE)
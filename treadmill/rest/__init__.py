@@ -14,12 +14,17 @@ import tornado.netutil
 
 import flask
 
+from treadmill.rest import container as rest_container
+
 
 FLASK_APP = flask.Flask(__name__)
 FLASK_APP.config['BUNDLE_ERRORS'] = True
 
 _LOGGER = logging.getLogger(__name__)
 
+# Interval, in seconds, between logging route statistics.
+_STATS_INTERVAL = 60
+
 
 class RestServer(object):
     """REST Server."""
@@ -34,17 +39,33 @@ class RestServer(object):
         """Setup the http server endpoint."""
         pass
 
+    threads = 0
+    route_limits = None
+
     def run(self):
         """Start server."""
         self._setup_auth()
 
         FLASK_APP.config['REST_SERVER'] = self
 
-        container = tornado.wsgi.WSGIContainer(FLASK_APP)
+        if self.threads:
+            _LOGGER.info('Serving requests on %d threads, route limits: %r',
+                         self.threads, self.route_limits)
+            container = rest_container.PooledWSGIContainer(
+                FLASK_APP, self.threads, self.route_limits
+            )
+        else:
+            container = tornado.wsgi.WSGIContainer(FLASK_APP)
         http_server = tornado.httpserver.HTTPServer(container)
 
         self._setup_endpoint(http_server)
 
+        if self.threads:
+            tornado.ioloop.PeriodicCallback(
+                lambda: _LOGGER.info('Route stats: %r', container.stats()),
+                _STATS_INTERVAL * 1000
+            ).start()
+
         tornado.ioloop.IOLoop.current().start()
 
 
@@ -52,7 +73,7 @@ class TcpRestServer(RestServer):
     """TCP based REST Server."""
 
     def __init__(self, port, host='0.0.0.0', auth_type=None, protect=None,
-                 workers=0):
+                 workers=0, threads=0, route_limits=None):
         """Init methods
 
         :param int port: port number to listen on (required)
@@ -61,12 +82,18 @@ class TcpRestServer(RestServer):
         :param str protect: which URLs to protect, default is None
         :param int workers: the number of workers to be forked, defaults to 0,
             which is 5 in tornado, I know, weird, but that is their defaults.
+        :param int threads: the number of threads running requests, defaults
+            to 0, which runs requests on the IOLoop thread.
+        :param dict route_limits: max concurrent requests per route, e.g.
+            {'/instance': 2}, only enforced when running on threads.
         """
         self.port = int(port)
         self.host = host
         self.auth_type = auth_type
         self.protect = protect
         self.workers = workers
+        self.threads = threads
+        self.route_limits = route_limits
 
     def _setup_auth(self):
         """Setup the http authentication."""
@@ -96,9 +123,11 @@ class TcpRestServer(RestServer):
 class UdsRestServer(RestServer):
     """UNIX domain socket based REST Server."""
 
-    def __init__(self, socket):
+    def __init__(self, socket, threads=0, route_limits=None):
         """Init method."""
         self.socket = socket
+        self.threads = threads
+        self.route_limits = route_limits
 
     def _setup_auth(self):
         """Setup the http authentication."""
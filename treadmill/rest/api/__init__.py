@@ -3,6 +3,7 @@
 
 import logging
 import importlib
+import os
 import pkgutil
 
 import flask
@@ -13,6 +14,7 @@ import flask
 import flask_restplus as restplus
 
 from treadmill import authz
+from treadmill import context
 from treadmill.rest import error_handlers
 from treadmill import rest
 from treadmill import utils  # noqa: F401
@@ -48,6 +50,14 @@ def init(apis, title=None, cors_origin=None, authz_arg=None):
         """Swagger documentation route"""
         return restplus.apidoc.ui_for(api)
 
+    @blueprint.route('/stats/', endpoint='stats')
+    def _stats():
+        """Server process statistics, e.g. LDAP cache hits."""
+        return flask.jsonify({
+            'pid': os.getpid(),
+            'ldap_cache': context.GLOBAL.ldap.cache_stats(),
+        })
+
     rest.FLASK_APP.register_blueprint(blueprint)
     rest.FLASK_APP.register_blueprint(restplus.apidoc.apidoc)
 
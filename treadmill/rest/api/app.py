@@ -27,6 +27,8 @@ def init(api, cors, impl):
     match_parser = api.parser()
     match_parser.add_argument('match', help='A glob match on an app name',
                               location='args', required=False,)
+    webutils.add_page_args(match_parser, cursor='app name')
+    webutils.add_fields_arg(match_parser)
 
     @namespace.route(
         '/',
@@ -34,14 +36,19 @@ def init(api, cors, impl):
     class _AppList(restplus.Resource):
         """Treadmill App resource"""
 
-        @webutils.get_api(api, cors,
-                          marshal=api.marshal_list_with,
-                          resp_model=response_model,
-                          parser=match_parser)
+        @webutils.stream_get_api(api, cors,
+                                 resp_model=[response_model],
+                                 parser=match_parser)
         def get(self):
             """Returns list of configured applications."""
             args = match_parser.parse_args()
-            return impl.list(args.get('match'))
+            return webutils.stream_json(
+                impl.list(args.get('match'),
+                          args.get('limit'), args.get('after'),
+                          args.get('fields')),
+                model=response_model,
+                fields=args.get('fields')
+            )
 
     @namespace.route('/<app>')
     @api.doc(params={'app': 'Application ID/Name'})
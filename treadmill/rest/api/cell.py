@@ -59,7 +59,8 @@ def init(api, cors, impl):
 
         @webutils.get_api(api, cors,
                           marshal=api.marshal_list_with,
-                          resp_model=cell_model)
+                          resp_model=cell_model,
+                          version=impl.version)
         def get(self):
             """Returns list of configured cells."""
             return impl.list()
@@ -71,7 +72,8 @@ def init(api, cors, impl):
 
         @webutils.get_api(api, cors,
                           marshal=api.marshal_with,
-                          resp_model=cell_model)
+                          resp_model=cell_model,
+                          version=lambda cell: impl.version(cell))
         def get(self, cell):
             """Return Treadmill cell configuration."""
             return impl.get(cell)
@@ -32,6 +32,13 @@ def init(api, cors, impl):
         'Endpoint', endpoint_model
     )
 
+    def version(pattern, **_kwargs):
+        """Return version of the endpoints of the pattern proid."""
+        return impl.version(pattern)
+
+    page_parser = api.parser()
+    webutils.add_page_args(page_parser, cursor='name:proto:endpoint')
+
     @namespace.route(
         '/<pattern>',
     )
@@ -39,13 +46,18 @@ def init(api, cors, impl):
     class _EndpointList(restplus.Resource):
         """Treadmill Endpoint resource"""
 
-        @webutils.get_api(api, cors,
-                          marshal=api.marshal_list_with,
-                          resp_model=response_model)
+        @webutils.stream_get_api(api, cors,
+                                 resp_model=[response_model],
+                                 parser=page_parser,
+                                 version=version)
         def get(self, pattern):
             """Return all endpoints"""
-            ret = impl.list(pattern, None, None)
-            return ret
+            args = page_parser.parse_args()
+            return webutils.stream_json(
+                impl.list(pattern, None, None,
+                          args.get('limit'), args.get('after')),
+                model=response_model
+            )
 
     @namespace.route('/<pattern>/<proto>/<endpoint>')
     @api.doc(params={
@@ -56,10 +68,15 @@ def init(api, cors, impl):
     class _EndpointResource(restplus.Resource):
         """Treadmill Endpoint resource"""
 
-        @webutils.get_api(api, cors,
-                          marshal=api.marshal_list_with,
-                          resp_model=response_model)
+        @webutils.stream_get_api(api, cors,
+                                 resp_model=[response_model],
+                                 parser=page_parser,
+                                 version=version)
         def get(self, pattern, proto, endpoint):
             """Return Treadmill app endpoint state"""
-            ret = impl.list(pattern, proto, endpoint)
-            return ret
+            args = page_parser.parse_args()
+            return webutils.stream_json(
+                impl.list(pattern, proto, endpoint,
+                          args.get('limit'), args.get('after')),
+                model=response_model
+            )
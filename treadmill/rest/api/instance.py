@@ -40,6 +40,14 @@ def init(api, cors, impl):
         'instances': fields.List(fields.Nested(inst_prio)),
     })
 
+    inst_count = api.model('InstanceCount', {
+        '_id': fields.String(description='Application ID'),
+        'count': fields.Integer(description='Number of instances'),
+    })
+    bulk_create_inst_req = api.model('ReqBulkCreateInstance', {
+        'instances': fields.List(fields.Nested(inst_count)),
+    })
+
     bulk_del_inst_req = api.model('ReqBulkDeleteInstance', {
         'instances': fields.List(fields.String(description='Application ID')),
     })
@@ -57,6 +65,17 @@ def init(api, cors, impl):
         }
     )
 
+    created_instances = api.clone(
+        'CreatedInstances', error_model_resp, {
+            '_id': fields.String(description='Application ID'),
+            'instances': fields.List(fields.String(description='Instances')),
+        }
+    )
+
+    create_resp = api.model('CreateInstance', {
+        'instances': fields.List(fields.Nested(created_instances)),
+    })
+
     update_resp = api.model('UpdateInstance', {
         'instances': fields.List(fields.Nested(bulk_update_resp)),
     })
@@ -68,6 +87,7 @@ def init(api, cors, impl):
     match_parser = api.parser()
     match_parser.add_argument('match', help='A glob match on an app name',
                               location='args', required=False,)
+    webutils.add_page_args(match_parser, cursor='instance id')
 
     @namespace.route(
         '/',
@@ -75,14 +95,32 @@ def init(api, cors, impl):
     class _InstanceList(restplus.Resource):
         """Treadmill Instance resource"""
 
-        @webutils.get_api(api, cors,
-                          marshal=api.marshal_with,
-                          resp_model=instances_resp_model,
-                          parser=match_parser)
+        @webutils.stream_get_api(api, cors,
+                                 resp_model=instances_resp_model,
+                                 parser=match_parser,
+                                 version=impl.version)
         def get(self):
             """Returns list of configured applications."""
             args = match_parser.parse_args()
-            return dict(instances=impl.list(args.get('match')))
+            return webutils.stream_json(
+                impl.list(args.get('match'),
+                          args.get('limit'), args.get('after')),
+                envelope='instances'
+            )
+
+    @namespace.route(
+        '/_bulk/create',
+    )
+    class _InstanceBulkCreate(restplus.Resource):
+        """Treadmill Instance resource"""
+
+        @webutils.post_api(api, cors,
+                           req_model=bulk_create_inst_req,
+                           resp_model=create_resp)
+        def post(self):
+            """Bulk creates instances of configured applications."""
+            rsrcs = flask.request.json['instances']
+            return {'instances': impl.bulk_create(rsrcs)}
 
     @namespace.route(
         '/_bulk/delete',
@@ -145,7 +183,9 @@ def init(api, cors, impl):
 
         @webutils.get_api(api, cors,
                           marshal=api.marshal_with,
-                          resp_model=app_prio)
+                          resp_model=app_prio,
+                          version=lambda instance_id: impl.version(
+                              instance_id))
         def get(self, instance_id):
             """Return Treadmill instance configuration."""
             instance = impl.get(instance_id)
@@ -22,22 +22,30 @@ def init(api, cors, impl):
                             location='args', required=False)
     req_parser.add_argument('partition', help='Partition',
                             location='args', required=False)
+    webutils.add_page_args(req_parser, cursor='server name')
+    webutils.add_fields_arg(req_parser)
 
     @namespace.route('/',)
     class _ServerList(restplus.Resource):
         """Treadmill Server resource"""
 
-        @webutils.get_api(api, cors, parser=req_parser)
+        @webutils.stream_get_api(api, cors, parser=req_parser,
+                                 version=impl.version)
         def get(self):
             """Returns list of configured servers."""
             args = req_parser.parse_args()
-            return impl.list(args.get('cell'), args.get('partition'))
+            return webutils.stream_json(
+                impl.list(args.get('cell'), args.get('partition'),
+                          args.get('limit'), args.get('after'),
+                          args.get('fields'))
+            )
 
     @namespace.route('/<server_id>')
     class _ServerResource(restplus.Resource):
         """Treadmill Server resource."""
 
-        @webutils.get_api(api, cors)
+        @webutils.get_api(api, cors,
+                          version=lambda server_id: impl.version(server_id))
         def get(self, server_id):
             """Return Treadmill server configuration."""
             return impl.get(server_id)
@@ -42,6 +42,7 @@ def init(api, cors, impl):
     match_parser.add_argument('finished', help='Flag to include finished apps',
                               location='args', required=False,
                               type=inputs.boolean, default=False)
+    webutils.add_page_args(match_parser)
 
     inst_parser = api.parser()
     inst_parser.add_argument('instances', type=list,
@@ -55,14 +56,18 @@ def init(api, cors, impl):
     class _StateList(restplus.Resource):
         """Treadmill State resource"""
 
-        @webutils.get_api(api, cors,
-                          marshal=api.marshal_list_with,
-                          resp_model=state_model,
-                          parser=match_parser)
+        @webutils.stream_get_api(api, cors,
+                                 resp_model=[state_model],
+                                 parser=match_parser,
+                                 version=impl.version)
         def get(self):
             """Return all state."""
             args = match_parser.parse_args()
-            return impl.list(args.get('match'), args.get('finished'))
+            return webutils.stream_json(
+                impl.list(args.get('match'), args.get('finished'),
+                          args.get('limit'), args.get('after')),
+                model=state_model
+            )
 
         @webutils.post_api(api, cors,
                            marshal=api.marshal_list_with,
@@ -82,7 +87,8 @@ def init(api, cors, impl):
 
         @webutils.get_api(api, cors,
                           marshal=api.marshal_with,
-                          resp_model=state_model)
+                          resp_model=state_model,
+                          version=lambda instance_id: impl.version())
         def get(self, instance_id):
             """Return Treadmill instance state."""
             state = impl.get(instance_id)
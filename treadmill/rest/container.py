@@ -0,0 +1,300 @@
+"""Thread pool WSGI container.
+
+tornado.wsgi.WSGIContainer runs the WSGI application on the IOLoop thread,
+so a slow request blocks all other requests in the process. The container
+below runs the application on a bounded thread pool instead, and only
+writes the responses on the IOLoop thread.
+
+Requests are grouped into routes by the first path segment (e.g. /instance,
+/state). The number of requests of a route running concurrently can be
+limited, excess requests wait in a per-route queue, so that one slow route
+can not occupy the whole pool. Statistics are kept for the routes of the
+application, requests to any other path are counted in the /other route.
+
+Responses without Content-Length, i.e. streamed by the application, are
+sent to the client with chunked encoding as they are generated.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import itertools
+import logging
+import time
+
+import tornado
+import tornado.concurrent
+import tornado.ioloop
+import tornado.wsgi
+from tornado import escape
+from tornado import httputil
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Streamed response data is written in chunks of at least this size.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Route of requests to paths not known to the application.
+_OTHER_ROUTE = '/other'
+
+
+def _route(path):
+    """Return route of the request path, i.e. its first segment."""
+    return '/' + path.lstrip('/').split('/', 1)[0]
+
+
+def _app_routes(wsgi_application):
+    """Return routes of the Flask application URL rules, if any."""
+    url_map = getattr(wsgi_application, 'url_map', None)
+    if url_map is None:
+        return []
+    return [rule.rule for rule in url_map.iter_rules()]
+
+
+class _StreamAborted(Exception):
+    """Error raised when streamed response could not be completed."""
+
+
+def _write(ioloop, func, *args):
+    """Call connection write func on the IOLoop, wait until flushed."""
+    written = concurrent.futures.Future()
+
+    def _call():
+        """Call write func, chain its future."""
+        try:
+            tornado.concurrent.chain_future(func(*args), written)
+        except Exception as err:  # pylint: disable=W0703
+            written.set_exception(err)
+
+    ioloop.add_callback(_call)
+    written.result()
+
+
+def _response_headers(status, headers, body=None):
+    """Return response status code, start line and headers.
+
+    Content-Length is not added if body is None, i.e. streamed.
+    """
+    status_code, reason = status.split(' ', 1)
+    status_code = int(status_code)
+    header_set = set(key.lower() for (key, _value) in headers)
+    if status_code != 304:
+        if 'content-length' not in header_set and body is not None:
+            headers.append(('Content-Length', str(len(body))))
+        if 'content-type' not in header_set:
+            headers.append(('Content-Type', 'text/html; charset=UTF-8'))
+    if 'server' not in header_set:
+        headers.append(('Server', 'TornadoServer/%s' % tornado.version))
+
+    start_line = httputil.ResponseStartLine('HTTP/1.1', status_code, reason)
+    header_obj = httputil.HTTPHeaders()
+    for key, value in headers:
+        header_obj.add(key, value)
+    return status_code, start_line, header_obj
+
+
+class _RouteStats(object):
+    """Per route request counters."""
+
+    __slots__ = (
+        'requests',
+        'active',
+        'pending',
+        'queue_time',
+        'max_queue_time',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.active = 0
+        self.pending = collections.deque()
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    def to_dict(self):
+        """Return counters as dict, queue times in milliseconds."""
+        return {
+            'requests': self.requests,
+            'active': self.active,
+            'pending': len(self.pending),
+            'avg_queue_ms': (
+                1000 * self.queue_time / self.requests
+                if self.requests else 0.0
+            ),
+            'max_queue_ms': 1000 * self.max_queue_time,
+        }
+
+
+class PooledWSGIContainer(tornado.wsgi.WSGIContainer):
+    """WSGI container running the application on a thread pool."""
+
+    def __init__(self, wsgi_application, threads, route_limits=None,
+                 routes=None):
+        super(PooledWSGIContainer, self).__init__(wsgi_application)
+        self.threads = threads
+        self.route_limits = {
+            _route(route): int(limit)
+            for route, limit in (route_limits or {}).items()
+        }
+        if routes is None:
+            routes = _app_routes(wsgi_application)
+        # Route is taken from the request path, stats are kept for known
+        # routes only, so that clients can not grow them without bound.
+        self.routes = {
+            _route(route): _RouteStats()
+            for route in itertools.chain(routes, self.route_limits,
+                                         [_OTHER_ROUTE])
+        }
+        # Created on first request, so that it is not shared by forked
+        # workers.
+        self._executor = None
+
+    def __call__(self, request):
+        route = _route(request.path)
+        if route not in self.routes:
+            route = _OTHER_ROUTE
+        stats = self.routes[route]
+        limit = self.route_limits.get(route)
+        entry = (request, time.time())
+
+        if limit is not None and stats.active >= limit:
+            stats.pending.append(entry)
+        else:
+            self._start(route, entry)
+
+    def _start(self, route, entry):
+        """Submit request to the thread pool."""
+        request, arrived = entry
+        stats = self.routes[route]
+
+        queue_time = time.time() - arrived
+        stats.requests += 1
+        stats.active += 1
+        stats.queue_time += queue_time
+        stats.max_queue_time = max(stats.max_queue_time, queue_time)
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.threads
+            )
+
+        ioloop = tornado.ioloop.IOLoop.current()
+        future = self._executor.submit(
+            self._run_application, self.environ(request), request, ioloop
+        )
+        ioloop.add_future(
+            future, functools.partial(self._on_done, route, request)
+        )
+
+    def _run_application(self, environ, request, ioloop):
+        """Run the WSGI application, return status, headers and body.
+
+        Body is None if the response has been streamed.
+        """
+        data = {}
+        response = []
+
+        def start_response(status, response_headers, exc_info=None):
+            """WSGI start_response."""
+            data['status'] = status
+            data['headers'] = response_headers
+            return response.append
+
+        app_response = self.wsgi_application(environ, start_response)
+        try:
+            chunks = iter(app_response)
+            if not data:
+                # Generators call start_response on first iteration.
+                response.extend(itertools.islice(chunks, 1))
+
+            if self._streamed(data, app_response):
+                self._stream(data, itertools.chain(response, chunks),
+                             request, ioloop)
+                return data['status'], data['headers'], None
+
+            response.extend(chunks)
+            body = b''.join(response)
+        finally:
+            if hasattr(app_response, 'close'):
+                app_response.close()
+        if not data:
+            raise Exception('WSGI app did not call start_response')
+
+        return data['status'], data['headers'], body
+
+    @staticmethod
+    def _streamed(data, app_response):
+        """Check if response is generated without known length."""
+        if not data or isinstance(app_response, (list, tuple)):
+            return False
+        if data['status'].startswith(('204', '304')):
+            return False
+        return not any(key.lower() == 'content-length'
+                       for key, _value in data['headers'])
+
+    @staticmethod
+    def _stream(data, app_response, request, ioloop):
+        """Write response to the client as it is generated."""
+        _status_code, start_line, header_obj = _response_headers(
+            data['status'], data['headers']
+        )
+        try:
+            _write(ioloop, request.connection.write_headers,
+                   start_line, header_obj)
+
+            chunks = []
+            size = 0
+            for chunk in app_response:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= _STREAM_CHUNK_SIZE:
+                    _write(ioloop, request.connection.write, b''.join(chunks))
+                    chunks = []
+                    size = 0
+
+            if chunks:
+                _write(ioloop, request.connection.write, b''.join(chunks))
+        except Exception as err:
+            raise _StreamAborted(err)
+
+    def _on_done(self, route, request, future):
+        """Write the response and start the next pending request."""
+        stats = self.routes[route]
+        stats.active -= 1
+        if stats.pending:
+            self._start(route, stats.pending.popleft())
+
+        try:
+            status, headers, body = future.result()
+        except _StreamAborted:
+            # Headers are sent already, the client sees the response is
+            # incomplete when the connection is closed.
+            _LOGGER.exception('Streaming aborted: %s %s',
+                              request.method, request.uri)
+            request.connection.close()
+            return
+        except Exception:  # pylint: disable=W0703
+            _LOGGER.exception('Unhandled error: %s %s',
+                              request.method, request.uri)
+            status, headers, body = '500 Internal Server Error', [], b''
+
+        if body is None:
+            request.connection.finish()
+            self._log(int(status.split(' ', 1)[0]), request)
+            return
+
+        body = escape.utf8(body)
+        status_code, start_line, header_obj = _response_headers(
+            status, headers, body
+        )
+        request.connection.write_headers(start_line, header_obj, chunk=body)
+        request.connection.finish()
+        self._log(status_code, request)
+
+    def stats(self):
+        """Return per route request statistics."""
+        return {
+            route: stats.to_dict()
+            for route, stats in self.routes.items()
+        }
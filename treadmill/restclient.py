@@ -3,11 +3,17 @@
 This is meant to replace treadmill.http, as this uses outdated urlib.
 """
 
+import collections
+import concurrent.futures
 import http.client
 import logging
+import os
+import threading
 import time
+import urllib.parse
 
 import requests
+import requests.adapters
 import requests_unixsocket
 import requests_kerberos
 import simplejson.scanner
@@ -17,8 +23,11 @@ requests_unixsocket.monkeypatch()
 
 _NUM_OF_RETRIES = 5
 
+# Send the SPNEGO token with the first request, rather than after a 401
+# challenge, the security context is kept per host by the auth object.
 _KERBEROS_AUTH = requests_kerberos.HTTPKerberosAuth(
-    mutual_authentication=requests_kerberos.DISABLED
+    mutual_authentication=requests_kerberos.DISABLED,
+    force_preemptive=True
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -29,6 +38,105 @@ _DEFAULT_CONNECT_TIMEOUT = .5
 
 _CONNECTION_ERROR_STATUS_CODE = 599
 
+_POOL_SIZE = 10
+
+# Delay, in seconds, before a GET is also sent to the next API endpoint,
+# None to try the endpoints one at a time.
+_HEDGE_DELAY = None
+
+# Max number of requests running concurrently for hedged calls.
+_HEDGE_WORKERS = 32
+
+_HEDGE_EXECUTOR = None
+_HEDGE_EXECUTOR_PID = None
+
+_SESSIONS = {}
+_SESSIONS_PID = None
+_SESSIONS_LOCK = threading.Lock()
+
+# Number of GET responses with ETag kept to revalidate with If-None-Match,
+# 0 to disable caching.
+_CACHE_SIZE = 256
+
+_RESPONSES = collections.OrderedDict()
+_RESPONSES_LOCK = threading.Lock()
+
+
+def set_session_options(pool_size=None, hedge_delay=None, cache_size=None):
+    """Set connection pool size of new sessions, hedged request delay and
+    number of cached responses.
+
+    Options that are None are left unchanged, negative hedge_delay disables
+    hedging.
+    """
+    # pylint: disable=W0603
+    global _POOL_SIZE
+    global _HEDGE_DELAY
+    global _CACHE_SIZE
+
+    if pool_size is not None:
+        _POOL_SIZE = pool_size
+    if hedge_delay is not None:
+        _HEDGE_DELAY = hedge_delay if hedge_delay >= 0 else None
+    if cache_size is not None:
+        _CACHE_SIZE = cache_size
+        with _RESPONSES_LOCK:
+            while len(_RESPONSES) > _CACHE_SIZE:
+                _RESPONSES.popitem(last=False)
+
+
+def _cached(url):
+    """Get cached response of the url, None if not cached."""
+    with _RESPONSES_LOCK:
+        response = _RESPONSES.get(url)
+        if response is not None:
+            _RESPONSES.move_to_end(url)
+        return response
+
+
+def _cache(url, response):
+    """Cache response of the url if it has ETag, drop least recently used."""
+    headers = getattr(response, 'headers', None)
+    etag = headers.get('ETag') if headers is not None else None
+    with _RESPONSES_LOCK:
+        if not isinstance(etag, str) or not _CACHE_SIZE:
+            _RESPONSES.pop(url, None)
+            return
+
+        _RESPONSES[url] = response
+        _RESPONSES.move_to_end(url)
+        while len(_RESPONSES) > _CACHE_SIZE:
+            _RESPONSES.popitem(last=False)
+
+
+def _session(url):
+    """Get keep-alive session for the API endpoint of the url.
+
+    Sessions are per process, so that forked processes do not share
+    connections.
+    """
+    # pylint: disable=W0603
+    global _SESSIONS_PID
+
+    parsed = urllib.parse.urlsplit(url)
+    endpoint = (parsed.scheme, parsed.netloc)
+    with _SESSIONS_LOCK:
+        if _SESSIONS_PID != os.getpid():
+            _SESSIONS.clear()
+            _SESSIONS_PID = os.getpid()
+
+        session = _SESSIONS.get(endpoint)
+        if session is None:
+            session = requests_unixsocket.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=_POOL_SIZE
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _SESSIONS[endpoint] = session
+
+    return session
+
 
 def _msg(response):
     """Get response error message."""
@@ -124,8 +232,16 @@ def _call(url, method, payload=None, headers=None, auth=_KERBEROS_AUTH,
     _LOGGER.debug('http: %s %s, payload: %s, headers: %s, timeout: %s',
                   method, url, payload, headers, timeout)
 
+    # Revalidate cached response, server answers 304 if it is still valid.
+    cached = None
+    if method.lower() == 'get' and not stream and _CACHE_SIZE:
+        cached = _cached(url)
+        if cached is not None:
+            headers = dict(headers or {})
+            headers.setdefault('If-None-Match', cached.headers['ETag'])
+
     try:
-        response = getattr(requests, method.lower())(
+        response = getattr(_session(url), method.lower())(
             url, json=payload, auth=auth, proxies=proxies, headers=headers,
             timeout=timeout, stream=stream
         )
@@ -138,8 +254,14 @@ def _call(url, method, payload=None, headers=None, auth=_KERBEROS_AUTH,
         return False, None, http.client.REQUEST_TIMEOUT
 
     if response.status_code == http.client.OK:
+        if method.lower() == 'get' and not stream:
+            _cache(url, response)
         return True, response, http.client.OK
 
+    if response.status_code == http.client.NOT_MODIFIED and cached is not None:
+        _LOGGER.debug('Not modified: %s', url)
+        return True, cached, http.client.OK
+
     # Raise an appropirate exception for certain status codes (and never retry)
     _handle_error(url, response)
 
@@ -147,10 +269,84 @@ def _call(url, method, payload=None, headers=None, auth=_KERBEROS_AUTH,
     return False, response, response.status_code
 
 
+def _hedge_executor():
+    """Get thread pool running hedged requests, one per process."""
+    # pylint: disable=W0603
+    global _HEDGE_EXECUTOR
+    global _HEDGE_EXECUTOR_PID
+
+    with _SESSIONS_LOCK:
+        if _HEDGE_EXECUTOR_PID != os.getpid():
+            _HEDGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_HEDGE_WORKERS
+            )
+            _HEDGE_EXECUTOR_PID = os.getpid()
+        return _HEDGE_EXECUTOR
+
+
+def _close_response(future):
+    """Close response of a request that lost the race.
+
+    Streamed responses hold their pooled connection until closed.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    _success, response, _status_code = future.result()
+    if response is not None:
+        response.close()
+
+
+def _call_hedged(urls, method, payload=None, headers=None,
+                 auth=_KERBEROS_AUTH, proxies=None, timeout=None, stream=None,
+                 hedge_delay=None):
+    """Call list of supplied URLs in parallel, return on first success.
+
+    The next URL is called when the previous calls fail or do not complete
+    within hedge_delay seconds. Responses of calls still running when one
+    succeeds are closed once they complete.
+    """
+    executor = _hedge_executor()
+    urls = list(urls)
+    pending = {}
+    attempts = []
+    try:
+        while urls or pending:
+            if urls:
+                url = urls.pop(0)
+                future = executor.submit(_call, url, method, payload, headers,
+                                         auth, proxies, timeout=timeout,
+                                         stream=stream)
+                pending[future] = url
+
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=hedge_delay if urls else None,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                url = pending.pop(future)
+                success, response, status_code = future.result()
+                if success:
+                    return success, response
+
+                attempts.append(
+                    (time.time(), url, status_code, _msg(response))
+                )
+        return False, attempts
+    finally:
+        for future in pending:
+            future.add_done_callback(_close_response)
+
+
 def _call_list(urls, method, payload=None, headers=None, auth=_KERBEROS_AUTH,
                proxies=None, timeout=None, stream=None):
     """Call list of supplied URLs, return on first success."""
     _LOGGER.debug('Call %s on %r', method, urls)
+    if _HEDGE_DELAY is not None and method == 'get' and len(urls) > 1:
+        return _call_hedged(urls, method, payload, headers, auth, proxies,
+                            timeout=timeout, stream=stream,
+                            hedge_delay=_HEDGE_DELAY)
+
     attempts = []
     for url in urls:
         success, response, status_code = _call(url, method, payload, headers,
@@ -3,24 +3,32 @@
 
 import decorator
 import json
+import threading
+import urllib.parse
+
 import jsonschema
 import pkg_resources
 
 _TEST_MODE = False
 
+_SCHEMA_BASE = 'file://etc/schema/'
+
+_VALIDATORS = {}
+_VALIDATORS_LOCK = threading.Lock()
+
 
 class _RefResolver(jsonschema.RefResolver):
     """Resolves schema from pkg resource."""
 
     def __init__(self):
-        super(_RefResolver, self).__init__('file://etc/schema/', None)
+        super(_RefResolver, self).__init__(_SCHEMA_BASE, None)
 
     def resolve_remote(self, uri):
         """Resolves json schema from package resource."""
         # TODO: specyfying file:// uri is wrong, but for some reason
         #       documented ways of handling differnet uri type (using handlers
         #       dict) do not work with local ref points like #/<xxx>.
-        if uri.startswith('file://etc/schema/'):
+        if uri.startswith(_SCHEMA_BASE):
             resource = uri[len('file:/'):]
             json_string = pkg_resources.resource_string('treadmill', resource)
             return json.loads(json_string.decode())
@@ -28,28 +36,81 @@ class _RefResolver(jsonschema.RefResolver):
             return super(_RefResolver, self).resolve_remote(uri)
 
 
+def _inline(schema_def, base_uri, resolver, resolving):
+    """Return schema with $refs replaced by the referenced schemas.
+
+    Recursive references are made absolute and left to be resolved during
+    validation.
+    """
+    if isinstance(schema_def, list):
+        return [
+            _inline(item, base_uri, resolver, resolving)
+            for item in schema_def
+        ]
+
+    if not isinstance(schema_def, dict):
+        return schema_def
+
+    ref = schema_def.get('$ref')
+    if isinstance(ref, str):
+        uri = urllib.parse.urljoin(base_uri, ref)
+        if uri in resolving:
+            return {'$ref': uri}
+        url, resolved = resolver.resolve(uri)
+        return _inline(resolved, url, resolver, resolving | {uri})
+
+    return {
+        key: value if key == 'enum' else _inline(value, base_uri, resolver,
+                                                 resolving)
+        for key, value in schema_def.items()
+    }
+
+
+def validator(schema_def):
+    """Return compiled validator for the schema.
+
+    Validators are compiled once per process, with references resolved
+    upfront, and shared by all callers using the same schema.
+    """
+    key = json.dumps(schema_def, sort_keys=True)
+    with _VALIDATORS_LOCK:
+        compiled = _VALIDATORS.get(key)
+        if compiled is None:
+            resolver = _RefResolver()
+            compiled = jsonschema.Draft4Validator(
+                _inline(schema_def, _SCHEMA_BASE, resolver, frozenset()),
+                resolver=resolver
+            )
+            _VALIDATORS[key] = compiled
+
+    return compiled
+
+
 def schema(*schemas, **kwschemas):
     """Schema decorator."""
-    resolver = _RefResolver()
-    validators = [
-        jsonschema.Draft4Validator(s, resolver=resolver)
-        for s in schemas
-    ]
-
-    kwvalidator = jsonschema.Draft4Validator({
+    kwschema = {
         'type': 'object',
         'additionalProperties': False,
         'properties': kwschemas,
-    }, resolver=resolver)
+    }
+    # Compiled on first call, so that importing modules does not load the
+    # schema files.
+    validators = []
+    argspecs = {}
 
     def validate(args, kwargs):
         """Validate function arguments."""
+        if not validators:
+            validators[:] = [validator(kwschema)] + [
+                validator(s) for s in schemas
+            ]
+
         validated_args = []
-        for validator, arg in zip(validators, args):
-            validator.validate(arg)
+        for arg_validator, arg in zip(validators[1:], args):
+            arg_validator.validate(arg)
             validated_args.append(arg)
         if kwargs:
-            kwvalidator.validate(kwargs)
+            validators[0].validate(kwargs)
 
         return validated_args, kwargs
 
@@ -57,7 +118,9 @@ def schema(*schemas, **kwschemas):
     def decorated(func, *args):
         """Validates arguments given schemas."""
         # decorator.decorator swallows kwargs for some reason.
-        argspec = decorator.getargspec(func)
+        argspec = argspecs.get(func)
+        if argspec is None:
+            argspec = argspecs[func] = decorator.getargspec(func)
         defaults = []
         if argspec.defaults:
             defaults = argspec.defaults
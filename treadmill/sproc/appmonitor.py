@@ -43,7 +43,7 @@ def reevaluate(instance_api, state):
         conf['last_update'] = now
 
     # Allow every application to evaluate
-    success = True
+    wanted = []
 
     for name, conf in monitors.items():
 
@@ -63,31 +63,7 @@ def reevaluate(instance_api, state):
             if allowed <= 0:
                 continue
 
-            try:
-                instance_api.create(name, {}, count=allowed)
-                conf['available'] -= allowed
-
-            except ldap3.LDAPNoSuchObjectResult:
-                # TODO: may need to rationalize this and not expose low
-                #       level ldap exception from admin.py, and rather
-                #       return None for non-existing entities.
-                _LOGGER.warn('Application not configured: %s', name)
-            except ldap3.LDAPMaximumRetriesError:
-                # In case of LDAP connection error, there is no reason to
-                # continue the loop, exit right away.
-                #
-                # Returning False will stop the main loop.
-                _LOGGER.warn('Unable to connect to LDAP.',
-                             exception=True)
-                return False
-            except Exception:  # pylint: disable=W0703
-                _LOGGER.exception('Unable to create instances: %s: %s',
-                                  name, needed)
-                # In case this is the error with the app manifest, we allow
-                # for the loop to continue.
-                #
-                # After the loop is evaluated, app monitor will exit.
-                success = False
+            wanted.append({'_id': name, 'count': allowed})
 
         elif count < current_count:
             for extra in grouped[name][:current_count - count]:
@@ -96,7 +72,32 @@ def reevaluate(instance_api, state):
                 except Exception:  # pylint: disable=W0703
                     _LOGGER.exception('Unable to delete instance: %r', extra)
 
-    return success
+    if not wanted:
+        return True
+
+    # Create instances of all applications in one call, the manifests are
+    # looked up in bulk.
+    try:
+        created = instance_api.bulk_create(wanted)
+    except ldap3.LDAPMaximumRetriesError:
+        # In case of LDAP connection error, there is no reason to
+        # continue the loop, exit right away.
+        #
+        # Returning False will stop the main loop.
+        _LOGGER.warning('Unable to connect to LDAP.', exc_info=True)
+        return False
+    except Exception:  # pylint: disable=W0703
+        _LOGGER.exception('Unable to create instances: %r', wanted)
+        return False
+
+    # Errors of individual applications, e.g. not configured or invalid
+    # manifest, are logged by the API, the instances are retried when
+    # tokens are available.
+    for result in created:
+        if '_error' not in result:
+            monitors[result['_id']]['available'] -= len(result['instances'])
+
+    return True
 
 
 def _run_sync():
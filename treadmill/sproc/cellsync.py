@@ -16,13 +16,32 @@ from treadmill import zknamespace as z
 _LOGGER = logging.getLogger(__name__)
 
 
+# Seconds between syncs of objects modified in LDAP.
+_INTERVAL = 60
+
+# Seconds between full syncs, which also remove objects deleted from LDAP
+# and repair Zookeeper nodes modified outside of cellsync.
+_FULL_SYNC_INTERVAL = 60 * 60
+
+
 def _remove_id(entity):
     """Remove _id from the payload."""
     del entity['_id']
 
 
+def _match_appgroup(name, group):
+    """Match if appgroup belongs to the cell."""
+    if context.GLOBAL.cell in group.get('cells', []):
+        return name
+    else:
+        return None
+
+
 def _sync_collection(zkclient, entities, zkpath, match=None):
-    """Syncs ldap collection to Zookeeper."""
+    """Syncs ldap collection to Zookeeper.
+
+    Returns the synced entities by Zookeeper node name.
+    """
     _LOGGER.info('Sync: %s', zkpath)
 
     zkclient.ensure_path(zkpath)
@@ -38,6 +57,7 @@ def _sync_collection(zkclient, entities, zkpath, match=None):
         zkutils.ensure_deleted(zkclient, z.join_zookeeper_path(zkpath, extra))
 
     # Add or update current app-groups
+    synced = {}
     for name, entity in zip(names, entities):
         zkname = name
         if match:
@@ -51,10 +71,42 @@ def _sync_collection(zkclient, entities, zkpath, match=None):
             _LOGGER.info('Update: %s', zkname)
         else:
             _LOGGER.info('Up to date: %s', zkname)
+        synced[zkname] = entity
+
+    return synced
+
 
+def _sync_modified(zkclient, entities, zkpath, synced, match=None):
+    """Syncs modified ldap entities, skipping the ones synced already.
+
+    Synced entities modified so that they no longer match are deleted.
+    """
+    for entity in entities:
+        name = entity.pop('_id')
+        zkname = name
+        if match:
+            zkname = match(name, entity)
+            if not zkname:
+                if name in synced:
+                    _LOGGER.info('Delete: %s', name)
+                    zkutils.ensure_deleted(
+                        zkclient, z.join_zookeeper_path(zkpath, name)
+                    )
+                    del synced[name]
+                else:
+                    _LOGGER.debug('Skip: %s', name)
+                continue
 
-def _sync_allocations(zkclient, allocations):
-    """Syncronize allocations."""
+        if synced.get(zkname) == entity:
+            continue
+
+        zkutils.put(zkclient, z.join_zookeeper_path(zkpath, zkname), entity)
+        _LOGGER.info('Update: %s', zkname)
+        synced[zkname] = entity
+
+
+def _allocations(allocations):
+    """Return allocations with name, as stored in Zookeeper."""
     filtered = []
     for alloc in allocations:
         _LOGGER.info('Sync allocation: %s', alloc)
@@ -62,31 +114,88 @@ def _sync_allocations(zkclient, allocations):
         alloc['name'] = name
         filtered.append(alloc)
 
-    zkutils.put(zkclient, z.path.allocation(), filtered, check_content=True)
+    return filtered
 
 
-def _run_sync():
-    """Sync Zookeeper with LDAP, runs with lock held."""
-    def match_appgroup(name, group):
-        """Match if appgroup belongs to the cell."""
-        if context.GLOBAL.cell in group.get('cells', []):
-            return name
-        else:
-            return None
+class _CellSync(object):
+    """Syncs LDAP objects modified since the last sync.
 
-    while True:
-        # Sync app groups
+    The modifyTimestamp of the latest modified object is the cursor of the
+    next sync. The synced objects are kept, so that objects which did not
+    change are not written and Zookeeper is not read. Objects deleted from
+    LDAP, or modified before the cursor, e.g. replicated late, are synced
+    by the full sync.
+    """
+
+    __slots__ = (
+        'zkclient',
+        'app_groups',
+        'app_groups_since',
+        'allocations',
+        'allocations_since',
+    )
+
+    def __init__(self, zkclient):
+        self.zkclient = zkclient
+        self.app_groups = {}
+        self.app_groups_since = None
+        self.allocations = None
+        self.allocations_since = None
+
+    def full_sync(self):
+        """Sync all objects, write the ones different in Zookeeper."""
         admin_app_group = admin.AppGroup(context.GLOBAL.ldap.conn)
-        app_groups = admin_app_group.list({})
-        _sync_collection(context.GLOBAL.zk.conn,
-                         app_groups, z.path.appgroup(), match_appgroup)
+        app_groups, self.app_groups_since = admin_app_group.list_modified({})
+        self.app_groups = _sync_collection(self.zkclient,
+                                           app_groups, z.path.appgroup(),
+                                           _match_appgroup)
 
-        # Sync allocations.
         admin_alloc = admin.CellAllocation(context.GLOBAL.ldap.conn)
+        allocations, self.allocations_since = admin_alloc.list_modified(
+            {'cell': context.GLOBAL.cell}
+        )
+        self.allocations = _allocations(allocations)
+        zkutils.put(self.zkclient, z.path.allocation(), self.allocations,
+                    check_content=True)
+
+    def sync(self):
+        """Sync objects modified since the last sync."""
+        admin_app_group = admin.AppGroup(context.GLOBAL.ldap.conn)
+        app_groups, self.app_groups_since = admin_app_group.list_modified(
+            {}, since=self.app_groups_since
+        )
+        _sync_modified(self.zkclient, app_groups, z.path.appgroup(),
+                       self.app_groups, _match_appgroup)
+
+        # Allocations are stored in single node, all are read if any has
+        # been modified.
+        admin_alloc = admin.CellAllocation(context.GLOBAL.ldap.conn)
+        modified, self.allocations_since = admin_alloc.list_modified(
+            {'cell': context.GLOBAL.cell}, since=self.allocations_since
+        )
+        if not modified:
+            return
+
+        allocations = _allocations(
+            admin_alloc.list({'cell': context.GLOBAL.cell})
+        )
+        if allocations != self.allocations:
+            zkutils.put(self.zkclient, z.path.allocation(), allocations)
+            _LOGGER.info('Update: %s', z.path.allocation())
+            self.allocations = allocations
+
+
+def _run_sync(interval=_INTERVAL, full_sync_interval=_FULL_SYNC_INTERVAL):
+    """Sync Zookeeper with LDAP, runs with lock held."""
+    cell_sync = _CellSync(context.GLOBAL.zk.conn)
+    last_full_sync = 0
 
-        allocations = admin_alloc.list({'cell': context.GLOBAL.cell})
-        _sync_allocations(context.GLOBAL.zk.conn,
-                          allocations)
+    while True:
+        if time.time() - last_full_sync >= full_sync_interval:
+            last_full_sync = time.time()
+            cell_sync.full_sync()
+        else:
+            cell_sync.sync()
 
         # Servers - because they can have custom topology - are loaded
         # from the plugin.
@@ -98,7 +207,7 @@ def _run_sync():
             _LOGGER.warn('Unable to load treadmill.plugins.sproc.servers: '
                          '%s', err)
 
-        time.sleep(60)
+        time.sleep(interval)
 
 
 def init():
@@ -107,16 +216,20 @@ def init():
     @click.command()
     @click.option('--no-lock', is_flag=True, default=False,
                   help='Run without lock.')
-    def top(no_lock):
+    @click.option('--interval', default=_INTERVAL,
+                  help='Seconds between syncs of modified objects.')
+    @click.option('--full-sync-interval', default=_FULL_SYNC_INTERVAL,
+                  help='Seconds between syncs of all objects.')
+    def top(no_lock, interval, full_sync_interval):
         """Sync LDAP data with Zookeeper data."""
         if not no_lock:
             _LOGGER.info('Waiting for leader lock.')
             lock = zkutils.make_lock(context.GLOBAL.zk.conn,
                                      z.path.election(__name__))
             with lock:
-                _run_sync()
+                _run_sync(interval, full_sync_interval)
         else:
             _LOGGER.info('Running without lock.')
-            _run_sync()
+            _run_sync(interval, full_sync_interval)
 
     return top
@@ -29,11 +29,26 @@ def init():
                   required=True)
     @click.option('--workers', help='Number of workers',
                   default=5)
+    @click.option('--threads', help='Number of request threads per worker, '
+                  '0 to run requests on the IO loop; each thread checks out '
+                  'its own LDAP connection, see --ldap-pool-size',
+                  default=0)
+    @click.option('--route-limit', help='Max concurrent requests per route, '
+                  'e.g. instance=2,allocation=4', type=cli.DICT)
+    @click.option('--ldap-pool-size', type=int,
+                  help='Max LDAP connections per worker, defaults to the '
+                  'number of request threads')
+    @click.option('--ldap-cache-ttl', default=0,
+                  help='Seconds to cache tenants, allocations and cells, '
+                  '0 to disable caching')
     @click.option('-A', '--authz', help='Authoriztion argument',
                   required=False)
-    def top(port, socket, auth, title, modules, cors_origin, workers, authz):
+    def top(port, socket, auth, title, modules, cors_origin, workers, threads,
+            route_limit, ldap_pool_size, ldap_cache_ttl, authz):
         """Run Treadmill API server."""
         context.GLOBAL.zk.add_listener(zkutils.exit_on_lost)
+        context.GLOBAL.ldap.pool_size = ldap_pool_size or max(threads, 1)
+        context.GLOBAL.ldap.cache_ttl = ldap_cache_ttl
 
         api_paths = api.init(modules, title.replace('_', ' '), cors_origin,
                              authz)
@@ -41,9 +56,12 @@ def init():
         if port:
             rest_server = rest.TcpRestServer(port, auth_type=auth,
                                              protect=api_paths,
-                                             workers=workers)
+                                             workers=workers,
+                                             threads=threads,
+                                             route_limits=route_limit)
         elif socket:
-            rest_server = rest.UdsRestServer(socket)
+            rest_server = rest.UdsRestServer(socket, threads=threads,
+                                             route_limits=route_limit)
         else:
             click.echo('port or socket must be specified')
             sys.exit(1)
@@ -6,6 +6,7 @@ import time
 
 import click
 
+from treadmill.apptrace import history
 from treadmill.apptrace import zk
 from treadmill import context
 from treadmill import zknamespace as z
@@ -35,6 +36,12 @@ FINISHED_HISTORY_MAX_COUNT = 100
 # Default max trace history count.
 TRACE_HISTORY_MAX_COUNT = 100
 
+# Max number of batches uploaded per cleanup cycle.
+MAX_BATCHES = 10
+
+# Interval between cleanup if there is backlog of expired nodes.
+BACKLOG_CLEANUP_INTERVAL = 5
+
 
 def init():
     """Top level command handler."""
@@ -61,6 +68,12 @@ def init():
     @click.option('--finished-history-max-count',
                   help='Max finished history to keep.',
                   type=int, default=FINISHED_HISTORY_MAX_COUNT)
+    @click.option('--max-batches',
+                  help='Max batches uploaded per cleanup cycle.',
+                  type=int, default=MAX_BATCHES)
+    @click.option('--backlog-interval',
+                  help='Timeout between checks if there is backlog (sec).',
+                  type=int, default=BACKLOG_CLEANUP_INTERVAL)
     @click.option('--no-lock', is_flag=True, default=False,
                   help='Run without lock.')
     def cleanup(interval,
@@ -70,22 +83,36 @@ def init():
                 finished_batch_size,
                 finished_expire_after,
                 finished_history_max_count,
+                max_batches,
+                backlog_interval,
                 no_lock):
         """Cleans up old traces."""
 
         def _cleanup():
             """Do cleanup."""
+            # Cursors are stored while holding the lock, so that the next
+            # leader resumes instead of listing everything again.
+            trace_cursor = zk.CleanupCursor.load(context.GLOBAL.zk.conn,
+                                                 'trace')
+            finished_cursor = zk.CleanupCursor.load(context.GLOBAL.zk.conn,
+                                                    'finished')
             while True:
-                zk.cleanup_trace(
+                trace_backlog = zk.cleanup_trace(
                     context.GLOBAL.zk.conn,
                     trace_batch_size,
-                    trace_expire_after
+                    trace_expire_after,
+                    cursor=trace_cursor,
+                    max_batches=max_batches
                 )
-                zk.cleanup_finished(
+                finished_backlog = zk.cleanup_finished(
                     context.GLOBAL.zk.conn,
                     finished_batch_size,
-                    finished_expire_after
+                    finished_expire_after,
+                    cursor=finished_cursor,
+                    max_batches=max_batches
                 )
+                trace_cursor.save(context.GLOBAL.zk.conn, 'trace')
+                finished_cursor.save(context.GLOBAL.zk.conn, 'finished')
                 zk.cleanup_trace_history(
                     context.GLOBAL.zk.conn,
                     trace_history_max_count
@@ -95,8 +122,17 @@ def init():
                     finished_history_max_count
                 )
 
-                _LOGGER.info('Finished cleanup, sleep %s sec', interval)
-                time.sleep(interval)
+                # Full batches left behind means the cleanup is falling
+                # behind, come back sooner.
+                sleep = interval
+                if (trace_backlog >= trace_batch_size or
+                        finished_backlog >= finished_batch_size):
+                    sleep = min(interval, backlog_interval)
+
+                _LOGGER.info('Finished cleanup, backlog: trace = %s, '
+                             'finished = %s, sleep %s sec',
+                             trace_backlog, finished_backlog, sleep)
+                time.sleep(sleep)
 
         if no_lock:
             _cleanup()
@@ -107,5 +143,28 @@ def init():
             with lock:
                 _cleanup()
 
+    @trace.command()
+    @click.option('--sow-dir', help='Trace state of the world directory.',
+                  required=True)
+    @click.option('--interval', help='Timeout between compactions (sec).',
+                  type=int, default=TRACE_CLEANUP_INTERVAL)
+    @click.option('--partition-size', help='History partition size (sec).',
+                  type=int, default=history.PARTITION_SIZE)
+    @click.option('--retention', help='History retention (sec).',
+                  type=int, default=history.RETENTION)
+    def compact(sow_dir, interval, partition_size, retention):
+        """Compact trace history snapshots into indexed partitions."""
+        store = history.HistoryStore(
+            sow_dir,
+            table='trace',
+            partition_size=partition_size,
+            retention=retention
+        )
+        while True:
+            store.compact()
+            _LOGGER.info('Finished compaction, sleep %s sec', interval)
+            time.sleep(interval)
+
     del cleanup
+    del compact
     return trace
@@ -15,10 +15,15 @@ import click
 from treadmill import cli
 from treadmill import websocket as ws
 from treadmill.websocket import api
+from treadmill.websocket import fanin
+from treadmill.websocket import utils
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Interval to log send queue metrics, in milliseconds.
+_STATS_INTERVAL = 60 * 1000
+
 
 def init():
     """Treadmill Websocket"""
@@ -32,7 +37,37 @@ def init():
     @click.option('--port',
                   help='Websocket HTTP port',
                   required=True, default=8080)
-    def websocket(fs_root, modules, port):
+    @click.option('--queue-limit',
+                  help='Per connection send queue limit (0 - unbounded).',
+                  type=int, default=utils.QUEUE_LIMIT)
+    @click.option('--overflow',
+                  help='Send queue overflow policy.',
+                  type=click.Choice(utils.OVERFLOW_POLICIES),
+                  default=utils.OVERFLOW_DROP_OLDEST)
+    @click.option('--sow-limit',
+                  help='Max number of state of the world records replayed.',
+                  type=int, default=None)
+    @click.option('--sow-workers',
+                  help='Number of state of the world replay threads.',
+                  type=int, default=ws.SOW_WORKERS)
+    @click.option('--replay-log-size',
+                  help='Number of events kept per topic for resuming '
+                  'subscriptions.',
+                  type=int, default=utils.REPLAY_LOG_SIZE)
+    @click.option('--compression/--no-compression',
+                  help='Allow permessage-deflate for clients asking.',
+                  default=False)
+    @click.option('--coalesce-window',
+                  help='Merge file events per path within window (ms).',
+                  type=int, default=0)
+    @click.option('--workers',
+                  help='Number of worker processes sharing the port, '
+                  'events are read once by a separate watcher process '
+                  '(0 - single process).',
+                  type=int, default=0)
+    def websocket(fs_root, modules, port, queue_limit, overflow,
+                  sow_limit, sow_workers, replay_log_size, compression,
+                  coalesce_window, workers):
         """Treadmill Websocket"""
         _LOGGER.debug('port: %s', port)
 
@@ -46,9 +81,34 @@ def init():
             impl[topic] = topic_impl
             watches.extend(topic_watches)
 
-        pubsub = ws.DirWatchPubSub(fs_root, impl, watches)
+        if workers:
+            fanin.run(fs_root, impl, watches, port, workers,
+                      queue_limit=queue_limit,
+                      overflow=overflow,
+                      sow_limit=sow_limit,
+                      sow_workers=sow_workers,
+                      replay_log_size=replay_log_size,
+                      compression=compression,
+                      coalesce_window=coalesce_window / 1000.0,
+                      stats_interval=_STATS_INTERVAL / 1000.0)
+            return
+
+        pubsub = ws.DirWatchPubSub(fs_root, impl, watches,
+                                   queue_limit=queue_limit,
+                                   overflow=overflow,
+                                   sow_limit=sow_limit,
+                                   sow_workers=sow_workers,
+                                   replay_log_size=replay_log_size,
+                                   compression=compression,
+                                   coalesce_window=coalesce_window / 1000.0)
         pubsub.run_detached()
 
+        def _log_stats():
+            """Log send queue metrics."""
+            _LOGGER.info('Send queues: %r', pubsub.stats())
+
+        tornado.ioloop.PeriodicCallback(_log_stats, _STATS_INTERVAL).start()
+
         application = tornado.web.Application([(r'/', pubsub.ws)])
         http_server = tornado.httpserver.HTTPServer(application)
         http_server.listen(port)
@@ -17,6 +17,7 @@ from treadmill import fs
 from treadmill import context
 from treadmill import zknamespace as z
 from treadmill import utils
+from treadmill.apptrace import history
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -79,6 +80,12 @@ def _on_add_trace_event(zk2fs_sync, zkpath):
 def _on_add_trace_db(zk2fs_sync, zkpath, sow_db):
     """Called when new trace DB snapshot is added."""
     _LOGGER.info('Added trace db snapshot: %s', zkpath)
+    store = history.HistoryStore(sow_db, table='trace')
+    if store.merged(os.path.basename(zkpath)):
+        _LOGGER.info('Snapshot already merged: %s', zkpath)
+        utils.touch(zk2fs_sync.fpath(zkpath))
+        return
+
     data, _metadata = zk2fs_sync.zkclient.get(zkpath)
     with tempfile.NamedTemporaryFile(delete=False, mode='wb', dir=sow_db) as f:
         f.write(zlib.decompress(data))
@@ -101,8 +108,8 @@ def _on_del_trace_db(zk2fs_sync, zkpath, sow_db):
     """Called when trace DB snapshot is deleted."""
     del zk2fs_sync
 
-    db_path = os.path.join(sow_db, os.path.basename(zkpath))
-    fs.rm_safe(db_path)
+    store = history.HistoryStore(sow_db, table='trace')
+    store.remove(os.path.basename(zkpath))
 
 
 def init():
@@ -129,12 +136,35 @@ def init():
                   is_flag=True, default=False)
     @click.option('--once', help='Sync once and exit.',
                   is_flag=True, default=False)
+    @click.option('--concurrency',
+                  help='Max outstanding Zookeeper reads during initial sync.',
+                  type=int, default=64)
+    @click.option('--batch-window',
+                  help='Batch file writes within window (seconds).',
+                  type=float, default=0)
+    @click.option('--fsync', help='Batch durability policy.',
+                  type=click.Choice([zksync.FSYNC_NONE, zksync.FSYNC_BATCH]),
+                  default=zksync.FSYNC_NONE)
+    @click.option('--journal', help='Append batches to <root>/.journal.',
+                  is_flag=True, default=False)
     def zk2fs_cmd(root, endpoints, identity_groups, appgroups, running,
-                  scheduled, servers, placement, trace, once):
+                  scheduled, servers, placement, trace, once, concurrency,
+                  batch_window, fsync, journal):
         """Starts appcfgmgr process."""
 
         fs.mkdir_safe(root)
-        zk2fs_sync = zksync.Zk2Fs(context.GLOBAL.zk.conn, root)
+
+        batch_writer = None
+        if batch_window:
+            batch_writer = zksync.BatchWriter(
+                batch_window,
+                fsync=fsync,
+                journal=os.path.join(root, '.journal') if journal else None
+            )
+
+        zk2fs_sync = zksync.Zk2Fs(context.GLOBAL.zk.conn, root,
+                                  concurrency=concurrency,
+                                  batch_writer=batch_writer)
 
         if servers:
             zk2fs_sync.sync_children(z.path.server(), watch_data=False)
@@ -182,6 +212,8 @@ def init():
             )
 
         zk2fs_sync.mark_ready()
+        if batch_writer:
+            batch_writer.start()
 
         if not once:
             while True:
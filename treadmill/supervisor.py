@@ -46,8 +46,6 @@ import stat
 import subprocess
 import time
 
-import jinja2
-
 from treadmill import fs
 from treadmill import s6
 from treadmill import subproc
@@ -63,7 +61,7 @@ EXEC_MODE = (stat.S_IRUSR |
              stat.S_IXGRP |
              stat.S_IXOTH)
 
-JINJA2_ENV = jinja2.Environment(loader=jinja2.PackageLoader(__name__))
+JINJA2_ENV = utils.JINJA2_ENV
 
 # s6-svc exits 111 if it cannot send a command.
 ERR_COMMAND = 111
@@ -136,11 +136,12 @@ def inotify_rm_watch(fileno, watch_id):
                       'inotify_rm_watch(%r, %r)' % (fileno, watch_id))
 
 
-INOTIFY_EVENT_HDRSIZE = struct.calcsize('iIII')
+_INOTIFY_EVENT_HDR = struct.Struct('iIII')
+INOTIFY_EVENT_HDRSIZE = _INOTIFY_EVENT_HDR.size
 
 
 ###############################################################################
-def _parse_buffer(event_buffer):
+def _parse_buffer(event_buffer, size=None):
     """Parses an inotify event buffer of ``inotify_event`` structs read from
     the inotify socket.
 
@@ -157,19 +158,33 @@ def _parse_buffer(event_buffer):
     The ``cookie`` member of this struct is used to pair two related
     events, for example, it pairs an IN_MOVED_FROM event with an
     IN_MOVED_TO event.
+
+    The buffer (``bytes`` or ``bytearray``, of which only the first ``size``
+    bytes are parsed) is walked in a single pass: headers are unpacked in
+    place and names are decoded straight from a memoryview, so nothing but
+    the names is copied.
     """
-    while len(event_buffer) >= INOTIFY_EVENT_HDRSIZE:
-        wd, mask, cookie, length = struct.unpack_from('iIII', event_buffer, 0)
-        name = event_buffer[
-            INOTIFY_EVENT_HDRSIZE:
-            INOTIFY_EVENT_HDRSIZE + length
-        ]
-        name = name.decode().rstrip('\x00')
-        event_buffer = event_buffer[INOTIFY_EVENT_HDRSIZE + length:]
+    if size is None:
+        size = len(event_buffer)
+
+    view = memoryview(event_buffer)
+    unpack_from = _INOTIFY_EVENT_HDR.unpack_from
+    offset = 0
+    while offset + INOTIFY_EVENT_HDRSIZE <= size:
+        wd, mask, cookie, length = unpack_from(event_buffer, offset)
+        offset += INOTIFY_EVENT_HDRSIZE
+        if length:
+            end = event_buffer.find(b'\x00', offset, offset + length)
+            if end == -1:
+                end = offset + length
+            name = str(view[offset:end], 'utf-8')
+            offset += length
+        else:
+            name = ''
         yield wd, mask, cookie, name
 
-    assert len(event_buffer) == 0, ('Unparsed bytes left in buffer: %r' %
-                                    event_buffer)
+    assert offset == size, ('Unparsed bytes left in buffer: %r' %
+                            bytes(view[offset:size]))
 
 
 ###############################################################################
@@ -389,6 +404,8 @@ class Inotify(object):
         inotify_fd = inotify_init(flags)
         self._inotify_fd = inotify_fd
         self._paths = {}
+        # Read buffer, reused across reads.
+        self._buffer = None
 
     def fileno(self):
         """The file descriptor associated with the inotify instance."""
@@ -441,7 +458,8 @@ class Inotify(object):
         """
         inotify_rm_watch(self._inotify_fd, watch_id)
 
-    def read_events(self, event_buffer_size=DEFAULT_EVENT_BUFFER_SIZE):
+    def read_events(self, event_buffer_size=DEFAULT_EVENT_BUFFER_SIZE,
+                    raw=False):
         """
         Reads events from inotify and yields them.
 
@@ -449,6 +467,11 @@ class Inotify(object):
             *optional* Buffer size while reading the inotify socket
         :type event_buffer_size:
             ``int``
+        :param raw:
+            *optional* Return plain ``(wd, mask, cookie, src_path)`` tuples
+            instead of :class:`InotifyEvent`, for high rate consumers.
+        :type raw:
+            ``bool``
         :returns:
             List of :class:`InotifyEvent` instances
         :rtype:
@@ -456,17 +479,30 @@ class Inotify(object):
         """
         if not self._paths:
             return []
-        event_buffer = os.read(self._inotify_fd, event_buffer_size)
-        event_list = []
-        for wd, mask, cookie, name in _parse_buffer(event_buffer):
-            wd_path = self._paths[wd]
-            src_path = os.path.normpath(os.path.join(wd_path, name))
-            inotify_event = InotifyEvent(wd, mask, cookie, src_path)
-            _LOGGER.debug('Received event %r', inotify_event)
 
-            if inotify_event.mask & IN_IGNORED:
+        if self._buffer is None or len(self._buffer) != event_buffer_size:
+            self._buffer = bytearray(event_buffer_size)
+        size = os.readv(self._inotify_fd, [self._buffer])
+
+        paths = self._paths
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        event_list = []
+        for wd, mask, cookie, name in _parse_buffer(self._buffer, size):
+            wd_path = paths[wd]
+            # Watched paths are normalized and names are plain file names,
+            # no need to normalize again.
+            src_path = os.path.join(wd_path, name) if name else wd_path
+
+            if raw:
+                inotify_event = (wd, mask, cookie, src_path)
+            else:
+                inotify_event = InotifyEvent(wd, mask, cookie, src_path)
+            if debug:
+                _LOGGER.debug('Received event %r', inotify_event)
+
+            if mask & IN_IGNORED:
                 # Clean up deleted watches
-                del self._paths[wd]
+                del paths[wd]
 
             event_list.append(inotify_event)
 
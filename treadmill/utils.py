@@ -4,6 +4,7 @@
 import datetime
 import functools
 import hashlib
+import heapq
 import locale
 import logging
 import os
@@ -41,7 +42,22 @@ threading._DummyThread._Thread__stop = lambda x: 0  # pylint: disable=W0212
 
 _LOGGER = logging.getLogger(__name__)
 
-JINJA2_ENV = jinja2.Environment(loader=jinja2.PackageLoader(__name__))
+
+def templates_loader():
+    """Returns jinja2 loader of the treadmill templates.
+
+    FileSystemLoader is used rather than PackageLoader, which imports
+    pkg_resources, unless treadmill is not installed as a directory, e.g.
+    when running from a zipped pex.
+    """
+    templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
+    if os.path.isdir(templates_dir):
+        return jinja2.FileSystemLoader(templates_dir)
+    else:
+        return jinja2.PackageLoader('treadmill', 'templates')
+
+
+JINJA2_ENV = jinja2.Environment(loader=templates_loader())
 
 EXEC_MODE = (stat.S_IRUSR |
              stat.S_IRGRP |
@@ -544,6 +560,32 @@ def compose(*funcs):
     return lambda x: functools.reduce(lambda v, f: f(v), reversed(funcs), x)
 
 
+def _identity(item):
+    """Return the item, default paginate key."""
+    return item
+
+
+def paginate(items, limit=None, after=None, key=None):
+    """Return items sorted by key, starting after the cursor.
+
+    Only the requested page is kept and sorted when limit is given, so that
+    items can be a generator over a large collection.
+
+    :param limit: max number of items to return, None for all
+    :param after: return items with key greater than after
+    :param key: item key function, defaults to the item itself
+    """
+    if key is None:
+        key = _identity
+
+    if after is not None:
+        items = (item for item in items if key(item) > after)
+
+    if limit is None:
+        return sorted(items, key=key)
+    return heapq.nsmallest(limit, items, key=key)
+
+
 def modules_in_pkg(pkg):
     """Get the modules in the provided package
 
@@ -2,10 +2,11 @@
 """
 
 import collections
+import concurrent.futures
 import datetime
 import errno
-import glob
 import fnmatch
+import glob
 import logging
 import threading
 import urllib.parse
@@ -15,14 +16,31 @@ import sqlite3
 import heapq
 
 import json
+import tornado.gen
+import tornado.ioloop
 import tornado.websocket
 
 from treadmill import dirwatch
 from treadmill import exc
+from treadmill.apptrace import history
+from treadmill.websocket import utils
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Number of sow database rows fetched at once.
+_SOW_CHUNK_SIZE = 256
+
+# Default number of threads replaying state of the world.
+SOW_WORKERS = 4
+
+# Default max number of messages per batched frame.
+_BATCH_SIZE = 100
+
+# Time to wait for send queue to drain during replay, before checking if
+# connection is still active.
+_REPLAY_WAIT = 1
+
 
 def make_handler(pubsub):
     """Make websocket handler factory."""
@@ -35,10 +53,32 @@ def make_handler(pubsub):
             tornado.websocket.WebSocketHandler.__init__(
                 self, application, request, **kwargs
             )
+            if pubsub:
+                self.send_queue = utils.SendQueue(pubsub.queue_limit,
+                                                  pubsub.overflow)
+            else:
+                self.send_queue = utils.SendQueue()
+            self._ioloop = tornado.ioloop.IOLoop.current()
+            self._writing = False
+            self._close_pending = False
+            # Frame batching, enabled by subscribe message.
+            self.batch_size = None
+            self.batch_window = None
+            self._batch_timer = None
+            # Throughput metrics.
+            self.opened = time.time()
+            self.sent_messages = 0
+            self.sent_frames = 0
+            self.sent_bytes = 0
 
         def active(self):
-            """Returns true if connection is active, false otherwise."""
-            return bool(self.ws_connection)
+            """Returns true if connection is active, false otherwise.
+
+            Connection that overflowed the send queue is being closed, and
+            is not active.
+            """
+            return (bool(self.ws_connection) and
+                    not self.send_queue.overflowed)
 
         def open(self):
             """Called when connection is opened.
@@ -47,6 +87,12 @@ def make_handler(pubsub):
             """
             _LOGGER.info('Connection opened.')
 
+        def get_compression_options(self):
+            """Allow permessage-deflate for clients asking for it."""
+            if pubsub and pubsub.compression:
+                return {}
+            return None
+
         def send_error_msg(self, error_str, close_conn=True):
             """Convenience method for logging and returning errors.
 
@@ -62,12 +108,160 @@ def make_handler(pubsub):
                 _LOGGER.info('Closing connection.')
                 self.close()
 
+        def send_message(self, message, key=None, when=None):
+            """Queue message to be sent from the IO loop, thread safe.
+
+            Messages with the same key (event path) may be coalesced, when
+            is used as a resume hint if the connection overflows.
+            """
+            if self.send_queue.put(message, key, when):
+                self._ioloop.add_callback(self._schedule_drain)
+            else:
+                self._ioloop.add_callback(self._on_overflow)
+
+        def set_batching(self, window, size):
+            """Enable frame batching, keeping the tightest setting asked.
+
+            Queued messages are sent as JSON arrays of up to size messages,
+            in order, waiting up to window seconds for a batch to fill.
+            """
+            if self.batch_size is None:
+                self.batch_size, self.batch_window = size, window
+            else:
+                self.batch_size = min(self.batch_size, size)
+                self.batch_window = min(self.batch_window, window)
+
+        def _schedule_drain(self):
+            """Drain now, or after batch window to let a batch fill."""
+            if ((not self.batch_window or
+                 len(self.send_queue) >= self.batch_size)):
+                self._drain()
+            elif self._batch_timer is None:
+                self._batch_timer = self._ioloop.call_later(
+                    self.batch_window, self._on_batch_timer
+                )
+
+        def _on_batch_timer(self):
+            """Batch window elapsed, send what is queued."""
+            self._batch_timer = None
+            self._drain()
+
+        def _next_frame(self):
+            """Return next frame and the number of messages in it."""
+            if self.batch_size is None:
+                return self.send_queue.get(), 1
+
+            messages = []
+            while len(messages) < self.batch_size:
+                message = self.send_queue.get()
+                if message is None:
+                    break
+                messages.append(message)
+
+            if not messages:
+                return None, 0
+            # Messages are JSON encoded already, no need to decode.
+            return '[' + ','.join(messages) + ']', len(messages)
+
+        def _drain(self):
+            """Write queued messages, one outstanding write at a time."""
+            if self._writing:
+                return
+
+            while self.active():
+                frame, count = self._next_frame()
+                if frame is None:
+                    if self._close_pending:
+                        self.close()
+                    return
+
+                try:
+                    future = self.write_message(frame)
+                except tornado.websocket.WebSocketClosedError:
+                    return
+
+                self.sent_messages += count
+                self.sent_frames += 1
+                self.sent_bytes += len(frame)
+
+                if future is not None and not future.done():
+                    # Socket is not keeping up, wait for it to drain before
+                    # writing more, so that messages pile up in the
+                    # bounded queue rather than in the stream buffer.
+                    self._writing = True
+                    future.add_done_callback(self._on_write_done)
+                    return
+
+        def send_replay(self, payload):
+            """Queue state of the world message, called from sow thread.
+
+            Blocks while the send queue is above low watermark, so that
+            replay never overflows the queue.
+            """
+            while not self.send_queue.wait(_REPLAY_WAIT):
+                if not self.active():
+                    return
+            # Replay stops once the connection is not active, after the
+            # queue overflowed (disconnect policy) or the socket is closed.
+            if self.active():
+                self.send_message(json.dumps(payload), when=payload['when'])
+
+        def send_error_async(self, error_str):
+            """Queue error message and close the connection once it is
+            sent, thread safe.
+
+            Error is sent after the messages queued before it.
+            """
+            _LOGGER.info(error_str)
+            self.send_message(json.dumps({
+                '_error': error_str,
+                'when': datetime.datetime.utcnow().isoformat(),
+            }))
+            self._ioloop.add_callback(self.close_when_drained)
+
+        def close_when_drained(self):
+            """Close connection once all queued messages are sent."""
+            self._close_pending = True
+            self._drain()
+
+        def _on_write_done(self, _future):
+            """Resume writing queued messages."""
+            self._writing = False
+            self._drain()
+
+        def _on_overflow(self):
+            """Disconnect slow consumer, with a hint where to resume."""
+            if not self.ws_connection:
+                return
+
+            _LOGGER.warning('Send queue overflow, closing connection: %r',
+                            self.send_queue.stats())
+            self.write_message({
+                '_error': 'Send queue overflow',
+                'since': self.send_queue.resume_since,
+                'when': datetime.datetime.utcnow().isoformat(),
+            })
+            self.close()
+
+        def metrics(self):
+            """Return send queue and throughput metrics."""
+            elapsed = max(time.time() - self.opened, 1)
+            metrics = self.send_queue.stats()
+            metrics.update({
+                'messages': self.sent_messages,
+                'frames': self.sent_frames,
+                'bytes': self.sent_bytes,
+                'messages_rate': self.sent_messages / elapsed,
+                'bytes_rate': self.sent_bytes / elapsed,
+            })
+            return metrics
+
         def on_close(self):
             """Called when connection is closed.
 
             Override if you want to do something else besides log the action.
             """
-            _LOGGER.info('connection closed.')
+            _LOGGER.info('connection closed: %r', self.metrics())
 
         def check_origin(self, origin):
             """Overriding check_origin method from base class.
@@ -94,10 +288,26 @@ def make_handler(pubsub):
 
                 since = message.get('since', 0)
                 snapshot = message.get('snapshot', False)
+                limit = message.get('limit')
+                resume = message.get('resume')
+                batch = message.get('batch')
+                if batch:
+                    self.set_batching(batch.get('window', 0) / 1000.0,
+                                      batch.get('size', _BATCH_SIZE))
+                replays = []
                 for watch, pattern in impl.subscribe(message):
-                    pubsub.register(watch, pattern, self, impl, since)
+                    if ((resume is not None and
+                         pubsub.resume(watch, pattern, self, impl, resume))):
+                        continue
+                    replays.append(
+                        pubsub.register_async(watch, pattern, self, impl,
+                                              since, limit)
+                    )
                 if snapshot:
-                    self.close()
+                    self._ioloop.add_future(
+                        tornado.gen.multi(replays),
+                        lambda _future: self.close_when_drained()
+                    )
 
             except Exception as err:  # pylint: disable=W0703
                 self.send_error_msg(str(err))
@@ -115,18 +325,78 @@ def make_handler(pubsub):
     return _WS
 
 
+def _encode_event(impl, path, operation, content, when, seq):
+    """Build and serialize event message, return the error on failure."""
+    try:
+        payload = impl.on_event(path, operation, content)
+        if payload is None:
+            return None
+
+        payload['when'] = when
+        payload['seq'] = seq
+        return json.dumps(payload)
+    except Exception as err:  # pylint: disable=W0703
+        _LOGGER.exception('Error handling event')
+        return err
+
+
+def _topic_key(relpath):
+    """Return replay log key (top level directory) of a relative path."""
+    return relpath.lstrip('/').split('/', 1)[0]
+
+
+def _fetch_chunks(cursor, size=_SOW_CHUNK_SIZE):
+    """Iterate over cursor rows, fetching them in chunks."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
 class DirWatchPubSub(object):
     """Pubsub dirwatch events."""
 
-    def __init__(self, root, impl=None, watches=None):
+    def __init__(self, root, impl=None, watches=None,
+                 queue_limit=utils.QUEUE_LIMIT,
+                 overflow=utils.OVERFLOW_DROP_OLDEST,
+                 sow_limit=None, sow_workers=SOW_WORKERS, watcher=None,
+                 replay_log_size=utils.REPLAY_LOG_SIZE, compression=False,
+                 coalesce_window=None):
         self.root = root
         self.impl = impl or {}
         self.watches = watches or []
-
-        self.watcher = dirwatch.DirWatcher()
+        self.queue_limit = queue_limit
+        self.overflow = overflow
+        self.sow_limit = sow_limit
+        self.compression = compression
+        self.sow_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=sow_workers
+        )
+
+        # Sequence stamped on published events. Starting from current time
+        # makes sequences increase across restarts, so stale resume
+        # cursors fall back to full state of the world replay.
+        self.seq = int(time.time() * 1000000)
+        self.replay_logs = collections.defaultdict(
+            lambda: utils.ReplayLog(replay_log_size)
+        )
+        # Sequence since which directory is continuously watched.
+        self.watched_since = {}
+        self._lock = threading.RLock()
+
+        if watcher is None:
+            watcher = dirwatch.DirWatcher(coalesce_window=coalesce_window)
+        self.watcher = watcher
         self.watcher.on_created = self._on_created
         self.watcher.on_deleted = self._on_deleted
         self.watcher.on_modified = self._on_modified
+        # Watcher in another process (fanin) acknowledges watches with the
+        # sequence they are in effect since, local watcher once added.
+        self._watch_acks = getattr(watcher, 'acknowledges', False) is True
+        if self._watch_acks:
+            self.watcher.on_watched = self._on_watched
 
         self.watch_dirs = set()
         for watch in self.watches:
@@ -134,22 +404,83 @@ class DirWatchPubSub(object):
             self.watch_dirs.update(watch_dirs)
         for directory in self.watch_dirs:
             _LOGGER.info('Added permanent dir watcher: %s', directory)
-            self.watcher.add_dir(directory)
+            self._watch_dir(directory)
 
         self.ws = make_handler(self)
-        self.handlers = collections.defaultdict(list)
-
-    def register(self, watch, pattern, ws_handler, impl, since):
-        """Register handler with pattern."""
+        self.handlers = collections.defaultdict(utils.SubscriptionIndex)
+
+    def _watch_dir(self, directory):
+        """Watch directory, record since when unless acknowledged later."""
+        self.watcher.add_dir(directory)
+        if not self._watch_acks:
+            self.watched_since.setdefault(directory, self.seq)
+
+    def _on_watched(self, directory, seq):
+        """Watch acknowledged, events after seq are all published."""
+        with self._lock:
+            # Ignore acknowledgement of a watch removed meanwhile.
+            if directory in self.watch_dirs or self.handlers.get(directory):
+                self.watched_since.setdefault(directory, seq)
+
+    def _add_handler(self, watch, pattern, ws_handler, impl):
+        """Add handler to the subscription indexes of watched dirs."""
         watch_dirs = self._get_watch_dirs(watch)
         for directory in watch_dirs:
             if ((not self.handlers[directory] and
                  directory not in self.watch_dirs)):
                 _LOGGER.info('Added dir watcher: %s', directory)
-                self.watcher.add_dir(directory)
-
-            self.handlers[directory].append((pattern, ws_handler, impl))
-        self._sow(watch, pattern, since, ws_handler, impl)
+                self._watch_dir(directory)
+
+            self.handlers[directory].add((pattern, ws_handler, impl))
+
+    def _replay_limit(self, limit):
+        """Return replay limit, capped by the server sow limit."""
+        if limit is None:
+            return self.sow_limit
+        if self.sow_limit is None:
+            return limit
+        return min(limit, self.sow_limit)
+
+    def register(self, watch, pattern, ws_handler, impl, since, limit=None):
+        """Register handler with pattern, replay state of the world."""
+        with self._lock:
+            self._add_handler(watch, pattern, ws_handler, impl)
+        self._sow(watch, pattern, since, ws_handler, impl,
+                  limit=self._replay_limit(limit))
+
+    def register_async(self, watch, pattern, ws_handler, impl, since,
+                       limit=None):
+        """Register handler with pattern, replay state of the world in the
+        sow thread pool.
+
+        Replay is flow controlled by the connection send queue. Returns
+        future, done when replay completes.
+        """
+        with self._lock:
+            self._add_handler(watch, pattern, ws_handler, impl)
+            seq = self.seq
+
+        future = self.sow_executor.submit(
+            self._sow, watch, pattern, since, ws_handler, impl,
+            limit=self._replay_limit(limit),
+            publish=ws_handler.send_replay,
+            on_error=ws_handler.send_error_async,
+            seq=seq
+        )
+
+        def _on_done(future):
+            """Report replay failure to the client."""
+            if future.cancelled() or future.exception() is None:
+                return
+            err = future.exception()
+            _LOGGER.error('Replay of %s/%s failed: %r', watch, pattern, err)
+            ws_handler.send_error_async('Replay failed: {cls}: {err}'.format(
+                cls=type(err).__name__,
+                err=str(err)
+            ))
+
+        future.add_done_callback(_on_done)
+        return future
 
     def _get_watch_dirs(self, watch):
         pathname = os.path.realpath(os.path.join(self.root, watch.lstrip('/')))
@@ -212,92 +543,201 @@ class DirWatchPubSub(object):
 
         self._notify(filename, operation, content, when)
 
-    def _notify(self, path, operation, content, when):
-        """Notify all handlers of the change."""
+    def publish(self, path, operation, content, when, seq=None):
+        """Publish change event read by the watcher process."""
+        self._notify(path, operation, content, when, seq)
+
+    def _notify(self, path, operation, content, when, seq=None):
+        """Notify all handlers of the change.
+
+        The event is stamped with the next sequence and kept in the topic
+        replay log. It is decoded and serialized once per topic
+        implementation, the resulting frame is sent as is to every
+        subscribed connection.
+        """
         root_len = len(self.root)
         directory = os.path.dirname(path)
         filename = os.path.basename(path)
 
-        for pattern, handler, impl in self.handlers[directory]:
-            if not handler.active():
-                continue
+        with self._lock:
+            if seq is None:
+                seq = self.seq + 1
+            self.seq = seq
+            self.replay_logs[_topic_key(directory[root_len:])].append(
+                seq, (path, operation, content, when)
+            )
 
-            _LOGGER.debug('filename: %s', filename)
-            _LOGGER.debug('pattern: %s', pattern)
-            if fnmatch.fnmatch(filename, pattern):
-                try:
-                    payload = impl.on_event(path[root_len:],
-                                            operation,
-                                            content)
-                    if payload is not None:
-                        payload['when'] = when
-                        handler.write_message(payload)
-                except Exception as err:
-                    _LOGGER.exception('Error handling event')
-                    handler.send_error_msg(
+            frames = {}
+            for pattern, handler, impl in self.handlers[directory].match(
+                    filename):
+                if not handler.active():
+                    continue
+
+                _LOGGER.debug('filename: %s, pattern: %s', filename, pattern)
+                if impl not in frames:
+                    frames[impl] = _encode_event(
+                        impl, path[root_len:], operation, content, when, seq
+                    )
+
+                frame = frames[impl]
+                if frame is None:
+                    continue
+
+                if isinstance(frame, Exception):
+                    handler.send_error_async(
                         '{cls}: {err}'.format(
-                            cls=type(err).__name__,
-                            err=str(err)
+                            cls=type(frame).__name__,
+                            err=str(frame)
                         )
                     )
+                else:
+                    handler.send_message(frame, key=path, when=when)
+
+    def resume(self, watch, pattern, ws_handler, impl, cursor):
+        """Register handler with pattern, replay logged events after cursor.
+
+        Returns False, without registering, if events after the cursor may
+        have been missed - evicted from the replay log, or not seen because
+        the directories were not watched all along. The caller should then
+        fall back to state of the world replay.
+        """
+        root_len = len(self.root)
+        with self._lock:
+            watch_dirs = self._get_watch_dirs(watch)
+            for directory in watch_dirs:
+                since = self.watched_since.get(directory)
+                if since is None or since > cursor:
+                    return False
+
+            entries = self.replay_logs[_topic_key(watch)].since(cursor)
+            if entries is None:
+                return False
+            if self.queue_limit and len(entries) > self.queue_limit:
+                return False
+
+            watch_dirs = set(watch_dirs)
+            for seq, (path, operation, content, when) in entries:
+                if os.path.dirname(path) not in watch_dirs:
+                    continue
+                if not fnmatch.fnmatchcase(os.path.basename(path), pattern):
+                    continue
+
+                frame = _encode_event(
+                    impl, path[root_len:], operation, content, when, seq
+                )
+                if frame is not None and not isinstance(frame, Exception):
+                    ws_handler.send_message(frame, key=path, when=when)
+
+            self._add_handler(watch, pattern, ws_handler, impl)
+
+        _LOGGER.info('Resumed %s/%s from: %s', watch, pattern, cursor)
+        return True
+
+    def _db_records(self, dbpath, sow_table, db_glob, since, limit=None):
+        """Get matching records from db.
 
-    def _db_records(self, dbpath, sow_table, db_glob, since):
-        """Get matching records from db."""
+        Filter, order and limit are pushed down to sqlite, rows are fetched
+        in chunks.
+        """
         _LOGGER.info('Using sow db: %s, glob: %s', dbpath, db_glob)
         conn = sqlite3.connect(dbpath)
-        select_stmt = ('''
+        select_stmt = ("""
         SELECT timestamp, path, data FROM %s
           WHERE path GLOB ? AND timestamp >= ?
-          ORDER BY timestamp''' % sow_table)
-
-        # Return open connection, as conn.execute is cursor iterator, not
-        # materialized list.
-        return conn, conn.execute(select_stmt, (db_glob, since,))
-
-    def _sow(self, watch, pattern, since, handler, impl):
-        """Publish state of the world."""
+          ORDER BY timestamp, path""" % sow_table)
+        args = [db_glob, since]
+        if limit is not None:
+            select_stmt += ' LIMIT ?'
+            args.append(limit)
+
+        # Return open connection, as records are read lazily from the
+        # cursor.
+        return conn, _fetch_chunks(conn.execute(select_stmt, args))
+
+    def _sow(self, watch, pattern, since, handler, impl, limit=None,
+             publish=None, on_error=None, seq=None):
+        """Publish state of the world.
+
+        Records from sow databases and filesystem are merged lazily, so
+        memory use does not depend on the size of the state of the world.
+        At most limit records are published. If given, seq is the sequence
+        the state of the world is current as of.
+        """
         if since is None:
             since = 0
+        if publish is None:
+            publish = handler.write_message
+        if on_error is None:
+            on_error = handler.send_error_msg
 
         def _publish(item):
-            when, path, content = item
+            when, path, _source, content = item
             try:
                 payload = impl.on_event(str(path), None, content)
                 if payload is not None:
                     payload['when'] = when
-                    handler.write_message(payload)
+                    if seq is not None:
+                        payload['seq'] = seq
+                    publish(payload)
             except Exception as err:  # pylint: disable=W0703
-                handler.send_error_msg(str(err))
+                on_error(str(err))
 
         db_connections = []
-        fs_records = self._get_fs_sow(watch, pattern, since)
+        records = []
 
         sow = getattr(impl, 'sow', None)
         sow_table = getattr(impl, 'sow_table', 'sow')
         try:
-            records = []
             if sow:
-                dbs = sorted(glob.glob(os.path.join(self.root, sow, '*')))
+                store = history.HistoryStore(os.path.join(self.root, sow),
+                                             table=sow_table)
                 db_glob = os.path.join(watch, pattern)
 
-                for db in dbs:
-                    if os.path.basename(db).startswith('.'):
-                        continue
-
+                # Snapshots not merged into the history partitions yet.
+                for db in store.snapshots():
                     conn, db_cursor = self._db_records(db, sow_table, db_glob,
-                                                       since)
+                                                       since, limit)
                     records.append(db_cursor)
                     db_connections.append(conn)
 
-            records.append(fs_records)
+                # Partitions older than since are skipped, and the instance
+                # index is used if the pattern names a single instance.
+                instanceid = pattern.split(',', 1)[0]
+                if ',' not in pattern or glob.has_magic(instanceid):
+                    instanceid = None
+                partition_records = store.lookup(instanceid=instanceid,
+                                                 since=since,
+                                                 path_glob=db_glob)
+                records.append(partition_records)
+                # Closes the partition being read.
+                db_connections.append(partition_records)
+
+            records.append(self._get_fs_sow(watch, pattern, since))
+
+            # Tag records with the source index, so that merge never has
+            # to compare record content.
+            records = [
+                ((when, path, source, content)
+                 for when, path, content in source_records)
+                for source, source_records in enumerate(records)
+            ]
+
             # Merge db and fs records, removing duplicates.
             prev_path = None
-
+            count = 0
             for item in heapq.merge(*records):
-                _when, path, _content = item
+                if limit is not None and count >= limit:
+                    break
+                if not handler.active():
+                    _LOGGER.info('Connection closed, abort sow: %s/%s',
+                                 watch, pattern)
+                    break
+
+                _when, path, _source, _content = item
                 if path == prev_path:
                     continue
                 prev_path = path
+                count += 1
                 _publish(item)
         finally:
             for conn in db_connections:
@@ -305,7 +745,11 @@ class DirWatchPubSub(object):
                     conn.close()
 
     def _get_fs_sow(self, watch, pattern, since):
-        """Get state of the world from filesystem."""
+        """Get state of the world from filesystem.
+
+        Only names and modification times are kept in memory, content is
+        read as records are consumed.
+        """
         root_len = len(self.root)
         fs_glob = os.path.join(self.root, watch.lstrip('/'), pattern)
 
@@ -315,32 +759,72 @@ class DirWatchPubSub(object):
         for filename in files:
             try:
                 stat = os.stat(filename)
-                with open(filename) as f:
-                    content = f.read()
-                if stat.st_mtime >= since:
-                    path, when = filename[root_len:], int(stat.st_mtime)
-                    items.append((when, path, content))
-            except (IOError, OSError) as err:
+            except OSError as err:
                 # Ignore deleted files.
                 if err.errno != errno.ENOENT:
                     raise
+                continue
 
-        return sorted(items)
+            if stat.st_mtime >= since:
+                items.append((int(stat.st_mtime), filename[root_len:]))
 
-    def _gc(self):
-        """Remove disconnected websocket handlers."""
+        items.sort()
+        for when, path in items:
+            try:
+                with open(self.root + path) as f:
+                    content = f.read()
+            except IOError as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                continue
+
+            yield when, path, content
 
-        for directory in self.handlers.keys():
-            handlers = [(pattern, handler, impl)
-                        for pattern, handler, impl in self.handlers[directory]
-                        if handler.active()]
+    def stats(self):
+        """Return send queue and throughput metrics of active connections."""
+        # Called from the IO loop, handlers are changed by the pubsub thread.
+        handlers = set()
+        with self._lock:
+            for index in self.handlers.values():
+                handlers.update(handler for _pattern, handler, _impl in index)
 
-            if not handlers and directory not in self.watch_dirs:
-                _LOGGER.info('No active handlers for %s', directory)
-                self.watcher.remove_dir(directory)
+        result = {'connections': 0, 'depth': 0, 'max_depth': 0,
+                  'dropped': 0, 'coalesced': 0, 'messages': 0,
+                  'frames': 0, 'bytes': 0}
+        for handler in handlers:
+            if not handler.active():
+                continue
+            metrics = handler.metrics()
+            result['connections'] += 1
+            result['max_depth'] = max(result['max_depth'],
+                                      metrics['max_depth'])
+            for name in ('depth', 'dropped', 'coalesced', 'messages',
+                         'frames', 'bytes'):
+                result[name] += metrics[name]
+
+        result['events_read'] = getattr(self.watcher, 'events_read', 0)
+        result['events_coalesced'] = getattr(self.watcher,
+                                             'events_coalesced', 0)
+        return result
+
+    def _gc(self):
+        """Remove disconnected websocket handlers."""
 
-            _LOGGER.info('Handlers %s, count %s', directory, len(handlers))
-            self.handlers[directory] = handlers
+        with self._lock:
+            for directory in self.handlers.keys():
+                handlers = utils.SubscriptionIndex(
+                    (pattern, handler, impl)
+                    for pattern, handler, impl in self.handlers[directory]
+                    if handler.active()
+                )
+
+                if not handlers and directory not in self.watch_dirs:
+                    _LOGGER.info('No active handlers for %s', directory)
+                    self.watcher.remove_dir(directory)
+                    self.watched_since.pop(directory, None)
+
+                _LOGGER.info('Handlers %s, count %s', directory, len(handlers))
+                self.handlers[directory] = handlers
 
     @exc.exit_on_unhandled
     def run(self, once=False):
@@ -5,6 +5,7 @@ import logging
 
 from treadmill import apptrace
 from treadmill import schema
+from treadmill import zknamespace as z
 from treadmill.websocket import utils
 from treadmill.apptrace import events as traceevents
 
@@ -24,7 +25,13 @@ class TraceAPI(object):
         def subscribe(message):
             """Return filter based on message payload."""
             parsed_filter = utils.parse_message_filter(message['filter'])
-            subscription = [('/trace/*', '%s,*' % parsed_filter.filter)]
+            if parsed_filter.instanceid.isdigit():
+                # Instance trace lives in a single shard, subscribe to it
+                # rather than matching against every shard.
+                watch = z.path.trace(parsed_filter.filter)
+            else:
+                watch = '/trace/*'
+            subscription = [(watch, '%s,*' % parsed_filter.filter)]
             _LOGGER.info('Adding trace subscription: %s', subscription)
             return subscription
 
@@ -0,0 +1,351 @@
+"""Multi-process websocket serving.
+
+A single watcher process watches the directories, reads every change once
+and distributes the events to worker processes over unix sockets. Each
+worker accepts client connections on its own SO_REUSEPORT socket, keeping
+its own subscriptions, and asks the watcher process to watch directories
+its subscribers need.
+
+Messages are JSON lines:
+
+ - watcher -> worker: [path, operation, content, when, seq]
+ - watcher -> worker: ["watched", directory, seq], once directory is
+   watched, events after seq are all forwarded
+ - worker -> watcher: ["add" | "remove", directory]
+
+The watcher never blocks on a worker: events are buffered per worker and
+sent as the socket takes them. A worker that falls more than max_pending
+bytes behind is handled as a worker that exited: the watcher exits, the
+other workers exit once their channel is closed, and the service is
+restarted by the supervisor.
+"""
+
+import collections
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.web
+
+from treadmill import exc
+from treadmill import utils
+from treadmill import websocket
+
+
+_LOGGER = logging.getLogger(__name__)
+
+_ADD = 'add'
+_REMOVE = 'remove'
+_WATCHED = 'watched'
+
+_RECV_SIZE = 256 * 1024
+
+# Max bytes buffered for a worker before it is disconnected.
+_MAX_PENDING = 64 * 1024 * 1024
+
+# Max time before buffered events are sent, if no new event arrives.
+_FLUSH_INTERVAL = 0.1
+
+
+class _Channel(object):
+    """JSON lines channel over unix socket."""
+
+    __slots__ = (
+        'sock',
+        '_buf',
+        '_out',
+        '_lock',
+    )
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buf = b''
+        self._out = bytearray()
+        self._lock = threading.Lock()
+
+    def fileno(self):
+        """Return socket file descriptor, for select."""
+        return self.sock.fileno()
+
+    def send(self, message):
+        """Send message, thread safe."""
+        self.send_raw((json.dumps(message) + '\n').encode())
+
+    def send_raw(self, data):
+        """Send encoded message(s), thread safe."""
+        with self._lock:
+            self.sock.sendall(data)
+
+    def queue(self, data):
+        """Buffer encoded message(s) and send what the socket takes,
+        without blocking, thread safe.
+
+        Socket must be non-blocking. Returns number of bytes still pending.
+        """
+        with self._lock:
+            self._out += data
+            return self._flush()
+
+    def flush(self):
+        """Send pending data the socket takes, without blocking."""
+        with self._lock:
+            return self._flush()
+
+    def _flush(self):
+        """Send pending data until socket buffer is full."""
+        while self._out:
+            try:
+                sent = self.sock.send(self._out)
+            except BlockingIOError:
+                break
+            del self._out[:sent]
+        return len(self._out)
+
+    def pending(self):
+        """Return number of bytes waiting to be sent."""
+        return len(self._out)
+
+    def recv(self):
+        """Receive available messages, raise EOFError if peer is gone."""
+        data = self.sock.recv(_RECV_SIZE)
+        if not data:
+            raise EOFError('Channel closed.')
+
+        lines = (self._buf + data).split(b'\n')
+        self._buf = lines.pop()
+        return [json.loads(line.decode()) for line in lines]
+
+
+class ChannelWatcher(object):
+    """DirWatcher replacement used in worker processes.
+
+    Directory watches are requested from the watcher process, and decoded
+    change events are received from it and passed to on_event. Watches are
+    acknowledged with the sequence they are in effect since, passed to
+    on_watched.
+    """
+
+    # Watches are in effect once acknowledged, not once added.
+    acknowledges = True
+
+    __slots__ = (
+        'on_created',
+        'on_deleted',
+        'on_modified',
+        'on_event',
+        'on_watched',
+        '_channel',
+        '_events',
+    )
+
+    def __init__(self, sock):
+        self.on_created = None
+        self.on_deleted = None
+        self.on_modified = None
+        self.on_event = None
+        self.on_watched = None
+        self._channel = _Channel(sock)
+        self._events = collections.deque()
+
+    def add_dir(self, directory):
+        """Ask watcher process to watch directory."""
+        self._channel.send([_ADD, os.path.realpath(directory)])
+
+    def remove_dir(self, directory):
+        """Tell watcher process directory is no longer needed."""
+        self._channel.send([_REMOVE, os.path.realpath(directory)])
+
+    def wait_for_events(self, timeout=-1):
+        """Wait for change events for up to timeout seconds."""
+        if self._events:
+            return True
+
+        if timeout == -1:
+            timeout = None
+        ready, _, _ = select.select([self._channel], [], [], timeout)
+        if ready:
+            self._events.extend(self._channel.recv())
+        return bool(self._events)
+
+    def process_events(self):
+        """Pass received events to on_event callback."""
+        while self._events:
+            message = self._events.popleft()
+            if message[0] == _WATCHED:
+                _watched, directory, seq = message
+                self.on_watched(directory, seq)
+                continue
+
+            path, operation, content, when, seq = message
+            self.on_event(path, operation, content, when, seq)
+
+
+class WatcherPubSub(websocket.DirWatchPubSub):
+    """Watcher process pubsub, forwarding events to worker processes."""
+
+    def __init__(self, root, watches, channels, coalesce_window=None,
+                 max_pending=_MAX_PENDING, stats_interval=None):
+        super(WatcherPubSub, self).__init__(root, watches=watches,
+                                            coalesce_window=coalesce_window)
+        for sock in channels:
+            sock.setblocking(False)
+        self.channels = [_Channel(sock) for sock in channels]
+        self.worker_dirs = {channel: set() for channel in self.channels}
+        self.max_pending = max_pending
+        self.stats_interval = stats_interval
+
+    def _notify(self, path, operation, content, when, seq=None):
+        """Forward event to all workers, encoded once.
+
+        Sequence is assigned here, so that resume cursors are valid on all
+        workers.
+        """
+        self.seq += 1
+        data = (
+            json.dumps([path, operation, content, when, self.seq]) + '\n'
+        ).encode()
+        with self._lock:
+            for channel in self.channels:
+                pending = channel.queue(data)
+                if pending > self.max_pending:
+                    _worker_gone('Worker is %s bytes behind.' % pending)
+
+    def stats(self):
+        """Return events read and bytes pending per worker."""
+        with self._lock:
+            pending = [channel.pending() for channel in self.channels]
+        return {
+            'events_read': getattr(self.watcher, 'events_read', 0),
+            'events_coalesced': getattr(self.watcher, 'events_coalesced', 0),
+            'pending': pending,
+        }
+
+    def _watched(self, directory):
+        """Check if directory is watched on behalf of any worker."""
+        if directory in self.watch_dirs:
+            return True
+        return any(directory in dirs for dirs in self.worker_dirs.values())
+
+    def _on_request(self, channel, request):
+        """Handle worker watch request."""
+        operation, directory = request
+        if operation == _ADD:
+            if not self._watched(directory):
+                _LOGGER.info('Added dir watcher: %s', directory)
+                self.watcher.add_dir(directory)
+            self.worker_dirs[channel].add(directory)
+            # Events after the current sequence are all forwarded, worker
+            # can resume subscriptions from it.
+            channel.queue(
+                (json.dumps([_WATCHED, directory, self.seq]) + '\n').encode()
+            )
+        elif operation == _REMOVE:
+            self.worker_dirs[channel].discard(directory)
+            if not self._watched(directory):
+                _LOGGER.info('Removed dir watcher: %s', directory)
+                self.watcher.remove_dir(directory)
+        else:
+            _LOGGER.warning('Unknown request: %r', request)
+
+    @exc.exit_on_unhandled
+    def serve_requests(self):
+        """Serve worker watch requests and send buffered events, exit if
+        any worker is gone.
+        """
+        logged = time.time()
+        while True:
+            with self._lock:
+                pending = [channel for channel in self.channels
+                           if channel.pending()]
+
+            ready, writable, _ = select.select(self.channels, pending, [],
+                                               _FLUSH_INTERVAL)
+            with self._lock:
+                for channel in writable:
+                    channel.flush()
+                for channel in ready:
+                    try:
+                        requests = channel.recv()
+                    except EOFError:
+                        _worker_gone('Worker exited.')
+                    for request in requests:
+                        self._on_request(channel, request)
+
+            if (self.stats_interval and
+                    time.time() - logged >= self.stats_interval):
+                logged = time.time()
+                _LOGGER.info('Watcher: %r', self.stats())
+
+
+def _worker_gone(reason):
+    """Exit the watcher process when a worker is gone or lagging.
+
+    Workers exit when their channel is closed, the supervisor restarts the
+    service with a full set of workers.
+    """
+    _LOGGER.error('%s Exiting.', reason)
+    utils.sys_exit(-1)
+
+
+def _run_worker(root, impl, watches, port, sock, stats_interval,
+                pubsub_kwargs):
+    """Run worker process websocket server."""
+    watcher = ChannelWatcher(sock)
+    pubsub = websocket.DirWatchPubSub(root, impl, watches, watcher=watcher,
+                                      **pubsub_kwargs)
+    watcher.on_event = pubsub.publish
+    pubsub.run_detached()
+
+    if stats_interval:
+        def _log_stats():
+            """Log send queue metrics."""
+            _LOGGER.info('Send queues: %r', pubsub.stats())
+
+        tornado.ioloop.PeriodicCallback(_log_stats,
+                                        stats_interval * 1000).start()
+
+    application = tornado.web.Application([(r'/', pubsub.ws)])
+    http_server = tornado.httpserver.HTTPServer(application)
+    http_server.add_sockets(
+        tornado.netutil.bind_sockets(port, reuse_port=True)
+    )
+    tornado.ioloop.IOLoop.current().start()
+
+
+def run(root, impl, watches, port, workers, coalesce_window=None,
+        stats_interval=None, **pubsub_kwargs):
+    """Fork worker processes and run the watcher in the current process.
+
+    Metrics are logged every stats_interval seconds by every process.
+    """
+    socks = []
+    for _ in range(workers):
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            parent_sock.close()
+            for sock in socks:
+                sock.close()
+            try:
+                _run_worker(root, impl, watches, port, child_sock,
+                            stats_interval, pubsub_kwargs)
+            finally:
+                os._exit(1)
+
+        _LOGGER.info('Started websocket worker: %s', pid)
+        child_sock.close()
+        socks.append(parent_sock)
+
+    pubsub = WatcherPubSub(root, watches, socks, coalesce_window,
+                           stats_interval=stats_interval)
+    requests_thread = threading.Thread(target=pubsub.serve_requests)
+    requests_thread.daemon = True
+    requests_thread.start()
+    pubsub.run()
@@ -1,6 +1,10 @@
 """Treadmill websocket utilities."""
 
 import collections
+import fnmatch
+import itertools
+import re
+import threading
 
 
 def parse_message_filter(message_filter):
@@ -11,3 +15,262 @@ def parse_message_filter(message_filter):
     return collections.namedtuple('ParseResult', 'filter appname instanceid')(
         message_filter, appname, instanceid
     )
+
+
+_GLOB_CHARS = '*?['
+
+
+class _TrieNode(object):
+    """Prefix trie node."""
+    __slots__ = (
+        'children',
+        'prefixed',
+        'globs',
+    )
+
+    def __init__(self):
+        self.children = {}
+        # Entries with pattern <prefix>*, match unconditionally.
+        self.prefixed = []
+        # Entries with other glob patterns starting with <prefix>.
+        self.globs = []
+
+
+class SubscriptionIndex(object):
+    """Index of subscription entries by filename pattern.
+
+    Entries are tuples, with the pattern as first element. Patterns are
+    split into:
+
+     - literal names, looked up by hash.
+     - <prefix>* patterns, found by walking the prefix trie.
+     - other globs, attached to the trie node of their literal prefix, and
+       matched with compiled regex only if the name has that prefix. Globs
+       with no literal prefix form the residual set at the root.
+
+    Matching cost is proportional to the length of the name and the number
+    of matching entries, rather than the number of entries.
+    """
+
+    __slots__ = (
+        '_entries',
+        '_exact',
+        '_root',
+    )
+
+    def __init__(self, entries=()):
+        self._entries = []
+        self._exact = collections.defaultdict(list)
+        self._root = _TrieNode()
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def add(self, entry):
+        """Add entry to the index."""
+        pattern = entry[0]
+        self._entries.append(entry)
+
+        prefix_len = len(pattern)
+        for char in _GLOB_CHARS:
+            idx = pattern.find(char)
+            if idx != -1:
+                prefix_len = min(prefix_len, idx)
+
+        if prefix_len == len(pattern):
+            self._exact[pattern].append(entry)
+            return
+
+        prefix = pattern[:prefix_len]
+        node = self._root
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+
+        if pattern == prefix + '*':
+            node.prefixed.append(entry)
+        else:
+            regex = re.compile(fnmatch.translate(pattern))
+            node.globs.append((regex.match, entry))
+
+    def match(self, name):
+        """Return all entries with pattern matching name."""
+        result = list(self._exact.get(name, ()))
+
+        node = self._root
+        idx = 0
+        while node is not None:
+            result.extend(node.prefixed)
+            for match, entry in node.globs:
+                if match(name):
+                    result.append(entry)
+
+            if idx == len(name):
+                break
+            node = node.children.get(name[idx])
+            idx += 1
+
+        return result
+
+
+OVERFLOW_DROP_OLDEST = 'drop-oldest'
+OVERFLOW_COALESCE = 'coalesce'
+OVERFLOW_DISCONNECT = 'disconnect'
+
+OVERFLOW_POLICIES = (
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_COALESCE,
+    OVERFLOW_DISCONNECT,
+)
+
+# Default per connection send queue limit.
+QUEUE_LIMIT = 1000
+
+
+class SendQueue(object):
+    """Bounded outbound message queue of a single connection.
+
+    Messages are put by the pubsub thread and taken by the IO loop. When
+    the queue is full, the overflow policy applies:
+
+     - drop-oldest: oldest queued message is dropped.
+     - coalesce: queued message with the same key is removed and the new
+       one is queued at the tail, so that order of messages is kept (this
+       is done regardless of the queue being full, as only the latest state
+       of a key is of interest), otherwise oldest message is dropped.
+     - disconnect: queue is discarded and put returns False; the client is
+       expected to reconnect with since=resume_since.
+    """
+
+    __slots__ = (
+        'limit',
+        'overflow',
+        'dropped',
+        'coalesced',
+        'max_depth',
+        'overflowed',
+        'resume_since',
+        '_queue',
+        '_seq',
+        '_lock',
+    )
+
+    def __init__(self, limit=QUEUE_LIMIT, overflow=OVERFLOW_DROP_OLDEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Invalid overflow policy: %r' % overflow)
+
+        self.limit = limit
+        self.overflow = overflow
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.overflowed = False
+        self.resume_since = None
+        self._queue = collections.OrderedDict()
+        self._seq = itertools.count()
+        self._lock = threading.Condition()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, message, key=None, when=None):
+        """Queue message, return False if connection must be dropped."""
+        with self._lock:
+            if self.overflowed:
+                return False
+
+            if self.overflow != OVERFLOW_COALESCE or key is None:
+                key = (None, next(self._seq))
+            elif key in self._queue:
+                self._queue[key] = (message, when)
+                self._queue.move_to_end(key)
+                self.coalesced += 1
+                return True
+
+            if self.limit and len(self._queue) >= self.limit:
+                if self.overflow == OVERFLOW_DISCONNECT:
+                    _message, self.resume_since = next(
+                        iter(self._queue.values())
+                    )
+                    self._queue.clear()
+                    self.overflowed = True
+                    return False
+
+                self._queue.popitem(last=False)
+                self.dropped += 1
+
+            self._queue[key] = (message, when)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            return True
+
+    def _has_room(self):
+        """Check if queue is below low watermark (half the limit)."""
+        return not self.limit or len(self._queue) <= self.limit // 2
+
+    def get(self):
+        """Return next message, None if queue is empty."""
+        with self._lock:
+            if not self._queue:
+                return None
+            _key, (message, _when) = self._queue.popitem(last=False)
+            if self._has_room():
+                self._lock.notify_all()
+            return message
+
+    def wait(self, timeout=None):
+        """Wait for the queue to drain below low watermark.
+
+        Used by producers that must not lose messages (state of the world
+        replay) to apply backpressure instead of overflowing. Returns False
+        on timeout.
+        """
+        with self._lock:
+            return self._lock.wait_for(self._has_room, timeout)
+
+    def stats(self):
+        """Return queue metrics."""
+        with self._lock:
+            return {
+                'depth': len(self._queue),
+                'max_depth': self.max_depth,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+            }
+
+
+# Default number of events kept per topic for resuming subscriptions.
+REPLAY_LOG_SIZE = 10000
+
+
+class ReplayLog(object):
+    """Bounded log of recent events, ordered by sequence."""
+
+    __slots__ = (
+        'horizon',
+        '_entries',
+    )
+
+    def __init__(self, size=REPLAY_LOG_SIZE):
+        # Sequence of the latest evicted entry, events after the horizon
+        # are all in the log.
+        self.horizon = None
+        self._entries = collections.deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, seq, entry):
+        """Append entry, evicting the oldest one if the log is full."""
+        if len(self._entries) == self._entries.maxlen:
+            self.horizon = self._entries[0][0] if self._entries else seq
+        self._entries.append((seq, entry))
+
+    def since(self, cursor):
+        """Return (seq, entry) list after cursor, None if evicted."""
+        if self.horizon is not None and cursor < self.horizon:
+            return None
+        return [(seq, entry) for seq, entry in self._entries if seq > cursor]
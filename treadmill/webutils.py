@@ -3,11 +3,14 @@
 
 import datetime
 import functools
+import hashlib
+import http.client
 import json
 import logging
 import re
 
 import flask
+import flask_restplus as restplus
 import tornado
 import tornado.httpserver
 
@@ -178,7 +181,7 @@ def no_cache(func):
             resp = flask.make_response(func(*args, **kwargs))
 
         hdr = resp.headers
-        hdr['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+        hdr.setdefault('Cache-Control', 'no-cache, no-store, must-revalidate')
 
         return resp
 
@@ -186,6 +189,61 @@ def no_cache(func):
     return functools.update_wrapper(wrapped_function, func)
 
 
+def conditional(version_func):
+    """Flask decorator answering conditional GET requests.
+
+    version_func is called with the view URL arguments and returns the
+    version of the underlying data, as {'version': ..., 'mtime': ...} with
+    mtime optional. The ETag is derived from the version and the request
+    path and query, so it is the same in all server processes.
+    """
+    def decorator(func):
+        """Function decorator to add ETag and Last-Modified."""
+        def wrapped_function(*args, **kwargs):
+            """Wrapper function to check request preconditions."""
+            request = flask.request
+            if request.method != 'GET':
+                return func(*args, **kwargs)
+
+            version = version_func(**kwargs)
+            if version is None:
+                return func(*args, **kwargs)
+
+            etag = hashlib.sha1(
+                '{}\0{}'.format(version['version'],
+                                request.full_path).encode()
+            ).hexdigest()
+            mtime = version.get('mtime')
+            if mtime is not None:
+                mtime = datetime.datetime.utcfromtimestamp(int(mtime))
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = (
+                    mtime is not None and
+                    request.if_modified_since is not None and
+                    mtime <= request.if_modified_since.replace(tzinfo=None)
+                )
+
+            if not_modified:
+                resp = flask.Response(status=http.client.NOT_MODIFIED)
+            else:
+                resp = flask.make_response(func(*args, **kwargs))
+
+            resp.set_etag(etag)
+            if mtime is not None:
+                resp.last_modified = mtime
+            # Clients may cache the response, but must revalidate it.
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+
+        func.provide_automatic_options = False
+        return functools.update_wrapper(wrapped_function, func)
+
+    return decorator
+
+
 def run_wsgi(wsgi_app, port):
     """Runs wsgi (Flask) app using tornado web server."""
 
@@ -232,13 +290,14 @@ def raw_get_api(api, cors_handler, marshal=None, resp_model=None,
 
 
 def get_api(api, cors_handler, marshal=None, resp_model=None,
-            parser=None, json_resp=True):
+            parser=None, json_resp=True, version=None):
     """Returns default API decorator for GET request.
 
     :param api: Flask rest_plus API
     :param cors_handler: CORS handler
     :param marshal: The API marshaller, e.g. api.marshal_list_with
     :param resp_model: The API response model
+    :param version: Data version function, see conditional
     """
     funcs = [
         cors_handler,
@@ -246,6 +305,9 @@ def get_api(api, cors_handler, marshal=None, resp_model=None,
         log_header(),
     ]
 
+    if version:
+        funcs.append(conditional(version))
+
     if json_resp:
         funcs.append(as_json)
 
@@ -264,6 +326,79 @@ def get_api(api, cors_handler, marshal=None, resp_model=None,
     return utils.compose(*funcs)
 
 
+def stream_get_api(api, cors_handler, resp_model=None, parser=None,
+                   version=None):
+    """Returns API decorator for GET request returning a stream_json list.
+
+    :param api: Flask rest_plus API
+    :param cors_handler: CORS handler
+    :param resp_model: The API response model, documentation only
+    :param version: Data version function, see conditional
+    """
+    funcs = [
+        cors_handler,
+        no_cache,
+        log_header(),
+        api.doc(responses={
+            403: 'Not Authorized',
+            404: 'Resource does not exist',
+        }),
+    ]
+
+    if version:
+        funcs.insert(-1, conditional(version))
+
+    if parser:
+        funcs.insert(-1, api.doc(parser=parser))
+    if resp_model:
+        funcs.insert(-1, api.response(200, 'Success', resp_model))
+
+    return utils.compose(*funcs)
+
+
+def stream_json(items, model=None, envelope=None, fields=None):
+    """Return response encoding items as JSON list, one item at a time.
+
+    :param model: The API model to marshal items with
+    :param envelope: If set, the list is returned as {envelope: [...]}
+    :param fields: If set, only these model fields are marshalled
+    """
+    mask = '{%s}' % ','.join(fields) if fields else None
+
+    def _generate():
+        """Generate JSON text."""
+        if envelope:
+            yield '{%s: [' % json.dumps(envelope)
+        else:
+            yield '['
+
+        separator = ''
+        for item in items:
+            if model is not None:
+                item = restplus.marshal(item, model, mask=mask)
+            yield separator + json.dumps(item)
+            separator = ', '
+
+        yield ']}' if envelope else ']'
+
+    return flask.Response(_generate(), mimetype='application/json')
+
+
+def add_page_args(parser, cursor='name'):
+    """Add limit/after pagination arguments to request parser."""
+    parser.add_argument('limit', help='Max number of items to return',
+                        location='args', required=False, type=int)
+    parser.add_argument('after', help='Return items after this %s, i.e. '
+                        'the last %s of the previous page' % (cursor, cursor),
+                        location='args', required=False)
+
+
+def add_fields_arg(parser):
+    """Add fields argument, projecting listed items to the given fields."""
+    parser.add_argument('fields', help='Comma separated fields to return',
+                        location='args', required=False, action='split')
+
+
 def _common_api(api, cors_handler, marshal=None, req_model=None,
                 resp_model=None, parser=None):
     """Returns default API decorator for common r/w requests.
@@ -0,0 +1,189 @@
+"""Process-wide, watch backed Zookeeper read cache.
+
+Node data and children lists are fetched from Zookeeper on first access and
+kept in memory together with a one-shot watch. When the watch fires, the
+entry is invalidated and the next read goes back to Zookeeper.
+
+Every cached entry carries the Zookeeper stat it was read with, so that
+callers can derive consistency metadata (zxid/mtime) without an additional
+round trip.
+"""
+
+import logging
+import threading
+
+import kazoo
+import kazoo.client
+from kazoo.protocol import states
+
+from treadmill import zkutils
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ZkCache(object):
+    """Invalidating cache of Zookeeper node data and children."""
+
+    __slots__ = (
+        'zkclient',
+        '_data',
+        '_children',
+        '_generation',
+        '_cleared',
+        '_fetching',
+        '_invalidated',
+        '_lock',
+        'hits',
+        'misses',
+    )
+
+    def __init__(self, zkclient):
+        self.zkclient = zkclient
+        self._data = {}
+        self._children = {}
+        self._generation = 0
+        self._cleared = 0
+        self._fetching = {}
+        self._invalidated = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.zkclient.add_listener(self._on_state_change)
+
+    def _on_state_change(self, state):
+        """Drop everything if the session is lost, watches are gone."""
+        if state == states.KazooState.LOST:
+            _LOGGER.info('Zookeeper session lost, clearing cache.')
+            self.clear()
+
+    def clear(self):
+        """Invalidate all cached entries."""
+        with self._lock:
+            self._generation += 1
+            self._cleared = self._generation
+            self._invalidated.clear()
+            self._data.clear()
+            self._children.clear()
+
+    def _key(self, cache, path):
+        """Return invalidation key of the cache entry."""
+        return (cache is self._children, path)
+
+    def _invalidate(self, cache, path):
+        """Invalidate single cache entry."""
+        with self._lock:
+            self._generation += 1
+            key = self._key(cache, path)
+            if key in self._fetching:
+                self._invalidated[key] = self._generation
+            cache.pop(path, None)
+
+    def _lookup(self, cache, path, fetch):
+        """Return cached entry or fetch it, keeping it unless invalidated.
+
+        The generation counter guards against a watch firing between the
+        fetch and the store, which would otherwise cache stale content. The
+        generation of the last invalidation is kept per entry while fetches
+        of the entry are in flight, so that invalidating one path does not
+        discard fetches of other paths.
+        """
+        key = self._key(cache, path)
+        with self._lock:
+            if path in cache:
+                self.hits += 1
+                return cache[path]
+            self.misses += 1
+            generation = self._generation
+            self._fetching[key] = self._fetching.get(key, 0) + 1
+
+        def _watch(event):
+            """Invalidate entry on any change."""
+            _LOGGER.debug('Invalidating %s: %s', path, event.type)
+            self._invalidate(cache, path)
+
+        try:
+            entry = fetch(path, _watch)
+            with self._lock:
+                if (self._cleared <= generation and
+                        self._invalidated.get(key, 0) <= generation):
+                    cache[path] = entry
+        finally:
+            with self._lock:
+                self._fetching[key] -= 1
+                if not self._fetching[key]:
+                    del self._fetching[key]
+                    self._invalidated.pop(key, None)
+
+        return entry
+
+    def _fetch_data(self, path, watch):
+        """Fetch node data and stat."""
+        while True:
+            try:
+                return self.zkclient.get(path, watch=watch)
+            except kazoo.client.NoNodeError:
+                # Set watch to be notified on node creation, read again if
+                # the node has been created since the get.
+                if self.zkclient.exists(path, watch=watch) is None:
+                    return None, None
+
+    def _fetch_children(self, path, watch):
+        """Fetch node children and stat."""
+        while True:
+            try:
+                children, stat = self.zkclient.get_children(
+                    path, watch=watch, include_data=True
+                )
+                return sorted(children), stat
+            except kazoo.client.NoNodeError:
+                if self.zkclient.exists(path, watch=watch) is None:
+                    return [], None
+
+    def get_raw(self, path, need_metadata=False):
+        """Return raw node data (None if the node does not exist)."""
+        data, stat = self._lookup(self._data, path, self._fetch_data)
+        if need_metadata:
+            return data, stat
+        else:
+            return data
+
+    def get(self, path, strict=True, need_metadata=False, default=None):
+        """Return YAML parsed node content, default if node does not exist.
+
+        Mirrors zkutils.get_default, but is served from memory. Content is
+        parsed on every call, so callers are free to modify the result.
+        """
+        data, stat = self._lookup(self._data, path, self._fetch_data)
+        if stat is None:
+            result = default
+        else:
+            result = zkutils.loads(data, strict=strict)
+
+        if need_metadata:
+            return result, stat
+        else:
+            return result
+
+    def get_children(self, path, need_metadata=False):
+        """Return sorted list of node children."""
+        children, stat = self._lookup(
+            self._children, path, self._fetch_children
+        )
+        # Return a copy, cached list must stay intact.
+        if need_metadata:
+            return list(children), stat
+        else:
+            return list(children)
+
+
+def metadata(stat):
+    """Convert Zookeeper stat into consistency metadata dictionary."""
+    if stat is None:
+        return None
+
+    return {
+        'zxid': max(stat.mzxid, getattr(stat, 'pzxid', 0)),
+        'mtime': stat.last_modified,
+    }
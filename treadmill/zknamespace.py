@@ -29,6 +29,7 @@ FINISHED = '/finished'
 FINISHED_HISTORY = '/finished.history'
 TRACE = '/trace'
 TRACE_HISTORY = '/trace.history'
+TRACE_CLEANUP = '/trace.cleanup'
 TICKET_LOCKER = '/ticket-locker'
 TREADMILL = '/treadmill'
 VERSION = '/version'
@@ -149,6 +150,7 @@ path.election = _make_path_f(ELECTION)
 path.finished = _make_path_f(FINISHED)
 path.finished_history = _make_path_f(FINISHED_HISTORY)
 path.trace_history = _make_path_f(TRACE_HISTORY)
+path.trace_cleanup = _make_path_f(TRACE_CLEANUP)
 path.trace_shard = _make_path_f(TRACE)
 
 # Special methods
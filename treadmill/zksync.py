@@ -1,10 +1,13 @@
 """Syncronizes Zookeeper to file system.
 """
 
+import collections
+import json
 import logging
 import glob
 import os
 import tempfile
+import threading
 import time
 import kazoo
 
@@ -17,6 +20,19 @@ from treadmill import zkutils
 
 _LOGGER = logging.getLogger(__name__)
 
+# Maximum number of outstanding asynchronous reads during children sync.
+_DEFAULT_CONCURRENCY = 64
+
+# Batch durability policies: no fsync, or fsync files and directories once
+# per batch before the batch is reported as flushed.
+FSYNC_NONE = 'none'
+FSYNC_BATCH = 'batch'
+
+_DEFAULT_JOURNAL_MAX_BYTES = 64 * 1024 * 1024
+
+# Number of rotated journal files kept, .journal.1 being the most recent.
+_DEFAULT_JOURNAL_BACKUPS = 5
+
 
 def write_data(fpath, data, modified, raise_err=True):
     """Safely write data to file path."""
@@ -37,33 +53,239 @@ def write_data(fpath, data, modified, raise_err=True):
             raise
 
 
+def _write_file(fpath, data, modified, sync=False):
+    """Write data to file path, using plain fd operations.
+
+    Unlike write_data, the temporary name is derived from the target, which
+    is safe as the batch writer is the only writer.
+    """
+    tmp = os.path.join(os.path.dirname(fpath),
+                       '.tmp' + os.path.basename(fpath))
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if data:
+            os.write(fd, data)
+        os.fchmod(fd, 0o644)
+        os.utime(fd, (modified, modified))
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.rename(tmp, fpath)
+
+
+def _fsync_dir(dirname):
+    """fsync directory, making renames durable."""
+    try:
+        fd = os.open(dirname, os.O_RDONLY)
+    except OSError:
+        # Directory removed since the batch was written.
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BatchWriter(object):
+    """Coalesce file changes and write them in batches.
+
+    Changes to the same path within a batch are collapsed into the last one.
+    Optionally, every flushed batch is appended to a single journal file, one
+    JSON record per change, so consumers can tail one file.
+    """
+
+    def __init__(self, window, fsync=FSYNC_NONE, journal=None,
+                 journal_max_bytes=_DEFAULT_JOURNAL_MAX_BYTES,
+                 journal_backups=_DEFAULT_JOURNAL_BACKUPS,
+                 on_flush=None):
+        assert fsync in (FSYNC_NONE, FSYNC_BATCH)
+        self.window = window
+        self.fsync = fsync
+        self.journal = journal
+        self.journal_max_bytes = journal_max_bytes
+        self.journal_backups = journal_backups
+        self.on_flush = on_flush
+        self.coalesced = 0
+        self.written = 0
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def write(self, fpath, data, modified):
+        """Schedule file write."""
+        self._add(fpath, (data, modified))
+
+    def remove(self, fpath):
+        """Schedule file removal."""
+        self._add(fpath, None)
+
+    def _add(self, fpath, change):
+        """Add change to the batch, keeping the batch ordered by last change.
+        """
+        with self._lock:
+            if self._pending.pop(fpath, False) is not False:
+                self.coalesced += 1
+            self._pending[fpath] = change
+
+    def listdir(self, dirname):
+        """Return file names in the directory as of after the next flush.
+
+        Pending writes count as present and pending removals as absent. A
+        flush in progress is waited for, as its changes are neither pending
+        nor on disk yet.
+        """
+        with self._flush_lock:
+            with self._lock:
+                names = set(map(os.path.basename,
+                                glob.glob(os.path.join(dirname, '*'))))
+                for fpath, change in self._pending.items():
+                    if os.path.dirname(fpath) != dirname:
+                        continue
+                    if change is None:
+                        names.discard(os.path.basename(fpath))
+                    else:
+                        names.add(os.path.basename(fpath))
+        return names
+
+    def flush(self):
+        """Write all pending changes, return number of changes written."""
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = collections.OrderedDict()
+
+            if not pending:
+                return 0
+
+            sync = self.fsync == FSYNC_BATCH
+            dirs = set()
+            records = []
+            for fpath, change in pending.items():
+                if change is None:
+                    fs.rm_safe(fpath)
+                    records.append({'path': fpath, 'op': 'delete'})
+                else:
+                    data, modified = change
+                    try:
+                        _write_file(fpath, data, modified, sync=sync)
+                    except OSError:
+                        _LOGGER.error('Unable to write: %s', fpath,
+                                      exc_info=True)
+                        continue
+                    records.append({'path': fpath, 'op': 'write',
+                                    'when': modified})
+                dirs.add(os.path.dirname(fpath))
+
+            if sync:
+                for dirname in dirs:
+                    _fsync_dir(dirname)
+
+            if self.journal:
+                self._append_journal(records, sync)
+
+            self.written += len(records)
+            _LOGGER.debug('Flushed %s changes, coalesced so far: %s',
+                          len(records), self.coalesced)
+
+        if self.on_flush:
+            self.on_flush()
+
+        return len(records)
+
+    def _append_journal(self, records, sync):
+        """Append batch records to the journal, rotating it if too big."""
+        basedir = os.path.dirname(self.journal)
+        lines = []
+        for record in records:
+            record['path'] = os.path.relpath(record['path'], basedir)
+            lines.append(json.dumps(record))
+        lines.append('')
+
+        with open(self.journal, 'a') as journal:
+            journal.write('\n'.join(lines))
+            journal.flush()
+            if sync:
+                os.fsync(journal.fileno())
+            size = journal.tell()
+
+        if size > self.journal_max_bytes:
+            self._rotate_journal()
+
+    def _rotate_journal(self):
+        """Shift .journal.N to .journal.N+1 and .journal to .journal.1.
+
+        The oldest file beyond journal_backups is dropped.
+        """
+        for idx in range(self.journal_backups - 1, 0, -1):
+            rotated = '%s.%d' % (self.journal, idx)
+            if os.path.exists(rotated):
+                os.rename(rotated, '%s.%d' % (self.journal, idx + 1))
+        os.rename(self.journal, self.journal + '.1')
+
+    def start(self):
+        """Start background thread flushing batches every window seconds."""
+
+        @exc.exit_on_unhandled
+        def _run():
+            """Flush loop."""
+            while True:
+                time.sleep(self.window)
+                self.flush()
+
+        flush_thread = threading.Thread(target=_run)
+        flush_thread.daemon = True
+        flush_thread.start()
+
+
 class Zk2Fs(object):
     """Syncronize Zookeeper with file system."""
 
-    def __init__(self, zkclient, fsroot):
+    def __init__(self, zkclient, fsroot, concurrency=_DEFAULT_CONCURRENCY,
+                 batch_writer=None):
         self.watches = set()
         self.processed_once = set()
         self.zkclient = zkclient
         self.fsroot = fsroot
+        self.concurrency = concurrency
         self.ready = False
+        self.batch_writer = batch_writer
+        if self.batch_writer:
+            self.batch_writer.on_flush = self._touch_modified
 
         self.zkclient.add_listener(zkutils.exit_on_lost)
 
     def mark_ready(self):
         """Mark itself as ready, typically past initial sync."""
         self.ready = True
-        self._update_last()
+        if self.batch_writer:
+            self.batch_writer.flush()
+        self._touch_modified()
 
     def _update_last(self):
         """Update .modified timestamp to indicate changes were made."""
+        if self.batch_writer:
+            # Updated when the batch is flushed.
+            return
+        self._touch_modified()
+
+    def _touch_modified(self):
+        """Touch .modified file if ready."""
         if self.ready:
             modified_file = os.path.join(self.fsroot, '.modified')
             utils.touch(modified_file)
             os.utime(modified_file, (time.time(), time.time()))
 
+    def _remove_data(self, fpath):
+        """Remove file mirroring Zookeeper node."""
+        if self.batch_writer:
+            self.batch_writer.remove(fpath)
+        else:
+            fs.rm_safe(fpath)
+
     def _default_on_del(self, zkpath):
         """Default callback invoked on node delete, remove file."""
-        fs.rm_safe(self.fpath(zkpath))
+        self._remove_data(self.fpath(zkpath))
 
     def _default_on_add(self, zknode):
         """Default callback invoked on node is added, default - sync data."""
@@ -72,7 +294,10 @@ class Zk2Fs(object):
     def _write_data(self, fpath, data, stat):
         """Write Zookeeper data to filesystem.
         """
-        write_data(fpath, data, stat.last_modified, raise_err=True)
+        if self.batch_writer:
+            self.batch_writer.write(fpath, data, stat.last_modified)
+        else:
+            write_data(fpath, data, stat.last_modified, raise_err=True)
 
     def _data_watch(self, zkpath, data, stat, event):
         """Invoked when data changes."""
@@ -80,12 +305,12 @@ class Zk2Fs(object):
         if data is None and event is None:
             _LOGGER.info('Node does not exist: %s', zkpath)
             self.watches.discard(zkpath)
-            fs.rm_safe(fpath)
+            self._remove_data(fpath)
 
         elif event is not None and event.type == 'DELETED':
             _LOGGER.info('Node removed: %s', zkpath)
             self.watches.discard(zkpath)
-            fs.rm_safe(fpath)
+            self._remove_data(fpath)
         else:
             self._write_data(fpath, data, stat)
 
@@ -139,8 +364,13 @@ class Zk2Fs(object):
         fpath = self.fpath(zkpath)
 
         sorted_children = sorted(children)
-        sorted_filenames = sorted(map(os.path.basename,
-                                      glob.glob(os.path.join(fpath, '*'))))
+        if self.batch_writer:
+            # Files on disk lag behind by the unflushed batch.
+            filenames = self.batch_writer.listdir(fpath)
+        else:
+            filenames = map(os.path.basename,
+                            glob.glob(os.path.join(fpath, '*')))
+        sorted_filenames = sorted(filenames)
 
         add = []
         remove = []
@@ -155,25 +385,27 @@ class Zk2Fs(object):
             self.watches.discard(zknode)
             on_del(zknode)
 
+        added = []
         if zkpath not in self.processed_once:
             self.processed_once.add(zkpath)
             for node in common:
                 _LOGGER.info('Common: %s', node)
-
-                zknode = z.join_zookeeper_path(zkpath, node)
-                if watch_data:
-                    self.watches.add(zknode)
-
-                on_add(zknode)
+                added.append(z.join_zookeeper_path(zkpath, node))
 
         for node in add:
             _LOGGER.info('Add: %s', node)
+            added.append(z.join_zookeeper_path(zkpath, node))
 
-            zknode = z.join_zookeeper_path(zkpath, node)
-            if watch_data:
-                self.watches.add(zknode)
+        if watch_data:
+            self.watches.update(added)
 
-            on_add(zknode)
+        if on_add == self._default_on_add and not watch_data:
+            # Plain data copy, pipeline the reads instead of doing a round
+            # trip per node.
+            self._sync_data_async(added)
+        else:
+            for zknode in added:
+                on_add(zknode)
 
         if cont_watch_predicate:
             return cont_watch_predicate(zkpath, sorted_children)
@@ -202,6 +434,35 @@ class Zk2Fs(object):
             self._write_data(fpath, data, stat)
             self._update_last()
 
+    def _sync_data_async(self, zkpaths):
+        """Sync data of many nodes, with bounded number of reads in flight.
+        """
+        pending = collections.deque()
+        for zkpath in zkpaths:
+            pending.append((zkpath, self.zkclient.get_async(zkpath)))
+            if len(pending) >= self.concurrency:
+                self._write_async_result(*pending.popleft())
+
+        while pending:
+            self._write_async_result(*pending.popleft())
+
+        if zkpaths:
+            self._update_last()
+
+    def _write_async_result(self, zkpath, async_result):
+        """Wait for asynchronous read to complete and write the data."""
+        fpath = self.fpath(zkpath)
+        try:
+            data, stat = async_result.get()
+        except kazoo.client.NoNodeError:
+            # Removed since children were listed, next children watch will
+            # take care of it.
+            _LOGGER.info('Node does not exist: %s', zkpath)
+            self._remove_data(fpath)
+            return
+
+        self._write_data(fpath, data, stat)
+
     def _make_children_watch(self, zkpath, watch_data=False,
                              on_add=None, on_del=None,
                              cont_watch_predicate=None):
@@ -29,6 +29,8 @@ logging.getLogger('kazoo.client').setLevel(logging.WARNING)
 # This is the maximum time the start will try to connect for, i.e. 30 sec
 ZK_MAX_CONNECTION_START_TIMEOUT = 30
 _VAGRANT_PROFILE = 'vagrant'
+# Max number of operations in single multi-op transaction.
+_MULTI_BATCH_SIZE = 500
 _ZK_PLUGIN_MOD = None
 
 if os.environ.get('TREADMILL_PROFILE', None) != _VAGRANT_PROFILE:
@@ -447,10 +449,8 @@ def update(zkclient, path, data, check_content=False):
     return path
 
 
-def get(zkclient, path, watcher=None, strict=True, need_metadata=False):
-    """Read content of Zookeeper node and return YAML parsed object."""
-    data, metadata = zkclient.get(path, watch=watcher)
-
+def loads(data, strict=True):
+    """Parse YAML node payload, return raw data if not strict."""
     result = None
     if data is not None:
         try:
@@ -461,6 +461,15 @@ def get(zkclient, path, watcher=None, strict=True, need_metadata=False):
             else:
                 result = data
 
+    return result
+
+
+def get(zkclient, path, watcher=None, strict=True, need_metadata=False):
+    """Read content of Zookeeper node and return YAML parsed object."""
+    data, metadata = zkclient.get(path, watch=watcher)
+
+    result = loads(data, strict=strict)
+
     if need_metadata:
         return result, metadata
     else:
@@ -530,6 +539,33 @@ def ensure_deleted(zkclient, path, recursive=True):
         _LOGGER.debug('Node %s does not exist.', path)
 
 
+def ensure_deleted_batch(zkclient, paths, batch_size=_MULTI_BATCH_SIZE):
+    """Deletes leaf nodes, grouping deletes into multi-op transactions.
+
+    Transactions are all or nothing, so if a transaction fails (e.g. one of
+    the nodes is already gone), nodes of that batch are deleted one by one.
+    """
+    paths = list(paths)
+    for idx in range(0, len(paths), batch_size):
+        batch = paths[idx:idx + batch_size]
+        txn = zkclient.transaction()
+        for path in batch:
+            txn.delete(path)
+
+        try:
+            results = txn.commit()
+        except kazoo.exceptions.KazooException:
+            _LOGGER.warning('Batch delete failed.', exc_info=True)
+            results = None
+
+        if results is None or any(isinstance(result, Exception)
+                                  for result in results):
+            _LOGGER.info('Batch delete failed, deleting %s nodes one by one.',
+                         len(batch))
+            for path in batch:
+                with_retry(ensure_deleted, zkclient, path, recursive=False)
+
+
 def exists(zk_client, zk_path, timeout=60):
     """wrapping the zk exists function with timeout"""
     node_created_event = threading.Event()